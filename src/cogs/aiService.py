@@ -1,13 +1,111 @@
+import asyncio
 import logging
-from datetime import time
+from datetime import time, timedelta
+from io import BytesIO
 
 import discord
 from discord import ApplicationContext
 from discord.ext import commands, tasks
 
-from models.database.userData import User
+from models.ai.response import CodeTranslateResponse
+from models.database.aiData import AIUsage
 from utils.ai import ai
+from utils.ai.modelRouter import ModelTierStats
+from utils.ai.preflight import estimate_translation
+from utils.ai.quotaLedger import quota_ledger
+from utils.ai.translationCache import translation_cache
 from utils.constants import Constants
+from utils.typeAliases import Context
+from utils.userUtils import user_directory
+
+
+class _TranslationPreview:
+    """
+    Shows the partially translated code in the deferred response.
+
+    The stream only stores the latest lines, a task of its own edits the
+    message at most every `interval` seconds. A slow or rate limited edit
+    therefore never holds up reading the completion. The task is stopped
+    before the final embed replaces the preview.
+    """
+
+    def __init__(
+        self,
+        ctx: ApplicationContext,
+        interval: float,
+        max_chars: int
+    ) -> None:
+        self.ctx = ctx
+        self.interval = interval
+        self.max_chars = max_chars
+        self.shown = False
+        self._lines: list[str] = []
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    def update(self, lines: list[str]) -> None:
+        self._lines = lines
+        self._changed.set()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+
+            # the end of the code is the part that changes
+            code = "\n".join(self._lines)[-self.max_chars:]
+            # a cancelled edit may still have reached Discord, so the final
+            # embed has to replace it
+            self.shown = True
+            try:
+                await self.ctx.edit(content=f"⏳\n```{code}```")
+            except discord.HTTPException as ex:
+                logging.getLogger("bot").warning(
+                    "Could not show partial translation: %s",
+                    ex
+                )
+
+            await asyncio.sleep(self.interval)
+
+
+def _code_files(response: CodeTranslateResponse) -> list[discord.File]:
+    """
+    Attach the translated code as a file if it is cut off in the embed.
+    """
+    if response.fits_embed:
+        return []
+    return [
+        discord.File(
+            BytesIO(response.code.encode()),
+            filename="translation.txt"
+        )
+    ]
+
+
+def _model_tier_line(tier: ModelTierStats) -> str:
+    latency = (
+        f"{tier.avg_latency_ms:.0f} ms im Schnitt"
+        if tier.avg_latency_ms is not None else "noch keine Antwort"
+    )
+    return (
+        f"{tier.name} ({tier.model}): {tier.requests} Anfragen, "
+        f"{tier.failures} fehlgeschlagen, {tier.fallbacks} als Ersatz, "
+        f"{tier.tokens} Tokens, {latency}"
+    )
 
 
 class AIService(commands.Cog):
@@ -20,20 +118,65 @@ class AIService(commands.Cog):
         self.bot = bot
         self.ai = ai.AIUtils()
 
-        self.reset_ai_usage.start()
+        self.purge_ai_usage.start()
+
+    def cog_unload(self) -> None:
+        self.purge_ai_usage.cancel()
+        asyncio.create_task(self.ai.close())
 
     @tasks.loop(time=time(hour=0, minute=5, tzinfo=Constants.SYSTIMEZONE))
-    async def reset_ai_usage(self):
+    async def purge_ai_usage(self):
         """
-        Reset the usage of the AI service for all users.
+        Delete the AI usage of days past the retention period.
+
+        The usage is counted per day, a new day needs no reset.
         """
-        users = await User.all()
+        deleted = await AIUsage.purge(
+            AIUsage.today() - timedelta(days=Constants.AI.USAGE_RETENTION_DAYS),
+            Constants.AI.USAGE_PURGE_BATCH_SIZE
+        )
+
+        self.logger.info(f"Purged {deleted} old AI usage rows")
 
-        for user in users:
-            await user.fetch_related("ai_metadata")
-            await user.ai_metadata.reset_usage()
+    @commands.command(name="ai_stats")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def ai_stats(self, ctx: Context):
+        """
+        Shows the latency of the OpenAI requests, the model tiers and the
+        translation cache.
+        """
+        stats = self.ai.stats()
+        cache = translation_cache.stats()
+        first_content = (
+            f"erster Code nach {stats.avg_first_content_ms:.0f} ms im "
+            f"Schnitt, zuletzt {stats.last_first_content_ms:.0f} ms"
+            if stats.avg_first_content_ms is not None
+            and stats.last_first_content_ms is not None else
+            "noch keine gestreamte Anfrage"
+        )
+        latency = (
+            f"im Schnitt {stats.avg_queue_wait_ms:.0f} ms Wartezeit und "
+            f"{stats.avg_completion_ms:.0f} ms Antwortzeit, zuletzt "
+            f"{stats.last_queue_wait_ms:.0f} ms und "
+            f"{stats.last_completion_ms:.0f} ms"
+            if stats.avg_queue_wait_ms is not None
+            and stats.avg_completion_ms is not None
+            and stats.last_queue_wait_ms is not None
+            and stats.last_completion_ms is not None else "noch keine Anfrage"
+        )
+        tiers = "\n".join(
+            _model_tier_line(tier) for tier in self.ai.model_stats()
+        )
 
-        self.logger.info("Reset AI usage for all users")
+        await ctx.send(
+            f"OpenAI: {stats.completed} Anfragen, {stats.failed} "
+            f"fehlgeschlagen, {stats.in_flight}/{stats.max_in_flight} "
+            f"laufen, {stats.waiting} warten, {stats.coalesced} mit einer "
+            f"gleichen Anfrage zusammengelegt\n{latency}\n{first_content}\n"
+            f"{tiers}\n"
+            f"Cache: {cache.hits} Treffer, {cache.misses} verfehlt, "
+            f"{cache.tokens_saved} Tokens gespart"
+        )
 
     @commands.slash_command(
         name="translate",
@@ -62,35 +205,109 @@ class AIService(commands.Cog):
 
         await ctx.defer()
 
-        user, _ = await User.get_or_create(
-                id=str(ctx.author.id), defaults={
-                    "global_name": ctx.author.name, "display_name": ctx.author.display_name})
+        user = await user_directory.get_user(ctx.author)
+
+        # cached translations are free and do not count against the limit
+        cached = await translation_cache.get(
+            code,
+            language,
+            Constants.AI.OPENAI_MODEL
+        )
+        if cached is not None:
+            remaining = await quota_ledger.remaining(user.id)
+            embed = await cached.create_embed(
+                ctx.author,
+                remaining.usable_requests
+            )
+            await ctx.respond(embed=embed, files=_code_files(cached))
+            return
+
+        estimate = estimate_translation(code)
+        if estimate.too_large:
+            await ctx.respond(
+                f"Der Code ist zu lang (etwa {estimate.code_tokens} Tokens, "
+                f"höchstens {Constants.AI.MAX_CODE_TOKENS}).",
+                ephemeral=True
+            )
+            return
 
-        if await user.remaining_ai_requests() <= 0:
+        reservation = await quota_ledger.reserve(user.id)
+        if reservation is None:
             await ctx.respond(
                 "AI ist nicht billig, du hast dein tägliches Limit erreicht. Versuche es morgen erneut.",
                 ephemeral=True
             )
             return
 
-        await user.increment_ai_usage()
+        if estimate.total_tokens > reservation.remaining.tokens:
+            await quota_ledger.refund(reservation)
+            await ctx.respond(
+                "Dein Token-Budget für heute reicht dafür nicht mehr (etwa "
+                f"{estimate.total_tokens} Tokens nötig, noch "
+                f"{max(reservation.remaining.tokens, 0)} übrig).",
+                ephemeral=True
+            )
+            return
+
+        preview = _TranslationPreview(
+            ctx,
+            Constants.AI.STREAM_EDIT_INTERVAL_SECONDS,
+            Constants.AI.STREAM_PREVIEW_MAX_CHARS
+        )
+
+        if Constants.AI.STREAM_TRANSLATIONS:
+            preview.start()
 
         try:
-            response = self.ai.code_translate(language, code)
+            response = await self.ai.code_translate(
+                language,
+                code,
+                preview.update if Constants.AI.STREAM_TRANSLATIONS else None
+            )
         except Exception as e:
+            await preview.stop()
             self.logger.error(f"Error translating code: {e}")
-            await ctx.respond(
-                "Es gab einen Fehler beim Übersetzen des Codes.",
-                ephemeral=True
-            )
+            await quota_ledger.refund(reservation)
+            if preview.shown:
+                await ctx.edit(
+                    content="Es gab einen Fehler beim Übersetzen des Codes."
+                )
+            else:
+                await ctx.respond(
+                    "Es gab einen Fehler beim Übersetzen des Codes.",
+                    ephemeral=True
+                )
             return
+        finally:
+            # the final embed must not be overwritten by a late preview
+            await preview.stop()
+
+        await quota_ledger.commit(reservation, response.tokens_used)
+        self.logger.info(
+            f"Translated code in {len(estimate.chunks)} chunks, estimated "
+            f"{estimate.total_tokens} tokens, used {response.tokens_used}"
+        )
+        await translation_cache.put(
+            code,
+            language,
+            Constants.AI.OPENAI_MODEL,
+            response
+        )
 
         embed = await response.create_embed(
             ctx.author,
-            await user.remaining_ai_requests()
+            reservation.remaining.usable_requests
         )
 
-        await ctx.respond(embed=embed)
+        if preview.shown:
+            # replace the partial code with the final embed
+            await ctx.edit(
+                content=None,
+                embed=embed,
+                files=_code_files(response)
+            )
+        else:
+            await ctx.respond(embed=embed, files=_code_files(response))
 
 
 def setup(bot: discord.Bot):
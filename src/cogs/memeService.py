@@ -1,12 +1,28 @@
+import asyncio
 import logging
 
 import discord
 from discord import ApplicationContext
 from discord.ext import commands, tasks
 
-from models.database.userData import User
+from models.database.memeData import Meme
+from models.memes.memeView import MemeView
 from utils.constants import Constants
 from utils.memeUtils import memeUtils
+from utils.memeUtils.memeBannerCacheUtils import meme_banner_cache
+from utils.memeUtils.memeHashUtils import (
+    backfill_meme_hashes,
+    find_duplicate_clusters,
+    meme_hash_index,
+)
+from utils.memeUtils.memeIngestUtils import MemeIngestJob, MemeIngestPipeline
+from utils.memeUtils.memeOcrBackfillUtils import MemeOcrBackfill
+from utils.memeUtils.memeSearchUtils import meme_search_index
+from utils.memeUtils.memeStorageMigrationUtils import MemeStorageMigration
+from utils.memeUtils.memeStorageUtils import meme_storage
+from utils.memeUtils.memeVariantUtils import meme_variants
+from utils.typeAliases import Context
+from utils.userUtils import user_directory
 
 
 class MemeService(commands.Cog):
@@ -17,13 +33,47 @@ class MemeService(commands.Cog):
     def __init__(self, bot: discord.Bot, logger: logging.Logger) -> None:
         self.logger = logger
         self.bot = bot
+        self.ingest = MemeIngestPipeline(
+            logger,
+            Constants.MEME_INGEST.WORKERS,
+            Constants.MEME_INGEST.QUEUE_SIZE
+        )
+        self.reocr = MemeOcrBackfill(
+            logger,
+            Constants.FILE_PATHS.OCR_BACKFILL_CHECKPOINT,
+            Constants.OCR.BACKFILL_CHUNK_SIZE
+        )
+        self.storage_migration = MemeStorageMigration(
+            logger,
+            meme_storage,
+            Constants.FILE_PATHS.BANNERIZED_MEME_FOLDER,
+            Constants.FILE_PATHS.PREVIEW_MEME_FOLDER,
+            Constants.MEME_STORAGE.MIGRATION_BYTES_PER_SECOND,
+            Constants.MEME_STORAGE.MIGRATION_CHUNK_SIZE,
+            Constants.MEME_STORAGE.COPY_BLOCK_SIZE
+        )
+        self._next_banner: asyncio.Task[bytes] | None = None
+
+    def cog_unload(self) -> None:
+        if self._next_banner is not None:
+            self._next_banner.cancel()
+        self.storage_migration.stop()
+        self.reocr.stop()
+        self.ingest.stop()
 
     @commands.Cog.listener()
     async def on_ready(self):
         """
         Starts the set_random_meme_banner task when the bot is ready.
         """
+        await meme_search_index.load()
+        await meme_hash_index.load()
         self.set_random_meme_banner.start()
+        self.ingest.start()
+
+        # continue a re-OCR that was interrupted by a restart
+        if self.reocr.has_checkpoint():
+            self.reocr.start()
 
         self.logger.info("MemeBannerService started successfully")
 
@@ -44,24 +94,211 @@ class MemeService(commands.Cog):
             ):
                 continue
 
-            user, _ = await User.get_or_create(
-                id=str(message.author.id), defaults={
-                    "global_name": message.author.name, "display_name": message.author.display_name})
+            user = await user_directory.get_user(message.author)
+            image_data = await attachment.read()
+
+            # OCR and bannerization run in the ingest worker processes
+            await self.ingest.enqueue(
+                MemeIngestJob(
+                    image_data,
+                    user,
+                    message.content,
+                    message.created_at,
+                    attachment.filename
+                )
+            )
+
+    @commands.command(name="meme_ingest")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def meme_ingest(self, ctx: Context):
+        """
+        Shows the status of the meme ingest pipeline.
+        """
+        stats = self.ingest.stats()
+
+        await ctx.send(
+            f"Meme-Verarbeitung: {stats.queued}/{stats.queue_size} in der "
+            f"Warteschlange, {stats.running} in Bearbeitung, "
+            f"{stats.completed} fertig (davon {stats.duplicates} Reposts), "
+            f"{stats.failed} fehlgeschlagen "
+            f"({stats.workers} Worker)."
+        )
+
+    @commands.command(name="meme_banner")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def meme_banner(self, ctx: Context):
+        """
+        Shows the hit rate and size of the meme banner cache.
+        """
+        stats = await asyncio.to_thread(meme_banner_cache.stats)
+
+        await ctx.send(
+            f"Banner-Cache: {stats.files} Banner, "
+            f"{stats.size_bytes / 1024 / 1024:.1f}/"
+            f"{stats.max_bytes / 1024 / 1024:.0f} MiB, "
+            f"{stats.hits} Treffer, {stats.misses} neu erstellt, "
+            f"{stats.evictions} gelöscht, maximal "
+            f"{stats.peak_memory_bytes / 1024 / 1024:.1f} MiB Speicher beim "
+            f"Erstellen"
+        )
+
+    @commands.command(name="meme_storage")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def meme_storage(self, ctx: Context, action: str | None = None):
+        """
+        Shows the read counters and the layout of the meme storage.
 
-            await memeUtils.save_meme_image(
-                self.logger,
-                attachment,
-                user,
-                message.content,
-                message.created_at
+        `migrate` moves the flat legacy files into the content-addressed
+        layout in the background, `stop` pauses the migration and `gc`
+        deletes files that no meme references anymore.
+        """
+        if action == "migrate":
+            if not self.storage_migration.start():
+                await ctx.send("Die Speichermigration läuft bereits.")
+                return
+            self.logger.info("Meme storage migration started by %s", ctx.author)
+        elif action == "stop":
+            self.storage_migration.stop()
+            self.logger.info("Meme storage migration stopped by %s", ctx.author)
+        elif action == "gc":
+            removed = await meme_storage.remove_unreferenced(
+                Constants.MEME_STORAGE.ORPHAN_GRACE_SECONDS
             )
+            await ctx.send(f"{removed} unbenutzte Dateien gelöscht.")
+
+        stats = meme_storage.stats()
+        references = await meme_storage.reference_counts()
+        legacy = await Meme.filter(content_hash__isnull=True).count()
+        migration = self.storage_migration.stats()
+        state = "läuft" if migration.running else "gestoppt"
+        total = migration.total if migration.total is not None else "?"
+
+        await ctx.send(
+            f"Meme-Speicher: {len(references)} Dateien für "
+            f"{sum(references.values())} Memes, {legacy} Memes im alten "
+            f"Format\n"
+            f"{stats.reads} Lesezugriffe, "
+            f"{stats.bytes_read / 1024 / 1024:.1f} MiB gelesen "
+            f"(Originale: {stats.raw_reads}x, "
+            f"{stats.raw_bytes / 1024 / 1024:.1f} MiB; "
+            f"Banner: {stats.banner_reads}x, "
+            f"{stats.banner_bytes / 1024 / 1024:.1f} MiB)\n"
+            f"Migration {state}: {migration.migrated}/{total} Memes, "
+            f"{migration.missing} Dateien fehlen, "
+            f"{migration.bytes_per_second / 1024 / 1024:.1f} MiB/s"
+        )
+
+    @commands.command(name="meme_index")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def meme_index(self, ctx: Context, action: str | None = None):
+        """
+        Shows the size and timings of the meme search index.
+
+        With the action `rebuild` the index is reloaded from the database
+        first.
+        """
+        if action == "rebuild":
+            await meme_search_index.rebuild()
+            self.logger.info("Meme search index rebuilt by %s", ctx.author)
+
+        stats = meme_search_index.stats()
+        build = (
+            f"{stats.build_ms:.0f} ms"
+            if stats.build_ms is not None else "nicht geladen"
+        )
+        query = (
+            f"{stats.avg_query_ms:.2f} ms im Schnitt, zuletzt "
+            f"{stats.last_query_ms:.2f} ms" if stats.avg_query_ms is not None
+            and stats.last_query_ms is not None else "noch keine Suche"
+        )
 
+        await ctx.send(
+            f"🔍 Meme-Suchindex: {stats.memes} Memes, {stats.terms} Begriffe, "
+            f"{stats.nonzeros} Einträge, {stats.memory_bytes / 1024:.0f} KiB\n"
+            f"Aufbau: {build}, {stats.queries} Suchen: {query}"
+        )
+
+    @commands.command(name="meme_duplicates")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def meme_duplicates(self, ctx: Context, action: str | None = None):
+        """
+        Reports the largest clusters of reposted memes in the archive.
+
+        With the action `backfill` the missing hashes of old memes are
+        computed first.
+        """
+        if action == "backfill":
+            hashed = await backfill_meme_hashes()
             self.logger.info(
-                "Saved meme %s from %s",
-                attachment.filename,
-                message.author
+                "Hashed %d memes, started by %s",
+                hashed,
+                ctx.author
+            )
+            await ctx.send(f"{hashed} Memes gehasht.")
+
+        memes = await Meme.all().values_list("uuid", "phash", "duplicate_of_id")
+        clusters = find_duplicate_clusters(
+            [
+                (
+                    str(meme_uuid),
+                    phash,
+                    str(duplicate_of) if duplicate_of is not None else None
+                ) for meme_uuid,
+                phash,
+                duplicate_of in memes
+            ],
+            Constants.MEME_DUPLICATES.MAX_DISTANCE
+        )
+        unhashed = sum(1 for _, phash, _ in memes if phash is None)
+
+        lines = [
+            f"♻️ {len(clusters)} Gruppen mit "
+            f"{sum(len(cluster) for cluster in clusters)} ähnlichen Memes "
+            f"({unhashed} Memes ohne Hash)"
+        ]
+        for cluster in clusters[:10]:
+            lines.append(
+                f"- {len(cluster)}x: "
+                f"{', '.join(f'`{meme_uuid}`' for meme_uuid in cluster[:3])}"
+                f"{' …' if len(cluster) > 3 else ''}"
             )
 
+        await ctx.send("\n".join(lines))
+
+    @commands.command(name="meme_reocr")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def meme_reocr(self, ctx: Context, action: str | None = None):
+        """
+        Runs OCR again for all stored memes in the background.
+
+        Without an action the progress is shown. `start` starts or resumes
+        the backfill, `stop` pauses it and `reset` forgets its progress.
+        """
+        if action == "start":
+            if not self.reocr.start():
+                await ctx.send("Die Meme-Texterkennung läuft bereits.")
+                return
+            self.logger.info("Meme re-OCR started by %s", ctx.author)
+        elif action == "stop":
+            self.reocr.stop()
+            self.logger.info("Meme re-OCR stopped by %s", ctx.author)
+        elif action == "reset":
+            if not self.reocr.reset():
+                await ctx.send(
+                    "Die Meme-Texterkennung muss zuerst gestoppt werden."
+                )
+                return
+
+        stats = self.reocr.stats()
+        state = "läuft" if stats.running else "gestoppt"
+        total = stats.total if stats.total is not None else "?"
+
+        await ctx.send(
+            f"Meme-Texterkennung {state}: {stats.processed}/{total} Memes, "
+            f"{stats.updated} aktualisiert, {stats.missing} Dateien fehlen, "
+            f"{stats.images_per_second:.2f} Bilder/s"
+        )
+
     @commands.slash_command(
         name="meme",
         description="Suche nach einem zufälligen Meme",
@@ -77,7 +314,7 @@ class MemeService(commands.Cog):
         Searches for a meme matching the search term and sends it in an embed.
         """
         if search is None:
-            _, meme = await memeUtils.get_random_meme(False)
+            meme = await memeUtils.get_random_meme()
         else:
             memes = await memeUtils.search_memes(search, 1)
 
@@ -87,11 +324,22 @@ class MemeService(commands.Cog):
                 )
                 return
 
-            _, meme = memes[0]
+            meme = memes[0]
+
+        # a missing preview of an old meme is rendered first
+        await ctx.defer()
+        variant = await meme_variants.select_variant(
+            meme,
+            Constants.MEME_VARIANTS.UPLOAD_BUDGET_BYTES
+        )
 
-        embed, meme_file = await meme.create_embed(search)
+        # the image is uploaded from its path, it is never read here
+        embed, meme_file = await meme.create_embed(search, variant.path)
 
-        await ctx.respond(embed=embed, file=meme_file)
+        if variant.is_original:
+            await ctx.respond(embed=embed, file=meme_file)
+        else:
+            await ctx.respond(embed=embed, file=meme_file, view=MemeView(meme))
 
     @commands.slash_command(
         name="trick",
@@ -104,7 +352,23 @@ class MemeService(commands.Cog):
     @tasks.loop(minutes=5)
     async def set_random_meme_banner(self):
         assert self.bot.user is not None
-        random_meme, _ = await memeUtils.get_random_meme(True)
+
+        banner_task = self._next_banner or asyncio.create_task(
+            memeUtils.get_random_meme_banner()
+        )
+        self._next_banner = None
+
+        try:
+            random_meme = await banner_task
+        except (OSError, ValueError) as ex:
+            self.logger.error("Failed to render random meme banner %s", ex)
+            return
+        finally:
+            if not banner_task.cancelled():
+                # render the banner of the next tick in the background
+                self._next_banner = asyncio.create_task(
+                    memeUtils.get_random_meme_banner()
+                )
 
         try:
             await self.bot.user.edit(banner=random_meme)
@@ -1,13 +1,16 @@
 import logging
 
 import discord
-from cachetools import TTLCache
 from discord import ApplicationContext
 from discord.ext import commands
 
-from models.quotes.quoteModels import PartialMessage
+from models.database.quoteData import Quote
+from models.quotes.quoteModels import CollectedMessage, PartialMessage
 from utils import quoteUtils
 from utils.constants import Constants
+from utils.quoteCollectionUtils import QuoteCollectionBuffer
+from utils.quoteSearchUtils import quote_corpus
+from utils.typeAliases import Context
 
 
 class QuoteService(commands.Cog):
@@ -19,14 +22,17 @@ class QuoteService(commands.Cog):
         self.logger = logger
         self.bot = bot
 
-        self.quote_cache: TTLCache[int, list[discord.Message]]
-        self.quote_cache = TTLCache(
-            maxsize=99,
-            ttl=10 * 60,  # 10 minutes TTL
+        collection = Constants.QUOTE_COLLECTION
+        self.quote_cache = QuoteCollectionBuffer(
+            ttl=collection.TTL_SECONDS,
+            max_messages_per_user=collection.MAX_MESSAGES_PER_USER,
+            max_bytes=collection.MAX_BYTES,
         )
 
     @commands.Cog.listener("on_ready")
     async def on_ready(self):
+        await quote_corpus.load()
+
         self.logger.info("QuoteService started successfully")
 
     # ----- Slash Commands -----
@@ -60,7 +66,11 @@ class QuoteService(commands.Cog):
             if msg is not None:
                 messages.append(msg)
 
-        await self._store_and_send_quote(ctx, messages, comment)
+        await self._store_and_send_quote(
+            ctx,
+            [CollectedMessage.from_discord_message(msg) for msg in messages],
+            comment
+        )
 
     @quote.command(
         name="post",
@@ -78,7 +88,7 @@ class QuoteService(commands.Cog):
         user_id = ctx.author.id
         quotes = self.quote_cache.get(user_id)
 
-        if not quotes:
+        if len(quotes) == 0:
             await ctx.respond(
                 "❌ Du hast keine gespeicherten Nachrichten.",
                 ephemeral=True
@@ -99,7 +109,7 @@ class QuoteService(commands.Cog):
         Clears all stored messages for the user.
         """
         user_id = ctx.author.id
-        self.quote_cache.pop(user_id, None)
+        self.quote_cache.pop(user_id)
         await ctx.respond(
             "✅ Alle gespeicherten Nachrichten wurden gelöscht.",
             ephemeral=True
@@ -253,13 +263,22 @@ class QuoteService(commands.Cog):
         """
         user_id = ctx.author.id
 
-        quotes = self.quote_cache.setdefault(user_id, [])
+        collected = self.quote_cache.add(
+            user_id,
+            CollectedMessage.from_discord_message(message)
+        )
 
-        quotes.append(message)
+        if collected is None:
+            await ctx.respond(
+                f"❌ Du kannst höchstens {self.quote_cache.max_messages_per_user} "
+                "Nachrichten sammeln. Nutze `/quote post` oder `/quote clear`.",
+                ephemeral=True
+            )
+            return
 
         await ctx.respond(
             f"📌 Nachricht von **{message.author.display_name}** gespeichert!\n"
-            f"({len(self.quote_cache[user_id])} gesammelt - verfällt in {self.quote_cache.ttl // 60} Minuten)\n\n"
+            f"({collected} gesammelt - verfällt in {self.quote_cache.ttl // 60} Minuten)\n\n"
             f"**Tipp:** nutze den Befehl `/quote post`, um deine gesammelten Nachrichten zu zitieren.",
             ephemeral=True
         )
@@ -276,26 +295,76 @@ class QuoteService(commands.Cog):
         """
         Immediately quotes a single selected message into the quotes channel.
         """
-        await self._store_and_send_quote(ctx, [message], None)
+        await self._store_and_send_quote(
+            ctx,
+            [CollectedMessage.from_discord_message(message)],
+            None
+        )
 
         await ctx.respond(
             f"📌 Nachricht von **{message.author.display_name}** im Quotes-Channel zitiert!",
             ephemeral=True
         )
 
+    # ----- Admin Commands -----
+
+    @commands.command(name="quote_corpus")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def quote_corpus_status(
+        self,
+        ctx: Context,
+        action: str | None = None
+    ) -> None:
+        """
+        Shows the size and staleness of the in-memory quote corpus.
+
+        With the action `rebuild` the corpus is reloaded from the database
+        first.
+        """
+        if action == "rebuild":
+            await quote_corpus.rebuild()
+            self.logger.info("Quote corpus rebuilt by %s", ctx.author)
+
+        stats = quote_corpus.stats()
+        db_quotes = await Quote.all().count()
+        age = (
+            f"{stats.age_seconds / 60:.0f} Minuten"
+            if stats.age_seconds is not None else "nicht geladen"
+        )
+
+        await ctx.send(
+            f"📚 Zitat-Korpus: {stats.quotes} Zitate "
+            f"({db_quotes} in der Datenbank), {stats.texts} Texte, "
+            f"{stats.names} Namen, {stats.memory_bytes / 1024:.0f} KiB\n"
+            f"Alter: {age}, {stats.updates_since_load} Änderungen seit dem "
+            f"Laden, {stats.rebuilds}x geladen"
+        )
+
+    @commands.command(name="quote_buffer")  # type: ignore
+    @commands.has_permissions(manage_webhooks=True)
+    async def quote_buffer_status(self, ctx: Context) -> None:
+        """
+        Shows how many messages are currently collected for quotes.
+        """
+        stats = self.quote_cache.stats()
+
+        await ctx.send(
+            f"📌 Gesammelte Nachrichten: {stats.messages} von "
+            f"{stats.users} Nutzern, {stats.size_bytes / 1024:.1f} von "
+            f"{stats.max_bytes / 1024:.0f} KiB belegt"
+        )
+
     # ---- Internal Methods -----
 
     async def _store_and_send_quote(
         self,
         ctx: ApplicationContext,
-        messages: list[discord.Message],
+        messages: list[CollectedMessage],
         comment: str | None,
     ):
         await quoteUtils.store_quote_in_db(ctx, messages, comment)
 
-        partial_messages = [
-            PartialMessage.from_discord_message(msg) for msg in messages
-        ]
+        partial_messages = [msg.message for msg in messages]
 
         await quoteUtils.send_embed(ctx, partial_messages, comment)
 
@@ -0,0 +1,51 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE VIRTUAL TABLE IF NOT EXISTS "quotemessage_fts" USING fts5(
+    "content",
+    content='quotemessage',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+) /* Full-text index over the content of quote messages */;
+        CREATE VIRTUAL TABLE IF NOT EXISTS "quote_fts" USING fts5(
+    "comment",
+    content='quote',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+) /* Full-text index over the comments of quotes */;
+        CREATE TRIGGER IF NOT EXISTS "quotemessage_fts_ai" AFTER INSERT ON "quotemessage" BEGIN
+    INSERT INTO "quotemessage_fts" ("rowid", "content") VALUES (new."id", new."content");
+END;
+        CREATE TRIGGER IF NOT EXISTS "quotemessage_fts_ad" AFTER DELETE ON "quotemessage" BEGIN
+    INSERT INTO "quotemessage_fts" ("quotemessage_fts", "rowid", "content") VALUES ('delete', old."id", old."content");
+END;
+        CREATE TRIGGER IF NOT EXISTS "quotemessage_fts_au" AFTER UPDATE OF "content" ON "quotemessage" BEGIN
+    INSERT INTO "quotemessage_fts" ("quotemessage_fts", "rowid", "content") VALUES ('delete', old."id", old."content");
+    INSERT INTO "quotemessage_fts" ("rowid", "content") VALUES (new."id", new."content");
+END;
+        CREATE TRIGGER IF NOT EXISTS "quote_fts_ai" AFTER INSERT ON "quote" BEGIN
+    INSERT INTO "quote_fts" ("rowid", "comment") VALUES (new."id", new."comment");
+END;
+        CREATE TRIGGER IF NOT EXISTS "quote_fts_ad" AFTER DELETE ON "quote" BEGIN
+    INSERT INTO "quote_fts" ("quote_fts", "rowid", "comment") VALUES ('delete', old."id", old."comment");
+END;
+        CREATE TRIGGER IF NOT EXISTS "quote_fts_au" AFTER UPDATE OF "comment" ON "quote" BEGIN
+    INSERT INTO "quote_fts" ("quote_fts", "rowid", "comment") VALUES ('delete', old."id", old."comment");
+    INSERT INTO "quote_fts" ("rowid", "comment") VALUES (new."id", new."comment");
+END;
+        INSERT INTO "quotemessage_fts" ("quotemessage_fts") VALUES ('rebuild');
+        INSERT INTO "quote_fts" ("quote_fts") VALUES ('rebuild');"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TRIGGER IF EXISTS "quotemessage_fts_ai";
+        DROP TRIGGER IF EXISTS "quotemessage_fts_ad";
+        DROP TRIGGER IF EXISTS "quotemessage_fts_au";
+        DROP TRIGGER IF EXISTS "quote_fts_ai";
+        DROP TRIGGER IF EXISTS "quote_fts_ad";
+        DROP TRIGGER IF EXISTS "quote_fts_au";
+        DROP TABLE IF EXISTS "quotemessage_fts";
+        DROP TABLE IF EXISTS "quote_fts";"""
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "meme" ADD "phash" VARCHAR(16) /* The perceptual hash (dHash) of the meme image as hex */;
+        ALTER TABLE "meme" ADD "duplicate_of_id" CHAR(36) REFERENCES "meme" ("uuid") ON DELETE SET NULL /* The original meme if this meme is a repost */;
+        CREATE INDEX IF NOT EXISTS "idx_meme_phash_0b3f5c" ON "meme" ("phash");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_meme_phash_0b3f5c";
+        ALTER TABLE "meme" DROP COLUMN "duplicate_of_id";
+        ALTER TABLE "meme" DROP COLUMN "phash";"""
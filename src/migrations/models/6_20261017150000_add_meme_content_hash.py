@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "meme" ADD "content_hash" VARCHAR(64) /* The SHA-256 hash of the stored image file, None for files in the legacy flat layout */;
+        CREATE INDEX IF NOT EXISTS "idx_meme_content_5d2a8e" ON "meme" ("content_hash");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_meme_content_5d2a8e";
+        ALTER TABLE "meme" DROP COLUMN "content_hash";"""
@@ -0,0 +1,20 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "translationcacheentry" (
+    "key" VARCHAR(64) NOT NULL  PRIMARY KEY /* The SHA-256 hash of the normalised request as hex */,
+    "model" VARCHAR(64) NOT NULL  /* The OpenAI model of the translation */,
+    "response" JSON NOT NULL  /* The translation as returned by the OpenAI API */,
+    "tokens_used" INT NOT NULL  /* The tokens the translation cost when it was created */,
+    "hits" INT NOT NULL  DEFAULT 0 /* How often the translation was served from the cache */,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP /* When the translation was created */,
+    "last_used_at" TIMESTAMP NOT NULL  /* When the translation was last created or served */
+) /* A cached code translation, shared by all users. */;
+        CREATE INDEX IF NOT EXISTS "idx_translation_last_us_b3f7b9" ON "translationcacheentry" ("last_used_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "translationcacheentry";"""
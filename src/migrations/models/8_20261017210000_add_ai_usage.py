@@ -0,0 +1,54 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "aiusage" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "day" DATE NOT NULL  /* The day of the requests in the system timezone */,
+    "requests" INT NOT NULL  DEFAULT 0 /* The number of requests used on this day */,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_aiusage_user_id_5d0a61" UNIQUE ("user_id", "day")
+) /* The AI requests of a user on one day. */;
+        CREATE INDEX IF NOT EXISTS "idx_aiusage_day_6c2e4f" ON "aiusage" ("day");
+
+-- Keep the usage of today, the old counters were reset every night
+INSERT INTO
+  "aiusage" ("user_id", "day", "requests")
+SELECT
+  "user_id",
+  date('now', 'localtime'),
+  "usage_today"
+FROM
+  "aimetadata"
+WHERE
+  "usage_today" > 0;
+
+        DROP TABLE IF EXISTS "aimetadata";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS
+  "aimetadata" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "usage_today" INT NOT NULL DEFAULT 0
+    /* The number of requests used today */
+,
+    "user_id" INT NOT NULL UNIQUE REFERENCES "user" ("id") ON DELETE CASCADE
+  )
+  /* A class representing metadata for the AI service. */;
+
+INSERT INTO
+  "aimetadata" ("usage_today", "user_id")
+SELECT
+  COALESCE((
+    SELECT "requests" FROM "aiusage"
+    WHERE "aiusage"."user_id" = "user"."id"
+      AND "aiusage"."day" = date('now', 'localtime')
+  ), 0),
+  "user"."id"
+FROM
+  "user";
+
+        DROP TABLE IF EXISTS "aiusage";"""
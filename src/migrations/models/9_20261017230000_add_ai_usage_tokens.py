@@ -0,0 +1,11 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "aiusage" ADD "tokens" INT NOT NULL  DEFAULT 0 /* The number of tokens used on this day */;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "aiusage" DROP COLUMN "tokens";"""
@@ -2,6 +2,9 @@ from dataclasses import dataclass
 
 import discord
 
+# Discord rejects embeds with a longer description
+EMBED_DESCRIPTION_LIMIT = 4096
+
 
 @dataclass
 class CodeTranslateResponse:
@@ -10,6 +13,22 @@ class CodeTranslateResponse:
     translated_code: list[str]
     humorous_comment: str
     tokens_used: int
+    # served from the translation cache without calling OpenAI
+    cached: bool = False
+
+    @property
+    def code(self) -> str:
+        return "\n".join(self.translated_code)
+
+    @property
+    def fits_embed(self) -> bool:
+        """
+        Whether the whole translated code fits into the embed.
+        """
+        return len(self._description(self.code)) <= EMBED_DESCRIPTION_LIMIT
+
+    def _description(self, code: str) -> str:
+        return f"```{code}```\n\n-# {self.humorous_comment}"
 
     async def create_embed(
         self,
@@ -19,16 +38,24 @@ class CodeTranslateResponse:
         """
         Create a Discord embed for the translated code.
 
+        Code that does not fit into the embed is cut off.
+
         :returns: The created embed.
         """
 
-        embed = discord.Embed(
-            description=
-            f"```{'\n'.join(self.translated_code)}```\n\n-# {self.humorous_comment}"
+        code = self.code
+        if not self.fits_embed:
+            # the whole code is attached as a file, see the AI cog
+            room = EMBED_DESCRIPTION_LIMIT - len(self._description("\n…"))
+            code = code[:room] + "\n…"
+
+        embed = discord.Embed(description=self._description(code))
+        usage = (
+            f"aus dem Cache, {self.tokens_used} Tokens gespart"
+            if self.cached else f"{self.tokens_used} Tokens verwendet"
         )
         embed.set_footer(
-            text=
-            f"von @{author.display_name} ({author.global_name}) ({self.tokens_used} Tokens verwendet)"
+            text=f"von @{author.display_name} ({author.global_name}) ({usage})"
         )
         embed.set_author(name=get_usage(remaining_usage))
         embed.title = f"{self.detected_language} auf {self.translated_language}"
@@ -1,40 +1,114 @@
+from datetime import date, datetime
+
 from tortoise import fields
 
 from models.database.baseModel import BaseModel
 from models.database.userData import User
+from utils.constants import Constants
 
 
-class AIMetadata(BaseModel):
+class AIUsage(BaseModel):
     """
-    A class representing metadata for the AI service.
+    The AI requests of a user on one day.
+
+    Every day starts with a new row, so the counters never have to be reset.
+    The counters are written by the quota ledger (utils/ai/quotaLedger.py).
+    Rows of past days are only kept for the statistics and purged after
+    `Constants.AI.USAGE_RETENTION_DAYS`.
     """
-    usage_today = fields.IntField(
-        description="The number of requests used today",
+    id = fields.IntField(pk=True)
+    user: fields.ForeignKeyRelation["User"] = fields.ForeignKeyField(
+        "models.User",
+        related_name="ai_usage"
+    )
+    user_id: int
+    day = fields.DateField(
+        description="The day of the requests in the system timezone",
+        index=True
+    )
+    requests = fields.IntField(
+        description="The number of requests used on this day",
         default=0
     )
-    user: fields.OneToOneRelation["User"] = fields.OneToOneField(
-        "models.User",
-        related_name="ai_metadata"
+    tokens = fields.IntField(
+        description="The number of tokens used on this day",
+        default=0
     )
 
-    async def increment_usage(self):
+    class Meta:
+        unique_together = (("user",
+                            "day"),
+                           )
+
+    @staticmethod
+    def today() -> date:
         """
-        Increment the usage of the AI for the user service by one.
+        Return the current day in the system timezone.
         """
-        self.usage_today += 1
-        await self.save()
+        return datetime.now(tz=Constants.SYSTIMEZONE).date()
 
-    async def reset_usage(self):
+    @classmethod
+    async def purge(cls, before: date, batch_size: int) -> int:
         """
-        Reset the usage of the AI service for the user.
+        Delete the rows of all days before `before`.
+
+        The rows are deleted in batches, so the database is never locked
+        for long.
+
+        Returns:
+            int: The number of deleted rows.
         """
-        self.usage_today = 0
-        await self.save()
+        deleted = 0
+        while True:
+            ids = await cls.filter(
+                day__lt=before
+            ).limit(batch_size).values_list("id",
+                                            flat=True)
+            if len(ids) == 0:
+                return deleted
+            deleted += await cls.filter(id__in=ids).delete()
 
     def __str__(self):
         """
-        Return a string representation of the AIMetadata instance.
-
-        :returns: The key of the metadata.
+        Return a string representation of the AIUsage instance.
         """
-        return f"{self.user.global_name} ({self.user.id}) used {self.usage_today} requests today"
+        return (
+            f"{self.user_id} used {self.requests} requests and "
+            f"{self.tokens} tokens on {self.day}"
+        )
+
+
+class TranslationCacheEntry(BaseModel):
+    """
+    A cached code translation, shared by all users.
+
+    The key is the hash of the whitespace-normalised code, the target
+    language and the model (see utils/ai/translationCache.py).
+    """
+    key = fields.CharField(
+        max_length=64,
+        pk=True,
+        description="The SHA-256 hash of the normalised request as hex"
+    )
+    model = fields.CharField(
+        max_length=64,
+        description="The OpenAI model of the translation"
+    )
+    response = fields.JSONField(
+        description="The translation as returned by the OpenAI API"
+    )
+    tokens_used = fields.IntField(
+        description="The tokens the translation cost when it was created"
+    )
+    hits = fields.IntField(
+        description="How often the translation was served from the cache",
+        default=0
+    )
+    created_at = fields.DatetimeField(
+        description="When the translation was created",
+        auto_now_add=True
+    )
+    last_used_at = fields.DatetimeField(
+        description="When the translation was last created or served",
+        index=True
+    )
@@ -1,3 +1,4 @@
+import os
 from enum import Enum
 from typing import TYPE_CHECKING
 
@@ -38,20 +39,91 @@ class Meme(BaseModel):
         related_name="memes"
     )
     date = fields.DatetimeField(description="The date the meme was sent")
+    phash = fields.CharField(
+        max_length=16,
+        null=True,
+        index=True,
+        description="The perceptual hash (dHash) of the meme image as hex"
+    )
+    duplicate_of: fields.ForeignKeyNullableRelation[
+        "Meme"] = fields.ForeignKeyField(
+            "models.Meme",
+            related_name="duplicates",
+            null=True,
+            on_delete=fields.SET_NULL,
+            description="The original meme if this meme is a repost"
+        )
+    duplicate_of_id: str | None
+    content_hash = fields.CharField(
+        max_length=64,
+        null=True,
+        index=True,
+        description=(
+            "The SHA-256 hash of the stored image file, None for files in "
+            "the legacy flat layout"
+        )
+    )
+
+    @property
+    def file_name(self) -> str:
+        """
+        The name of the image file of the meme in the legacy flat layout.
+        """
+        return f"{self.uuid}.{self.format.value}"
+
+    @property
+    def file_path(self) -> str:
+        """
+        The path of the image file relative to a meme folder.
 
-    async def create_embed(self,
-                           search: str | None) -> tuple[discord.Embed,
-                                                        discord.File]:
+        Files are addressed by their content hash and sharded into two
+        directory levels (`ab/cd/abcd….png`), memes that were stored before
+        the content-addressed layout keep their flat `file_name`.
+        """
+        if self.content_hash is None:
+            return self.file_name
+
+        return Meme.content_file_path(self.content_hash, self.format)
+
+    @staticmethod
+    def content_file_path(content_hash: str, meme_format: MemeFormat) -> str:
+        """
+        The sharded path of a content-addressed image file.
+
+        :param content_hash: The SHA-256 hash of the file as hex.
+        :param meme_format: The format of the image.
+        :returns: The path relative to a meme folder.
+        """
+        return os.path.join(
+            content_hash[:2],
+            content_hash[2:4],
+            f"{content_hash}.{meme_format.value}"
+        )
+
+    async def create_embed(
+        self,
+        search: str | None,
+        image_path: str | None = None
+    ) -> tuple[discord.Embed,
+               discord.File]:
         """
         Create a Discord embed for the meme.
 
         :param search: The search term to highlight in the embed, if any.
+        :param image_path: The variant of the image to upload, the original
+            if None (see memeVariantUtils).
         :returns: The created embed and the image file.
         """
+        if image_path is None:
+            image_path = os.path.join(
+                Constants.FILE_PATHS.RAW_MEME_FOLDER,
+                self.file_path
+            )
+
         await self.fetch_related("author")
         image_file = discord.File(
-            f"{Constants.FILE_PATHS.RAW_MEME_FOLDER}/{self.uuid}.{self.format.value}",
-            filename=f"{self.uuid}.{self.format.value}"
+            image_path,
+            filename=f"{self.uuid}{os.path.splitext(image_path)[1]}"
         )
 
         embed = discord.Embed(
@@ -3,10 +3,9 @@ from typing import TYPE_CHECKING
 from tortoise import fields
 
 from models.database.baseModel import BaseModel
-from utils.constants import Constants
 
 if TYPE_CHECKING:
-    from models.database.aiData import AIMetadata
+    from models.database.aiData import AIUsage
 
 
 class User(BaseModel):
@@ -23,20 +22,7 @@ class User(BaseModel):
         default=False,
         description="Whether this user is an external (non-Discord) user"
     )
-    ai_metadata: fields.OneToOneRelation["AIMetadata"]
-
-    async def remaining_ai_requests(self):
-        """
-        Return the number of remaining requests for the AI service.
-        """
-        await self.fetch_related("ai_metadata")
-        return Constants.AI.MAX_TRANSLATE_REQUESTS_PER_DAY - self.ai_metadata.usage_today
-
-    async def increment_ai_usage(self):
-        """
-        Increment the usage of the AI service by one.
-        """
-        await self.ai_metadata.increment_usage()
+    ai_usage: fields.ReverseRelation["AIUsage"]
 
     def __str__(self):
         return self.display_name
@@ -0,0 +1,33 @@
+import discord.ui
+
+from models.database.memeData import Meme
+
+
+class MemeView(discord.ui.View):
+    """
+    Offers the original image of a meme that was sent as a preview.
+    """
+
+    def __init__(self, meme: Meme):
+        super().__init__()
+        self.meme = meme
+
+    @discord.ui.button(label="Original", emoji="🖼️")
+    async def send_original(
+        self,
+        button: discord.ui.Button["MemeView"],
+        interaction: discord.Interaction
+    ):
+        embed, image_file = await self.meme.create_embed(None)
+
+        # the original is only needed once
+        button.disabled = True
+        await interaction.response.edit_message(view=self)
+
+        try:
+            await interaction.followup.send(embed=embed, file=image_file)
+        except discord.HTTPException:
+            await interaction.followup.send(
+                "Das Original ist zu groß für Discord.",
+                ephemeral=True
+            )
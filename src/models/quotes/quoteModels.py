@@ -1,9 +1,11 @@
+import sys
 from dataclasses import dataclass
+from datetime import datetime
 
-from discord import Message
+from discord import Member, Message, User
 
 
-@dataclass
+@dataclass(slots=True)
 class PartialMessage:
     content: str | None
     jump_url: str | None
@@ -27,3 +29,78 @@ class PartialMessage:
             jump_url=message.jump_url,
             author_name=message.author.display_name if message.author else "[Unbekannt]",
         )
+
+
+@dataclass(slots=True)
+class MessageAuthor:
+    id: int
+    name: str
+    display_name: str
+
+    @classmethod
+    def from_discord_user(cls, user: User | Member) -> "MessageAuthor":
+        """
+        Create a MessageAuthor from a discord.User or discord.Member.
+
+        Args:
+            user: The Discord user to convert.
+
+        Returns:
+            A MessageAuthor with the id and both names of the user.
+        """
+        return cls(
+            id=int(user.id),
+            name=user.name,
+            display_name=user.display_name,
+        )
+
+
+@dataclass(slots=True)
+class CollectedMessage:
+    """
+    Everything needed to store and post a quoted message later on.
+
+    Unlike a discord.Message it keeps no references to the embeds,
+    attachments, guild or connection state of the message.
+    """
+    message: PartialMessage
+    author: MessageAuthor
+    created_at: datetime
+
+    @classmethod
+    def from_discord_message(cls, message: Message) -> "CollectedMessage":
+        """
+        Create a CollectedMessage from a discord.Message.
+
+        Args:
+            message: The discord.Message to convert.
+
+        Returns:
+            A CollectedMessage with the partial message, its author and
+            creation date.
+        """
+        return cls(
+            message=PartialMessage.from_discord_message(message),
+            author=MessageAuthor.from_discord_user(message.author),
+            created_at=message.created_at,
+        )
+
+    def size(self) -> int:
+        """
+        Estimate the memory used by this message.
+
+        Returns:
+            The size of the objects and their strings in bytes.
+        """
+        strings = (
+            self.message.content,
+            self.message.jump_url,
+            self.message.author_name,
+            self.author.name,
+            self.author.display_name,
+        )
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.message) +
+            sys.getsizeof(self.author) + sys.getsizeof(self.created_at) +
+            sum(sys.getsizeof(string) for string in strings if string)
+        )
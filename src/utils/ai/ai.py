@@ -1,44 +1,564 @@
+import asyncio
 import dataclasses
 import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
 
-from openai import NotFoundError, OpenAI
+import httpx
+from openai import AsyncOpenAI, NotFoundError
 
 from models.ai.response import CodeTranslateResponse
 from utils.ai import system_data
+from utils.ai.modelRouter import ModelRouter, ModelTier, ModelTierStats
+from utils.ai.preflight import estimate_tokens, split_code
+from utils.ai.translationCache import translation_key
 from utils.constants import Constants
 
+logger = logging.getLogger("bot")
+
+# called from the loop that reads the completion stream, so it must only
+# store the lines and never wait for anything
+PartialCodeCallback = Callable[[list[str]], None]
+
+_CODE_KEY = re.compile(r'"translated_code"\s*:\s*\[')
+# a \uXXXX escape whose hex digits have not arrived yet
+_INCOMPLETE_UNICODE = re.compile(r'(?<!\\)((?:\\\\)*)\\u[0-9a-fA-F]{0,3}$')
+
+
+def extract_partial_code(content: str) -> list[str] | None:
+    """
+    Read the lines of `translated_code` from an incomplete JSON completion.
+
+    Args:
+        content (str): The completion received so far.
+
+    Returns:
+        list[str] | None: The complete lines and the incomplete last line,
+        None if the array has not started yet.
+    """
+    match = _CODE_KEY.search(content)
+    if match is None:
+        return None
+
+    lines: list[str] = []
+    index = match.end()
+    while index < len(content):
+        char = content[index]
+        if char in " \t\r\n,":
+            index += 1
+            continue
+        if char != '"':
+            # the end of the array
+            break
+
+        end = index + 1
+        escaped = False
+        while end < len(content):
+            if escaped:
+                escaped = False
+            elif content[end] == "\\":
+                escaped = True
+            elif content[end] == '"':
+                break
+            end += 1
+
+        raw = content[index + 1:end]
+        if end == len(content):
+            # an incomplete escape sequence cannot be decoded yet
+            if escaped:
+                raw = raw[:-1]
+            raw = _INCOMPLETE_UNICODE.sub(r"\1", raw)
+            lines.append(json.loads(f'"{raw}"'))
+            break
+
+        lines.append(json.loads(f'"{raw}"'))
+        index = end + 1
+
+    return lines
+
+
+class _Flight:
+    """
+    A completion in flight, shared by all identical concurrent requests.
+    """
+
+    def __init__(self) -> None:
+        self.task: asyncio.Task[CodeTranslateResponse] | None = None
+        self.listeners: list[PartialCodeCallback] = []
+
+    def publish(self, lines: list[str]) -> None:
+        for listener in list(self.listeners):
+            try:
+                listener(lines)
+            except Exception as ex:
+                # one broken listener must not fail the shared completion
+                logger.warning("Partial code listener failed: %s", ex)
+
+
+@dataclass
+class AIRequestStats:
+    """
+    The latency counters of the completions sent to OpenAI.
+    """
+    completed: int
+    failed: int
+    waiting: int
+    in_flight: int
+    max_in_flight: int
+    avg_queue_wait_ms: float | None
+    avg_completion_ms: float | None
+    last_queue_wait_ms: float | None
+    last_completion_ms: float | None
+    # since the request was queued, only for streamed completions
+    avg_first_content_ms: float | None
+    last_first_content_ms: float | None
+    # requests that joined an identical completion in flight
+    coalesced: int
+
 
 class AIUtils:
+    """
+    Sends completions to OpenAI without blocking the event loop.
+
+    All requests share one pooled HTTP client. At most
+    `Constants.AI.MAX_CONCURRENT_COMPLETIONS` completions are in flight,
+    further requests wait for a free slot. The time spent waiting and the
+    time of the completion itself are recorded for every request.
+
+    Identical concurrent requests (the same normalised code, language and
+    model, see `translation_key`) share a single completion, every caller
+    gets its own copy of the result. Code that is too large for one
+    completion is split into chunks (see `utils.ai.preflight`) that are
+    translated concurrently.
+    """
 
     def __init__(self):
-        self.client = OpenAI(api_key=Constants.SECRETS.OPENAI_TOKEN)
-
-    def code_translate(self, language: str, code: str) -> CodeTranslateResponse:
-        response = self.client.chat.completions.create(
-            model=Constants.AI.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_data.code_translate_system_message},
-                {"role": "user", "content": f"{{\"code\": \"{code}\", \"language\": \"{language}\"}}"}
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Constants.AI.MAX_CONNECTIONS,
+                max_keepalive_connections=Constants.AI.MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(
+                Constants.AI.READ_TIMEOUT_SECONDS,
+                connect=Constants.AI.CONNECT_TIMEOUT_SECONDS
+            )
+        )
+        self.client = AsyncOpenAI(
+            api_key=Constants.SECRETS.OPENAI_TOKEN,
+            http_client=self.http_client,
+            max_retries=Constants.AI.MAX_RETRIES
+        )
+        self.router = ModelRouter.from_config(
+            Constants.AI.MODEL_TIERS,
+            Constants.AI.MODEL_LATENCY_EWMA_ALPHA,
+            Constants.AI.MODEL_LATENCY_PROBE_INTERVAL
+        )
+        self.max_in_flight = Constants.AI.MAX_CONCURRENT_COMPLETIONS
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        self._waiting = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._queue_wait_ms_total = 0.0
+        self._completion_ms_total = 0.0
+        self._last_queue_wait_ms: float | None = None
+        self._last_completion_ms: float | None = None
+        self._streamed = 0
+        self._first_content_ms_total = 0.0
+        self._last_first_content_ms: float | None = None
+        self._flights: dict[str, _Flight] = {}
+        self._coalesced = 0
+
+    async def close(self) -> None:
+        """
+        Close the pooled HTTP connections.
+        """
+        await self.client.close()
+
+    def stats(self) -> AIRequestStats:
+        """
+        Return the latency counters of all requests so far.
+        """
+        requests = self._completed + self._failed
+        return AIRequestStats(
+            completed=self._completed,
+            failed=self._failed,
+            waiting=self._waiting,
+            in_flight=self._in_flight,
+            max_in_flight=self.max_in_flight,
+            avg_queue_wait_ms=(
+                self._queue_wait_ms_total / requests if requests > 0 else None
+            ),
+            avg_completion_ms=(
+                self._completion_ms_total / requests if requests > 0 else None
+            ),
+            last_queue_wait_ms=self._last_queue_wait_ms,
+            last_completion_ms=self._last_completion_ms,
+            avg_first_content_ms=(
+                self._first_content_ms_total /
+                self._streamed if self._streamed > 0 else None
+            ),
+            last_first_content_ms=self._last_first_content_ms,
+            coalesced=self._coalesced,
+        )
+
+    async def code_translate(
+        self,
+        language: str,
+        code: str,
+        on_partial: PartialCodeCallback | None = None
+    ) -> CodeTranslateResponse:
+        """
+        Translate code into a language or dialect.
+
+        If an identical request is already in flight, its completion is
+        awaited instead of sending a new one.
+
+        Args:
+            language (str): The target language or dialect.
+            code (str): The code to translate.
+            on_partial (PartialCodeCallback | None): If given, the
+                completion is streamed and the callback is called with the
+                lines of `translated_code` received so far whenever they
+                change. The last line may be incomplete. The callback runs
+                inside the loop that reads the stream and must not block,
+                slow work like message edits belongs in a task of its own.
+                A request that joins a completion in flight only receives
+                partial code if that completion is streamed.
+
+        Returns:
+            CodeTranslateResponse: The parsed translation.
+        """
+        key = translation_key(code, language, Constants.AI.OPENAI_MODEL)
+        flight = self._flights.get(key)
+
+        if flight is None:
+            flight = _Flight()
+            flight.task = asyncio.create_task(
+                self._translate_chunks(
+                    language,
+                    code,
+                    flight.publish if on_partial is not None else None
+                )
+            )
+            flight.task.add_done_callback(lambda task: self._land(key, task))
+            self._flights[key] = flight
+        else:
+            self._coalesced += 1
+            logger.info(
+                "Joined translation %s in flight, %d requests saved",
+                key[:12],
+                self._coalesced
+            )
+
+        if on_partial is not None:
+            flight.listeners.append(on_partial)
+        try:
+            # a cancelled caller must not cancel the shared completion
+            response = await asyncio.shield(flight.task)  # type: ignore
+        finally:
+            if on_partial is not None:
+                flight.listeners.remove(on_partial)
+
+        return dataclasses.replace(
+            response,
+            translated_code=list(response.translated_code)
+        )
+
+    def _land(
+        self,
+        key: str,
+        task: asyncio.Task[CodeTranslateResponse]
+    ) -> None:
+        self._flights.pop(key, None)
+        if not task.cancelled():
+            # the callers may all be gone, mark a failure as retrieved
+            task.exception()
+
+    async def _translate_chunks(
+        self,
+        language: str,
+        code: str,
+        on_partial: PartialCodeCallback | None
+    ) -> CodeTranslateResponse:
+        chunks = split_code(code, Constants.AI.CHUNK_MAX_TOKENS)
+        if len(chunks) == 1:
+            return await self._translate(language, code, on_partial)
+
+        logger.info("Translating code in %d chunks", len(chunks))
+        partial: list[list[str]] = [[] for _ in chunks]
+
+        def chunk_listener(
+            index: int,
+            on_partial: PartialCodeCallback
+        ) -> PartialCodeCallback:
+
+            def update(lines: list[str]) -> None:
+                partial[index] = lines
+                on_partial([line for part in partial for line in part])
+
+            return update
+
+        # the first failing chunk cancels the others
+        async with asyncio.TaskGroup() as group:
+            tasks = [
+                group.create_task(
+                    self._translate(
+                        language,
+                        chunk,
+                        chunk_listener(index,
+                                       on_partial)
+                        if on_partial is not None else None
+                    )
+                ) for index,
+                chunk in enumerate(chunks)
+            ]
+        responses = [task.result() for task in tasks]
+
+        return CodeTranslateResponse(
+            detected_language=responses[0].detected_language,
+            translated_language=responses[0].translated_language,
+            translated_code=[
+                line for response in responses
+                for line in response.translated_code
             ],
-            response_format=system_data.code_translate_response_format, # type: ignore
-            temperature=1,
-            max_completion_tokens=1400,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0
+            humorous_comment=responses[0].humorous_comment,
+            tokens_used=sum(response.tokens_used for response in responses)
         )
 
-        if response.choices[0].message.content is None:
+    async def _translate(
+        self,
+        language: str,
+        code: str,
+        on_partial: PartialCodeCallback | None
+    ) -> CodeTranslateResponse:
+        queued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        started = time.perf_counter()
+        queue_wait_ms = (started - queued) * 1000
+        self._in_flight += 1
+        failed = True
+        first_content_ms: float | None = None
+
+        try:
+            content, tokens_used, first_content_ms = await self._route(
+                language,
+                code,
+                on_partial,
+                queued
+            )
+            failed = False
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+            self._record(queue_wait_ms, started, failed, first_content_ms)
+
+        if content is None:
             raise ValueError(
                 "There was error getting the data from the OpenAI API."
             )
 
-        json_data = json.loads(response.choices[0].message.content)
+        json_data = json.loads(content)
 
         return CodeTranslateResponse(
             detected_language=json_data["detected_language"],
             translated_language=json_data["translated_language"],
             translated_code=json_data["translated_code"],
             humorous_comment=json_data["humorous_comment"],
-            tokens_used=response.usage.total_tokens
+            tokens_used=tokens_used
+        )
+
+    async def _route(
+        self,
+        language: str,
+        code: str,
+        on_partial: PartialCodeCallback | None,
+        queued: float
+    ) -> tuple[str | None,
+               int,
+               float | None]:
+        tiers = self.router.route(estimate_tokens(code))
+
+        for index, tier in enumerate(tiers):
+            started = time.perf_counter()
+            first_content_ms: float | None = None
+            try:
+                if on_partial is None:
+                    content, tokens_used = await self._complete(
+                        tier,
+                        language,
+                        code
+                    )
+                else:
+                    content, tokens_used, first_content_ms = await self._stream(
+                        tier,
+                        language,
+                        code,
+                        on_partial,
+                        queued
+                    )
+            except Exception as ex:
+                self.router.record(
+                    tier,
+                    (time.perf_counter() - started) * 1000,
+                    0,
+                    failed=True,
+                    fallback=index > 0
+                )
+                if index == len(tiers) - 1:
+                    raise
+                logger.warning(
+                    "Model tier %s failed, falling back to %s: %s",
+                    tier.name,
+                    tiers[index + 1].name,
+                    ex
+                )
+                continue
+
+            self.router.record(
+                tier,
+                (time.perf_counter() - started) * 1000,
+                tokens_used,
+                failed=False,
+                fallback=index > 0
+            )
+            return content, tokens_used, first_content_ms
+
+        raise RuntimeError("No model tier to route to")
+
+    def model_stats(self) -> list[ModelTierStats]:
+        """
+        Return the latency, token and failure counters of the model tiers.
+        """
+        return self.router.stats()
+
+    def _translate_request(self,
+                           tier: ModelTier,
+                           language: str,
+                           code: str) -> dict[str,
+                                              Any]:
+        return {
+            "model":
+            tier.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system_data.code_translate_system_message
+                },
+                {
+                    "role":
+                    "user",
+                    "content":
+                    f"{{\"code\": \"{code}\", \"language\": \"{language}\"}}"
+                }
+            ],
+            "response_format":
+            system_data.code_translate_response_format,
+            "temperature":
+            1,
+            "max_completion_tokens":
+            tier.max_completion_tokens,
+            "top_p":
+            1,
+            "frequency_penalty":
+            0,
+            "presence_penalty":
+            0,
+        }
+
+    async def _complete(self,
+                        tier: ModelTier,
+                        language: str,
+                        code: str) -> tuple[str | None,
+                                            int]:
+        response = await self.client.chat.completions.create(
+            **self._translate_request(tier,
+                                      language,
+                                      code)
+        )
+        return response.choices[0].message.content, response.usage.total_tokens
+
+    async def _stream(
+        self,
+        tier: ModelTier,
+        language: str,
+        code: str,
+        on_partial: PartialCodeCallback,
+        queued: float
+    ) -> tuple[str | None,
+               int,
+               float | None]:
+        stream = await self.client.chat.completions.create(
+            **self._translate_request(tier,
+                                      language,
+                                      code),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        content = ""
+        tokens_used = 0
+        lines: list[str] | None = None
+        first_content_ms: float | None = None
+
+        async for chunk in stream:
+            # the usage arrives in a last chunk without choices
+            if chunk.usage is not None:
+                tokens_used = chunk.usage.total_tokens
+            if len(chunk.choices) == 0 or not chunk.choices[0].delta.content:
+                continue
+
+            content += chunk.choices[0].delta.content
+            partial = extract_partial_code(content)
+            if partial is None or partial == lines or not any(partial):
+                continue
+
+            if first_content_ms is None:
+                first_content_ms = (time.perf_counter() - queued) * 1000
+            lines = partial
+            on_partial(lines)
+
+        return content or None, tokens_used, first_content_ms
+
+    def _record(
+        self,
+        queue_wait_ms: float,
+        started: float,
+        failed: bool,
+        first_content_ms: float | None
+    ):
+        completion_ms = (time.perf_counter() - started) * 1000
+
+        if failed:
+            self._failed += 1
+        else:
+            self._completed += 1
+        self._queue_wait_ms_total += queue_wait_ms
+        self._completion_ms_total += completion_ms
+        self._last_queue_wait_ms = queue_wait_ms
+        self._last_completion_ms = completion_ms
+        if first_content_ms is not None:
+            self._streamed += 1
+            self._first_content_ms_total += first_content_ms
+            self._last_first_content_ms = first_content_ms
+
+        logger.info(
+            "OpenAI completion %s: waited %.0f ms for a slot, took %.0f ms, "
+            "first content after %s (%d in flight, %d waiting)",
+            "failed" if failed else "done",
+            queue_wait_ms,
+            completion_ms,
+            f"{first_content_ms:.0f} ms"
+            if first_content_ms is not None else "-",
+            self._in_flight,
+            self._waiting
         )
@@ -0,0 +1,193 @@
+"""
+Routing of completions between OpenAI models.
+
+The models are configured as tiers in `Constants.AI.MODEL_TIERS`, from the
+smallest to the largest. A request goes to the first tier whose size limit
+fits the estimated tokens of its code and whose recent latency is within the
+tier's budget. The larger tiers follow as fallbacks if a model fails, tiers
+without a size limit are only used as fallbacks. The latency, tokens and
+failures of every tier are recorded, so the table can be tuned from
+`$ai_stats`.
+"""
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class ModelTier:
+    """
+    A model that completions can be routed to.
+    """
+    name: str
+    model: str
+    # the completions of this tier are cut off at this size
+    max_completion_tokens: int
+    # the largest code, in estimated tokens, routed to this tier first, None
+    # if the tier is only a fallback
+    max_code_tokens: int | None = None
+    # the tier is skipped while its average latency is higher
+    max_latency_ms: float | None = None
+
+
+@dataclass
+class ModelTierStats:
+    """
+    The counters of a model tier since the bot started.
+    """
+    name: str
+    model: str
+    requests: int
+    failures: int
+    fallbacks: int
+    tokens: int
+    avg_latency_ms: float | None
+
+
+class ModelRouter:
+    """
+    Picks the model tiers for a completion and records how they performed.
+
+    The latency of a tier is an exponentially weighted moving average, so a
+    slow phase of a model is noticed after a few requests. A tier that is
+    skipped for its latency still gets every `probe_interval`-th of those
+    requests, so its recovery is noticed as well.
+    """
+
+    def __init__(
+        self,
+        tiers: list[ModelTier],
+        latency_alpha: float,
+        probe_interval: int
+    ) -> None:
+        if len(tiers) == 0:
+            raise ValueError("At least one model tier is needed")
+
+        self.tiers = tiers
+        self.latency_alpha = latency_alpha
+        self.probe_interval = probe_interval
+        self._skipped = {tier.name: 0 for tier in tiers}
+        self._stats = {
+            tier.name:
+            ModelTierStats(
+                name=tier.name,
+                model=tier.model,
+                requests=0,
+                failures=0,
+                fallbacks=0,
+                tokens=0,
+                avg_latency_ms=None
+            )
+            for tier in tiers
+        }
+
+    @classmethod
+    def from_config(
+        cls,
+        config: list[dict[str,
+                          Any]],
+        latency_alpha: float,
+        probe_interval: int
+    ) -> "ModelRouter":
+        """
+        Create a router from the tier table in the constants.
+        """
+        return cls(
+            [ModelTier(**tier) for tier in config],
+            latency_alpha,
+            probe_interval
+        )
+
+    def route(self, code_tokens: int) -> list[ModelTier]:
+        """
+        Return the tiers to try for a completion in order.
+
+        The first tier is the smallest one that fits the code and is within
+        its latency budget. If every fitting tier is too slow, the fastest
+        of them is used. All larger tiers, including the fallback-only
+        ones, follow as fallbacks.
+
+        Args:
+            code_tokens (int): The estimated tokens of the code.
+
+        Returns:
+            list[ModelTier]: The tiers, the first one is tried first.
+        """
+        fitting = [
+            tier for tier in self.tiers if tier.max_code_tokens is not None
+            and tier.max_code_tokens >= code_tokens
+        ]
+        if len(fitting) == 0:
+            # larger than every limit, the preflight check decides about that
+            return [self.tiers[-1]]
+
+        chosen = next(
+            (tier for tier in fitting if self._within_budget(tier)),
+            None
+        )
+        if chosen is None:
+            chosen = min(
+                fitting,
+                key=lambda tier: self._stats[tier.name].avg_latency_ms or 0.0
+            )
+
+        return [chosen, *self.tiers[self.tiers.index(chosen) + 1:]]
+
+    def record(
+        self,
+        tier: ModelTier,
+        latency_ms: float,
+        tokens: int,
+        failed: bool,
+        fallback: bool
+    ) -> None:
+        """
+        Record a completion on a tier.
+
+        Args:
+            tier (ModelTier): The tier the completion was sent to.
+            latency_ms (float): The time the completion took.
+            tokens (int): The tokens the completion used.
+            failed (bool): Whether the completion failed.
+            fallback (bool): Whether the tier was used after another tier
+                failed.
+        """
+        stats = self._stats[tier.name]
+        stats.requests += 1
+        stats.tokens += tokens
+        if failed:
+            stats.failures += 1
+        if fallback:
+            stats.fallbacks += 1
+
+        # failures often return early and would make a tier look fast
+        if not failed:
+            if stats.avg_latency_ms is None:
+                stats.avg_latency_ms = latency_ms
+            else:
+                stats.avg_latency_ms += self.latency_alpha * (
+                    latency_ms - stats.avg_latency_ms
+                )
+
+    def stats(self) -> list[ModelTierStats]:
+        """
+        Return the counters of all tiers in the order of the tier table.
+        """
+        return [
+            ModelTierStats(**vars(self._stats[tier.name]))
+            for tier in self.tiers
+        ]
+
+    def _within_budget(self, tier: ModelTier) -> bool:
+        latency = self._stats[tier.name].avg_latency_ms
+        if (
+            tier.max_latency_ms is None or latency is None
+            or latency <= tier.max_latency_ms
+        ):
+            return True
+
+        self._skipped[tier.name] += 1
+        if self._skipped[tier.name] >= self.probe_interval:
+            self._skipped[tier.name] = 0
+            return True
+        return False
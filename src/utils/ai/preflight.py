@@ -0,0 +1,204 @@
+"""
+Local checks of a translation request before any money is spent.
+
+The size of a request is estimated from its length, a token is roughly
+`Constants.AI.CHARS_PER_TOKEN` characters of code. Code that would not fit
+into one completion is split at top-level boundaries (unindented lines that
+start a function, class or other block) into chunks that are translated
+separately and put back together in order.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+
+from utils.ai import system_data
+from utils.constants import Constants
+
+# an unindented line that starts a new top-level block in common languages
+_TOP_LEVEL_BLOCK = re.compile(
+    r"^(?:@|async\s+def\b|def\b|class\b|function\b|fn\b|func\b|fun\b|"
+    r"public\b|private\b|protected\b|static\b|struct\b|enum\b|interface\b|"
+    r"impl\b|type\b|export\b|const\b|let\b|var\b|sub\b|module\b|"
+    r"namespace\b|template\b|#include\b|import\b|from\b|package\b|using\b)"
+)
+# decorators and comments that belong to the block below them
+_HEADER_PREFIXES = ("@", "#", "//", "/*", "*", "--")
+# an unindented line that continues the block before it
+_CONTINUATION = re.compile(
+    r"^(?:[)\]}]|else\b|elif\b|except\b|finally\b|catch\b)"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without a tokenizer.
+    """
+    return math.ceil(len(text) / Constants.AI.CHARS_PER_TOKEN)
+
+
+def estimate_output_tokens(code: str) -> int:
+    """
+    Estimate the completion tokens of the translation of a code chunk.
+
+    Translated identifiers are usually longer than the original ones and
+    the JSON response adds the languages and the comment.
+    """
+    return (
+        math.ceil(estimate_tokens(code) * Constants.AI.OUTPUT_TOKEN_RATIO) +
+        Constants.AI.RESPONSE_OVERHEAD_TOKENS
+    )
+
+
+def _segments(code: str) -> list[str]:
+    """
+    Split code into top-level blocks, every block keeps its leading lines.
+    """
+    segments: list[str] = []
+    current: list[str] = []
+    previous_blank = True
+
+    for line in code.splitlines(keepends=True):
+        starts_block = (
+            line.strip() != "" and not line[0].isspace()
+            and _CONTINUATION.match(line) is None
+            and (previous_blank or _TOP_LEVEL_BLOCK.match(line) is not None)
+        )
+        if starts_block and current and not _is_header(current[-1]):
+            segments.append("".join(current))
+            current = []
+        current.append(line)
+        previous_blank = line.strip() == ""
+
+    if current:
+        segments.append("".join(current))
+    return segments
+
+
+def _is_header(line: str) -> bool:
+    stripped = line.strip()
+    return (
+        not line[:1].isspace() and stripped.startswith(_HEADER_PREFIXES)
+        and not stripped.startswith("#include")
+    )
+
+
+def _split_line(line: str, max_tokens: int) -> list[str]:
+    """
+    Cut a single line that is too large at whitespace, e.g. code pasted into
+    the one-line slash command option.
+    """
+    max_chars = max_tokens * Constants.AI.CHARS_PER_TOKEN
+    parts: list[str] = []
+    while len(line) > max_chars:
+        cut = line.rfind(" ", 0, max_chars) + 1
+        if cut <= 0:
+            cut = max_chars
+        parts.append(line[:cut])
+        line = line[cut:]
+    if line:
+        parts.append(line)
+    return parts
+
+
+def _split_lines(segment: str, max_tokens: int) -> list[str]:
+    """
+    Split a block that is too large on its own at line boundaries.
+    """
+    parts: list[str] = []
+    current = ""
+    for line in segment.splitlines(keepends=True):
+        if current and estimate_tokens(current + line) > max_tokens:
+            parts.append(current)
+            current = ""
+        if estimate_tokens(line) > max_tokens:
+            *full, current = _split_line(line, max_tokens)
+            parts.extend(full)
+            continue
+        current += line
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_code(code: str, max_tokens: int) -> list[str]:
+    """
+    Split code into chunks of at most `max_tokens` estimated tokens.
+
+    Top-level blocks are packed into chunks in order, a block is only cut
+    at line boundaries if it is larger than a chunk on its own. Joining the
+    chunks gives the original code.
+
+    Args:
+        code (str): The code to split.
+        max_tokens (int): The estimated tokens of a chunk.
+
+    Returns:
+        list[str]: The chunks in order.
+    """
+    if estimate_tokens(code) <= max_tokens:
+        return [code]
+
+    chunks: list[str] = []
+    current = ""
+    for segment in _segments(code):
+        if estimate_tokens(segment) > max_tokens:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_lines(segment, max_tokens))
+            continue
+
+        if current and estimate_tokens(current + segment) > max_tokens:
+            chunks.append(current)
+            current = ""
+        current += segment
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass
+class TranslationEstimate:
+    """
+    The estimated size and cost of a translation.
+    """
+    code_tokens: int
+    input_tokens: int
+    output_tokens: int
+    chunks: list[str]
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    @property
+    def too_large(self) -> bool:
+        return self.code_tokens > Constants.AI.MAX_CODE_TOKENS
+
+
+def estimate_translation(code: str) -> TranslationEstimate:
+    """
+    Estimate the tokens of a translation and split the code into chunks.
+
+    Every chunk is sent with the system message, so it is counted once per
+    chunk.
+
+    Args:
+        code (str): The code to translate.
+
+    Returns:
+        TranslationEstimate: The estimate and the chunks to translate.
+    """
+    chunks = split_code(code, Constants.AI.CHUNK_MAX_TOKENS)
+    system_tokens = estimate_tokens(system_data.code_translate_system_message)
+
+    return TranslationEstimate(
+        code_tokens=estimate_tokens(code),
+        input_tokens=sum(
+            system_tokens + estimate_tokens(chunk) for chunk in chunks
+        ),
+        output_tokens=sum(estimate_output_tokens(chunk) for chunk in chunks),
+        chunks=chunks,
+    )
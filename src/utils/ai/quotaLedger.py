@@ -0,0 +1,143 @@
+"""
+The daily quota of the AI service.
+
+Every user may send `Constants.AI.MAX_TRANSLATE_REQUESTS_PER_DAY` requests
+and spend `Constants.AI.MAX_TRANSLATE_TOKENS_PER_DAY` tokens a day. A request
+first reserves a slot, which is a single conditional upsert of the user's
+`AIUsage` row, so concurrent requests can never overshoot the request limit.
+After the completion the tokens it actually used are committed, a failed
+completion refunds its slot. The token limit is checked when a slot is
+reserved, the last request of a day may therefore end above it.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+
+from tortoise.expressions import F
+
+from models.database.aiData import AIUsage
+from utils.constants import Constants
+
+
+@dataclass
+class QuotaRemaining:
+    """
+    The quota a user has left today.
+    """
+    requests: int
+    tokens: int
+
+    @property
+    def usable_requests(self) -> int:
+        """
+        The requests that can still be made, none once the tokens are used.
+        """
+        return max(self.requests, 0) if self.tokens > 0 else 0
+
+
+@dataclass
+class QuotaReservation:
+    """
+    A reserved request slot of a user on one day.
+    """
+    user_id: int
+    day: date
+    remaining: QuotaRemaining
+
+
+class QuotaLedger:
+    """
+    Reserves, commits and refunds the daily AI quota of users.
+    """
+
+    def __init__(self, max_requests: int, max_tokens: int) -> None:
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+
+    async def reserve(self, user_id: int) -> QuotaReservation | None:
+        """
+        Reserve one request of a user today.
+
+        The usage row of the day is created or incremented in one statement
+        that only succeeds while both limits are not reached.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            QuotaReservation | None: The reservation, None if the quota of
+            the user is used up.
+        """
+        day = AIUsage.today()
+        rows = await AIUsage._meta.db.execute_query_dict(
+            """
+            INSERT INTO "aiusage" ("user_id", "day", "requests", "tokens")
+            VALUES (?, ?, 1, 0)
+            ON CONFLICT ("user_id", "day")
+            DO UPDATE SET "requests" = "requests" + 1
+            WHERE "requests" < ? AND "tokens" < ?
+            RETURNING "requests", "tokens"
+            """,
+            [user_id,
+             day.isoformat(),
+             self.max_requests,
+             self.max_tokens]
+        )
+        if len(rows) == 0:
+            return None
+
+        return QuotaReservation(
+            user_id=user_id,
+            day=day,
+            remaining=QuotaRemaining(
+                requests=self.max_requests - rows[0]["requests"],
+                tokens=self.max_tokens - rows[0]["tokens"],
+            ),
+        )
+
+    async def commit(
+        self,
+        reservation: QuotaReservation,
+        tokens_used: int
+    ) -> None:
+        """
+        Book the tokens a reserved request actually used.
+        """
+        await AIUsage.filter(user_id=reservation.user_id,
+                             day=reservation.day).update(
+                                 tokens=F("tokens") + tokens_used
+                             )
+        reservation.remaining.tokens -= tokens_used
+
+    async def refund(self, reservation: QuotaReservation) -> None:
+        """
+        Give a reserved request back, e.g. after a failed completion.
+        """
+        await AIUsage.filter(
+            user_id=reservation.user_id,
+            day=reservation.day,
+            requests__gt=0
+        ).update(requests=F("requests") - 1)
+        reservation.remaining.requests += 1
+
+    async def remaining(self, user_id: int) -> QuotaRemaining:
+        """
+        Return the quota a user has left today.
+
+        This is a single lookup on the unique (user, day) index.
+        """
+        rows = await AIUsage.filter(user_id=user_id,
+                                    day=AIUsage.today()
+                                    ).values_list("requests",
+                                                  "tokens")
+        requests, tokens = rows[0] if len(rows) > 0 else (0, 0)
+        return QuotaRemaining(
+            requests=self.max_requests - requests,
+            tokens=self.max_tokens - tokens,
+        )
+
+
+quota_ledger = QuotaLedger(
+    Constants.AI.MAX_TRANSLATE_REQUESTS_PER_DAY,
+    Constants.AI.MAX_TRANSLATE_TOKENS_PER_DAY
+)
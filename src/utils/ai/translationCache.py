@@ -0,0 +1,196 @@
+"""
+A persistent cache of code translations.
+
+The same snippet is often translated into the same dialect several times.
+Translations are stored in SQLite under the hash of the whitespace-normalised
+code, the normalised target language and the model, so a repeated request
+is answered without calling OpenAI. Entries expire after a TTL and the least
+recently used entries are deleted above a size cap.
+"""
+
+import dataclasses
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, cast
+
+from tortoise import timezone
+
+from models.ai.response import CodeTranslateResponse
+from models.database.aiData import TranslationCacheEntry
+from utils.constants import Constants
+
+logger = logging.getLogger("bot")
+
+
+def normalize_code(code: str) -> str:
+    """
+    Collapse all runs of whitespace in a snippet into single spaces.
+    """
+    return " ".join(code.split())
+
+
+def normalize_language(language: str) -> str:
+    """
+    Normalise a target language, "  bavarian" and "Bavarian" are the same.
+    """
+    return " ".join(language.split()).casefold()
+
+
+def translation_key(code: str, language: str, model: str) -> str:
+    """
+    Return the cache key of a translation request.
+
+    Args:
+        code (str): The code to translate.
+        language (str): The target language or dialect.
+        model (str): The OpenAI model.
+
+    Returns:
+        str: The SHA-256 hash of the normalised request as hex.
+    """
+    normalized = json.dumps(
+        [normalize_code(code),
+         normalize_language(language),
+         model]
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+@dataclass
+class TranslationCacheStats:
+    """
+    The counters of the translation cache since the bot started.
+    """
+    hits: int
+    misses: int
+    tokens_saved: int
+
+
+class TranslationCache:
+    """
+    Stores translations in the database and serves repeated requests.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int) -> None:
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+
+        self._hits = 0
+        self._misses = 0
+        self._tokens_saved = 0
+
+    async def get(
+        self,
+        code: str,
+        language: str,
+        model: str
+    ) -> CodeTranslateResponse | None:
+        """
+        Return the cached translation of a request.
+
+        Args:
+            code (str): The code to translate.
+            language (str): The target language or dialect.
+            model (str): The OpenAI model.
+
+        Returns:
+            CodeTranslateResponse | None: The translation marked as cached,
+            None if it is not cached or expired.
+        """
+        key = translation_key(code, language, model)
+        entry = await TranslationCacheEntry.get_or_none(key=key)
+        now = timezone.now()
+
+        if entry is None or entry.created_at < now - self.ttl:
+            self._misses += 1
+            return None
+
+        entry.hits += 1
+        entry.last_used_at = now
+        await entry.save(update_fields=["hits", "last_used_at"])
+
+        self._hits += 1
+        self._tokens_saved += entry.tokens_used
+        logger.info(
+            "Served translation %s from the cache, saved %d tokens",
+            key[:12],
+            entry.tokens_used
+        )
+
+        stored = cast(dict[str, Any], entry.response)
+        return CodeTranslateResponse(
+            **stored,
+            tokens_used=entry.tokens_used,
+            cached=True
+        )
+
+    async def put(
+        self,
+        code: str,
+        language: str,
+        model: str,
+        response: CodeTranslateResponse
+    ) -> None:
+        """
+        Store a fresh translation and prune the cache.
+        """
+        data = dataclasses.asdict(response)
+        del data["tokens_used"]
+        del data["cached"]
+
+        now = timezone.now()
+        await TranslationCacheEntry.update_or_create(
+            key=translation_key(code,
+                                language,
+                                model),
+            defaults={
+                "model": model,
+                "response": data,
+                "tokens_used": response.tokens_used,
+                "hits": 0,
+                "created_at": now,
+                "last_used_at": now,
+            }
+        )
+        await self.prune()
+
+    async def prune(self) -> int:
+        """
+        Delete expired entries and the least recently used entries above
+        the size cap.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        deleted = await TranslationCacheEntry.filter(
+            created_at__lt=timezone.now() - self.ttl
+        ).delete()
+
+        excess = await TranslationCacheEntry.all().count() - self.max_entries
+        if excess > 0:
+            keys = await TranslationCacheEntry.all().order_by(
+                "last_used_at"
+            ).limit(excess).values_list("key",
+                                        flat=True)
+            deleted += await TranslationCacheEntry.filter(key__in=keys).delete()
+
+        return deleted
+
+    def stats(self) -> TranslationCacheStats:
+        """
+        Return the hit counters and the saved tokens.
+        """
+        return TranslationCacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            tokens_saved=self._tokens_saved,
+        )
+
+
+translation_cache = TranslationCache(
+    Constants.AI.TRANSLATION_CACHE_TTL_SECONDS,
+    Constants.AI.TRANSLATION_CACHE_MAX_ENTRIES
+)
@@ -33,6 +33,8 @@ class FilePaths:
     RAW_MEME_FOLDER = "data/memes/raw"
     BANNERIZED_MEME_FOLDER = "data/memes/bannerized"
     OCR_DATA_FOLDER = "data/ocr"
+    PREVIEW_MEME_FOLDER = "data/memes/preview"
+    OCR_BACKFILL_CHECKPOINT = "data/memes/ocr_backfill.json"
     DB_FILE = "data/db.sqlite3"
 
 
@@ -98,9 +100,160 @@ class QuoteWeights:
     USER_WEIGHT = 0.3
 
 
+class QuoteSearch:
+    FTS_CANDIDATE_LIMIT = 300
+    MIN_SCORE = 55
+    SCORING_WORKERS = -1  # -1 uses all cores
+
+
+class QuoteCollection:
+    TTL_SECONDS = 10 * 60
+    MAX_MESSAGES_PER_USER = 10
+    MAX_BYTES = 4 * 1024 * 1024
+
+
+class Users:
+    DIRECTORY_CACHE_SIZE = 1024
+
+
+class OCR:
+    LANGUAGES = ["de", "en"]
+    IDLE_TIMEOUT_SECONDS = 15 * 60
+    # load the models when a worker starts instead of on the first meme
+    PRELOAD = os.getenv("OCR_PRELOAD", "false").lower() == "true"
+    # memes per checkpoint of the re-OCR backfill
+    BACKFILL_CHUNK_SIZE = 16
+    # batched images are padded to a multiple of this many pixels, the images
+    # of the same padded size are recognised together
+    BACKFILL_SIZE_STEP = 64
+    BACKFILL_RECOGNITION_BATCH_SIZE = 8
+
+
+class MemeSearch:
+    # only the best TF-IDF matches are checked with the fuzzy matcher
+    CANDIDATE_LIMIT = 50
+    MIN_SCORE = 50
+
+
+class MemeDuplicates:
+    # memes whose dHashes differ in at most this many of 64 bits are reposts,
+    # the 9x8 hash barely sees captions, so larger distances link different
+    # memes of the same template
+    MAX_DISTANCE = 3
+    # the hash index is loaded in pages of this many memes
+    LOAD_CHUNK_SIZE = 5000
+
+
+class MemeStorage:
+    # the one-shot move of the flat archive into the content-addressed
+    # layout copies at most this many bytes per second
+    MIGRATION_BYTES_PER_SECOND = 16 * 1024 * 1024
+    MIGRATION_CHUNK_SIZE = 50
+    COPY_BLOCK_SIZE = 1024 * 1024
+    # unreferenced files younger than this may belong to a meme whose
+    # database row is not written yet
+    ORPHAN_GRACE_SECONDS = 60 * 60
+
+
+class MemeBanner:
+    # rendered banners are deleted least recently used first above this size
+    CACHE_MAX_BYTES = 256 * 1024 * 1024
+    # Discord rejects larger banners
+    MAX_GIF_BYTES = 10 * 1024 * 1024
+    MAX_GIF_FRAMES = 120
+    GIF_COLORS = 256
+    GIF_MIN_COLORS = 32
+    # trim palettes and only store the changed area of every frame
+    GIF_OPTIMIZE = True
+    # 1 keeps the previous frame visible, which the changed areas rely on
+    GIF_DISPOSAL = 1
+
+
+class MemeVariants:
+    # /meme uploads the original only if it is at most this large
+    UPLOAD_BUDGET_BYTES = 1024 * 1024
+    # the longest side of the WebP preview
+    PREVIEW_MAX_SIZE = 640
+    PREVIEW_QUALITY = 75
+    # animated previews drop frames above this count, like GIF banners
+    PREVIEW_MAX_FRAMES = 60
+
+
+class MemeIngest:
+    WORKERS = 1  # every worker process loads its own OCR model
+    QUEUE_SIZE = 20
+
+
 class AI:
+    # the key of the translation cache, cached translations are shared by
+    # all model tiers
     OPENAI_MODEL = "gpt-4o-mini"
+    # the models completions are routed to, from the smallest to the largest:
+    # a chunk goes to the first tier that fits its estimated code tokens and
+    # whose average latency is within max_latency_ms, the larger tiers are
+    # the fallbacks if a model fails. A tier without max_code_tokens is only
+    # a fallback. max_completion_tokens cuts off the completions of a tier.
+    MODEL_TIERS = [
+        {
+            "name": "fast",
+            "model": "gpt-4.1-nano",
+            "max_code_tokens": 250,
+            "max_latency_ms": 8000,
+            "max_completion_tokens": 600,
+        },
+        {
+            "name": "standard",
+            "model": "gpt-4o-mini",
+            "max_code_tokens": 700,
+            "max_latency_ms": 20000,
+            "max_completion_tokens": 1400,
+        },
+        {
+            "name": "large",
+            "model": "gpt-4.1-mini",
+            "max_completion_tokens": 2800,
+        },
+    ]
+    # the weight of the latest completion in the average latency of a tier
+    MODEL_LATENCY_EWMA_ALPHA = 0.3
+    # a tier skipped for its latency is tried again on every n-th request
+    MODEL_LATENCY_PROBE_INTERVAL = 20
     MAX_TRANSLATE_REQUESTS_PER_DAY = 5
+    # a translation costs around 1000 to 3000 tokens
+    MAX_TRANSLATE_TOKENS_PER_DAY = 15000
+    # the daily usage rows of past days are deleted after this many days
+    USAGE_RETENTION_DAYS = 30
+    USAGE_PURGE_BATCH_SIZE = 500
+    # completions in flight at once, further requests wait in a queue
+    MAX_CONCURRENT_COMPLETIONS = 4
+    # the pooled connections of the shared HTTP client
+    MAX_CONNECTIONS = 8
+    MAX_KEEPALIVE_CONNECTIONS = 4
+    CONNECT_TIMEOUT_SECONDS = 5.0
+    # the longest wait for the next bytes of a response: for streamed
+    # completions between two chunks, otherwise for the whole completion
+    READ_TIMEOUT_SECONDS = 60.0
+    MAX_RETRIES = 2
+    # the local token estimate, there is no tokenizer for the model here
+    CHARS_PER_TOKEN = 4
+    OUTPUT_TOKEN_RATIO = 1.5
+    RESPONSE_OVERHEAD_TOKENS = 100
+    # larger code is split into chunks that are translated concurrently,
+    # every chunk is routed on its own, so this is the max_code_tokens of
+    # the largest tier that is chosen by size
+    CHUNK_MAX_TOKENS = 700
+    # larger code is rejected before anything is sent
+    MAX_CODE_TOKENS = 4000
+    # repeated translations are answered from the database
+    TRANSLATION_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+    TRANSLATION_CACHE_MAX_ENTRIES = 5000
+    # /translate shows the code while it is generated
+    STREAM_TRANSLATIONS = True
+    # Discord rate limits edits of a message, partial code is shown at most
+    # this often
+    STREAM_EDIT_INTERVAL_SECONDS = 1.5
+    # Discord messages hold at most 2000 characters
+    STREAM_PREVIEW_MAX_CHARS = 1900
 
 
 class Constants:
@@ -113,5 +266,15 @@ class Constants:
     AI = AI
     MENSA = Mensa
     QUOTE_WEIGHTS = QuoteWeights
+    QUOTE_SEARCH = QuoteSearch
+    QUOTE_COLLECTION = QuoteCollection
+    USERS = Users
+    MEME_INGEST = MemeIngest
+    MEME_BANNER = MemeBanner
+    MEME_SEARCH = MemeSearch
+    MEME_DUPLICATES = MemeDuplicates
+    MEME_STORAGE = MemeStorage
+    MEME_VARIANTS = MemeVariants
+    OCR = OCR
     # --- ADDITIONAL CONSTANTS ---
     SYSTIMEZONE = datetime.now().astimezone().tzinfo
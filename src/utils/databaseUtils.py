@@ -0,0 +1,45 @@
+"""
+Generic helpers for querying the database.
+"""
+
+import random
+from typing import TypeVar
+
+from tortoise.models import Model
+
+MODEL = TypeVar("MODEL", bound=Model)
+
+# How often a random draw is repeated when the drawn row vanished in between
+RANDOM_ROW_RETRIES = 3
+
+
+async def get_random_instance(model: type[MODEL]) -> MODEL | None:
+    """
+    Draw a single uniformly distributed random row of the given model.
+
+    Instead of loading the whole table only the number of rows is counted
+    and the row at a random offset of the primary key index is fetched. If
+    the row got deleted between both queries the draw is repeated.
+
+    Args:
+        model: The model to draw a row of.
+
+    Returns:
+        The random instance or None if the table is empty.
+    """
+    pk_column = model._meta.pk_attr
+
+    for _ in range(RANDOM_ROW_RETRIES):
+        count = await model.all().count()
+
+        if count == 0:
+            return None
+
+        instance = await model.all().order_by(pk_column).offset(
+            random.randrange(count)
+        ).first()
+
+        if instance is not None:
+            return instance
+
+    return None
@@ -0,0 +1,169 @@
+"""
+A size-bounded disk cache of rendered meme banners.
+
+Banners are only needed for the one meme the bot shows every few minutes,
+so they are rendered when a meme is picked instead of at ingest. Rendered
+banners are kept in the bannerized meme folder; if the folder grows beyond
+its size limit, the least recently used banners are deleted. The access
+time of a banner is tracked with its modification time, which works on
+filesystems mounted with `noatime` too.
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+
+from models.database.memeData import Meme, MemeFormat
+from utils.constants import Constants
+from utils.memeUtils.memeBannerUtils import render_banner
+
+logger = logging.getLogger("bot")
+
+
+@dataclass
+class MemeBannerCacheStats:
+    """
+    The counters of the meme banner cache.
+    """
+    hits: int
+    misses: int
+    evictions: int
+    files: int
+    size_bytes: int
+    max_bytes: int
+    peak_memory_bytes: int
+
+
+class MemeBannerCache:
+    """
+    Renders meme banners on demand and keeps them in an LRU disk cache.
+
+    All methods block on PIL and the disk and should be called with
+    `asyncio.to_thread`.
+    """
+
+    def __init__(self, folder: str, raw_folder: str, max_bytes: int) -> None:
+        self.folder = folder
+        self.raw_folder = raw_folder
+        self.max_bytes = max_bytes
+
+        # renders of the same banner in two threads would race on the file
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.peak_memory_bytes = 0
+
+    def get_banner(self, meme: Meme) -> bytes:
+        """
+        Return the banner of a meme, rendering it if it is not cached.
+
+        Args:
+            meme (Meme): The meme.
+
+        Returns:
+            bytes: The encoded PNG or GIF banner.
+        """
+        file_path = meme.file_path
+        banner_path = os.path.join(self.folder, file_path)
+
+        with self._lock:
+            try:
+                with open(banner_path, "rb") as f:
+                    banner = f.read()
+            except FileNotFoundError:
+                pass
+            else:
+                self.hits += 1
+                # mark the banner as recently used
+                os.utime(banner_path)
+                return banner
+
+            self.misses += 1
+
+            with open(os.path.join(self.raw_folder, file_path), "rb") as f:
+                image_data = f.read()
+
+            result = render_banner(image_data, meme.format == MemeFormat.GIF)
+            banner = result.data
+            self.peak_memory_bytes = max(
+                self.peak_memory_bytes,
+                result.peak_memory_bytes
+            )
+            logger.info(
+                "Rendered banner of meme %s: %d/%d frames, %d colors, "
+                "%.1f KiB, peak memory ~%.1f MiB",
+                meme.uuid,
+                result.frames,
+                result.source_frames,
+                result.colors,
+                result.size_bytes / 1024,
+                result.peak_memory_bytes / 1024 / 1024
+            )
+
+            os.makedirs(os.path.dirname(banner_path), exist_ok=True)
+            temp_path = f"{banner_path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(banner)
+            os.replace(temp_path, banner_path)
+
+            self._evict(keep=banner_path)
+
+        return banner
+
+    def stats(self) -> MemeBannerCacheStats:
+        """
+        Return the hit counters and the current size of the cache.
+        """
+        entries = self._entries()
+        return MemeBannerCacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            files=len(entries),
+            size_bytes=sum(size for _,
+                           _,
+                           size in entries),
+            max_bytes=self.max_bytes,
+            peak_memory_bytes=self.peak_memory_bytes,
+        )
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        if not os.path.isdir(self.folder):
+            return []
+
+        entries: list[tuple[float, str, int]] = []
+        # banners are sharded like the raw memes they are rendered from
+        for directory, _, names in os.walk(self.folder):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self, keep: str) -> None:
+        entries = self._entries()
+        size = sum(entry_size for _, _, entry_size in entries)
+
+        # oldest first
+        for _, path, entry_size in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+
+            os.remove(path)
+            size -= entry_size
+            self.evictions += 1
+            logger.debug("Evicted meme banner %s", path)
+
+
+meme_banner_cache = MemeBannerCache(
+    Constants.FILE_PATHS.BANNERIZED_MEME_FOLDER,
+    Constants.FILE_PATHS.RAW_MEME_FOLDER,
+    Constants.MEME_BANNER.CACHE_MAX_BYTES
+)
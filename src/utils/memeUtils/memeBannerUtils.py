@@ -1,19 +1,48 @@
+import math
 import random
+from dataclasses import dataclass
 from io import BytesIO
 
-from PIL import Image, ImageSequence
+from PIL import GifImagePlugin, Image, ImageChops, ImageSequence
 
+from utils.constants import Constants
 
-def bannerize_meme_image(image_data: bytes, is_gif: bool) -> bytes:
+# The size of a Discord banner
+TARGET_WIDTH, TARGET_HEIGHT = 960, 339
+
+
+@dataclass
+class BannerRenderResult:
     """
-    Converts a meme image to a Discord banner format.
+    A rendered banner together with what it cost to render it.
     """
-    image_stream = BytesIO(image_data)
-    img = Image.open(image_stream)
+    data: bytes
+    source_frames: int
+    frames: int
+    colors: int
+    attempts: int
+    # the largest estimated size of all images and buffers alive at once
+    peak_memory_bytes: int
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.data)
+
+
+@dataclass
+class _PendingFrame:
+    image: Image.Image
+    offset: tuple[int, int]
+    duration: int
+
 
-    # Define the target size for the Discord banner
-    target_width, target_height = 960, 339
+def render_banner(image_data: bytes, is_gif: bool) -> BannerRenderResult:
+    """
+    Converts a meme image to a Discord banner format.
 
+    GIFs are rendered frame by frame within the byte and frame budget of
+    `Constants.MEME_BANNER`, see `render_gif_banner`.
+    """
     # Create a random color for the banner background
     random_color = (
         random.randint(0,
@@ -26,38 +55,219 @@ def bannerize_meme_image(image_data: bytes, is_gif: bool) -> bytes:
     )
 
     if is_gif:
-        frames = []
-        for frame in ImageSequence.Iterator(img):
-            frame = frame.convert("RGBA")
-            new_frame = create_banner_from_image(
-                frame,
-                random_color,
-                target_height,
-                target_width
+        return render_gif_banner(
+            image_data,
+            random_color,
+            max_bytes=Constants.MEME_BANNER.MAX_GIF_BYTES,
+            max_frames=Constants.MEME_BANNER.MAX_GIF_FRAMES,
+            colors=Constants.MEME_BANNER.GIF_COLORS,
+            min_colors=Constants.MEME_BANNER.GIF_MIN_COLORS,
+            optimize=Constants.MEME_BANNER.GIF_OPTIMIZE,
+            disposal=Constants.MEME_BANNER.GIF_DISPOSAL
+        )
+
+    img = Image.open(BytesIO(image_data))
+    new_img = create_banner_from_image(
+        img,
+        random_color,
+        TARGET_HEIGHT,
+        TARGET_WIDTH
+    )
+    png_image_stream = BytesIO()
+    new_img.save(png_image_stream, format='PNG')
+
+    return BannerRenderResult(
+        data=png_image_stream.getvalue(),
+        source_frames=1,
+        frames=1,
+        colors=0,
+        attempts=1,
+        peak_memory_bytes=(
+            _image_bytes(img) + _image_bytes(new_img) + png_image_stream.tell()
+        ),
+    )
+
+
+def render_gif_banner(
+    image_data: bytes,
+    color: tuple[int,
+                 ...],
+    max_bytes: int,
+    max_frames: int,
+    colors: int,
+    min_colors: int,
+    optimize: bool,
+    disposal: int
+) -> BannerRenderResult:
+    """
+    Converts a GIF to a Discord banner without holding all frames in memory.
+
+    Every frame is decoded, bannerized, quantized and written before the
+    next one is read. If the banner exceeds `max_bytes`, it is rendered
+    again with half the colors down to `min_colors`, then with every second
+    remaining frame dropped, until it fits or only one frame is left.
+    Dropped frames are added to the duration of the frame before them, so
+    the animation keeps its speed.
+
+    Args:
+        image_data (bytes): The encoded GIF.
+        color (tuple[int, ...]): The RGBA background color.
+        max_bytes (int): The maximum size of the banner.
+        max_frames (int): The maximum number of frames of the banner.
+        colors (int): The palette size of every frame.
+        min_colors (int): The smallest palette size to reduce to.
+        optimize (bool): Whether to trim the palette and to only write the
+            changed area of every frame.
+        disposal (int): The GIF disposal method of the frames.
+
+    Returns:
+        BannerRenderResult: The banner and its render statistics.
+    """
+    with Image.open(BytesIO(image_data)) as img:
+        source_frames = getattr(img, "n_frames", 1)
+        step = max(1, math.ceil(source_frames / max_frames))
+        attempts = 0
+        peak_memory = 0
+
+        while True:
+            attempts += 1
+            data, frames, attempt_peak = _encode_gif_banner(
+                img,
+                color,
+                step,
+                colors,
+                optimize,
+                disposal
+            )
+            peak_memory = max(peak_memory, attempt_peak)
+
+            if len(data) <= max_bytes or step >= source_frames:
+                break
+
+            # fewer colors first, they cost less quality than dropped frames
+            if colors > min_colors:
+                colors = max(min_colors, colors // 2)
+            else:
+                step *= 2
+
+    return BannerRenderResult(
+        data=data,
+        source_frames=source_frames,
+        frames=frames,
+        colors=colors,
+        attempts=attempts,
+        peak_memory_bytes=peak_memory,
+    )
+
+
+def _encode_gif_banner(
+    img: Image.Image,
+    color: tuple[int,
+                 ...],
+    step: int,
+    colors: int,
+    optimize: bool,
+    disposal: int
+) -> tuple[bytes,
+           int,
+           int]:
+    output = BytesIO()
+    background = Image.new("RGBA", (TARGET_WIDTH, TARGET_HEIGHT), color)
+    # Unchanged areas may only be skipped if the previous frame stays visible
+    crop = optimize and disposal in (0, 1)
+
+    previous: Image.Image | None = None
+    pending: _PendingFrame | None = None
+    frames = 0
+    peak_memory = 0
+
+    for index, frame in enumerate(ImageSequence.Iterator(img)):
+        duration = int(frame.info.get("duration", 0))
+
+        if index % step != 0:
+            if pending is not None:
+                pending.duration += duration
+            continue
+
+        banner = Image.alpha_composite(
+            background,
+            create_banner_from_image(
+                frame.convert("RGBA"),
+                color,
+                TARGET_HEIGHT,
+                TARGET_WIDTH
             )
-            frames.append(new_frame)
-
-        gif_image_stream = BytesIO()
-        frames[0].save(
-            gif_image_stream,
-            format='GIF',
-            save_all=True,
-            append_images=frames[1:],
-            loop=0
+        ).convert("RGB")
+
+        peak_memory = max(
+            peak_memory,
+            # the decoded frame, its RGBA copy and the banner buffers
+            _image_bytes(frame) + frame.width * frame.height * 4 +
+            _image_bytes(background) * 3 + output.tell() +
+            (_image_bytes(previous) if previous is not None else 0) +
+            (_image_bytes(pending.image) if pending is not None else 0)
         )
-        gif_image_stream.seek(0)
-        return gif_image_stream.read()
-    else:
-        new_img = create_banner_from_image(
-            img,
-            random_color,
-            target_height,
-            target_width
+
+        bbox: tuple[int, int, int, int] | None = (0, 0) + banner.size
+        if crop and previous is not None:
+            bbox = ImageChops.difference(previous, banner).getbbox()
+
+        if bbox is None:
+            # an unchanged frame only extends the previous one
+            assert pending is not None
+            pending.duration += duration
+            continue
+
+        if pending is not None:
+            _write_gif_frame(output, pending, frames == 0, optimize, disposal)
+            frames += 1
+
+        pending = _PendingFrame(
+            banner.crop(bbox).quantize(colors),
+            (bbox[0],
+             bbox[1]),
+            duration
         )
-        png_image_stream = BytesIO()
-        new_img.save(png_image_stream, format='PNG')
-        png_image_stream.seek(0)
-        return png_image_stream.read()
+        previous = banner
+
+    if pending is not None:
+        _write_gif_frame(output, pending, frames == 0, optimize, disposal)
+        frames += 1
+
+    output.write(b";")  # GIF trailer
+    return output.getvalue(), frames, peak_memory
+
+
+def _write_gif_frame(
+    output: BytesIO,
+    frame: _PendingFrame,
+    first: bool,
+    optimize: bool,
+    disposal: int
+) -> None:
+    params: dict[str,
+                 object] = {
+                     "duration": frame.duration,
+                     "disposal": disposal,
+                 }
+
+    if first:
+        # the first frame is full size and defines the global palette
+        header, _ = GifImagePlugin.getheader(
+            frame.image,
+            info={"loop": 0, "optimize": optimize}
+        )
+        for block in header:
+            output.write(block)
+    else:
+        params["include_color_table"] = True
+
+    for block in GifImagePlugin.getdata(frame.image, frame.offset, **params):
+        output.write(block)
+
+
+def _image_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
 
 
 def create_banner_from_image(
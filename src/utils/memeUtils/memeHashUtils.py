@@ -0,0 +1,375 @@
+"""
+Perceptual hashes for finding reposted memes.
+
+Every meme image gets a 64-bit difference hash (dHash), which barely changes
+when an image is re-encoded, resized or slightly cropped. The process-wide
+`meme_hash_index` keeps the hashes of all original memes in a BK-tree, so
+the memes within a Hamming distance of a new image are found without
+comparing it to every meme.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from io import BytesIO
+
+from PIL import Image
+
+from models.database.memeData import Meme
+from utils.constants import Constants
+
+logger = logging.getLogger("bot")
+
+HASH_SIZE = 8
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    Compute the 64-bit difference hash of an image.
+
+    The first frame is shrunk to 9x8 grey pixels; every bit tells whether a
+    pixel is brighter than its right neighbour.
+
+    Args:
+        image (Image.Image): The image.
+
+    Returns:
+        int: The hash.
+    """
+    # lets JPEG decoders skip most of the work
+    image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+    small = image.convert("L").resize(
+        (HASH_SIZE + 1,
+         HASH_SIZE),
+        Image.LANCZOS  # type: ignore
+    )
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hash_image_data(image_data: bytes) -> str:
+    """
+    Compute the dHash of an encoded image.
+
+    Args:
+        image_data (bytes): The encoded image.
+
+    Returns:
+        str: The hash as 16 hex digits, as stored in `Meme.phash`.
+    """
+    with Image.open(BytesIO(image_data)) as image:
+        return format(dhash(image), "016x")
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
+
+
+@dataclass
+class _BKNode:
+    value: int
+    uuids: list[str]
+    children: dict[int, "_BKNode"] = field(default_factory=dict)
+
+
+class BKTree:
+    """
+    A BK-tree over 64-bit hashes with the Hamming distance as metric.
+
+    Every child edge is labelled with its distance to the parent, so a
+    search only descends into edges within `max_distance` of the distance
+    between the query and the parent (triangle inequality).
+    """
+
+    def __init__(self) -> None:
+        self._root: _BKNode | None = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, meme_uuid: str) -> None:
+        """
+        Add the hash of a meme, equal hashes share one node.
+        """
+        self._size += 1
+
+        if self._root is None:
+            self._root = _BKNode(value, [meme_uuid])
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node.value)
+            if distance == 0:
+                node.uuids.append(meme_uuid)
+                return
+
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _BKNode(value, [meme_uuid])
+                return
+            node = child
+
+    def find(self, value: int, max_distance: int) -> list[tuple[int, str]]:
+        """
+        Return all memes whose hash is within `max_distance` of `value`.
+
+        Returns:
+            list[tuple[int, str]]: The distances and UUIDs, closest first.
+        """
+        if self._root is None:
+            return []
+
+        matches: list[tuple[int, str]] = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node.value)
+            if distance <= max_distance:
+                matches.extend(
+                    (distance,
+                     meme_uuid) for meme_uuid in node.uuids
+                )
+
+            for edge, child in node.children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+
+        return sorted(matches)
+
+
+class MemeHashIndex:
+    """
+    The hashes of all original memes, used to detect reposts.
+
+    Loaded once from the database and afterwards updated with every meme
+    that is stored as an original.
+    """
+
+    def __init__(self) -> None:
+        self._tree = BKTree()
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._pending: list[tuple[str, str]] | None = None
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    async def load(self) -> None:
+        """
+        Load the hashes from the database unless they are loaded.
+        """
+        async with self._lock:
+            if self._loaded:
+                return
+
+            start = time.perf_counter()
+            self._pending = []
+
+            try:
+                tree = BKTree()
+                last_uuid: str | None = None
+                while True:
+                    # keyset pagination, the event loop runs between pages
+                    query = Meme.filter(
+                        phash__isnull=False,
+                        duplicate_of_id__isnull=True
+                    )
+                    if last_uuid is not None:
+                        query = query.filter(uuid__gt=last_uuid)
+                    rows = await query.order_by("uuid").limit(
+                        Constants.MEME_DUPLICATES.LOAD_CHUNK_SIZE
+                    ).values_list("uuid",
+                                  "phash")
+                    if len(rows) == 0:
+                        break
+
+                    for meme_uuid, phash in rows:
+                        tree.add(int(phash, 16), str(meme_uuid))
+                    last_uuid = str(rows[-1][0])
+
+                # memes stored while the database was read
+                for meme_uuid, phash in self._pending:
+                    tree.add(int(phash, 16), meme_uuid)
+            finally:
+                self._pending = None
+
+            self._tree = tree
+            self._loaded = True
+
+            logger.info(
+                "Loaded %d meme hashes in %.1f ms",
+                len(tree),
+                (time.perf_counter() - start) * 1000
+            )
+
+    def add(self, meme_uuid: str, phash: str) -> None:
+        """
+        Add the hash of an original meme.
+
+        Hashes added before the index is loaded are ignored, the load reads
+        them from the database.
+        """
+        if self._pending is not None:
+            self._pending.append((meme_uuid, phash))
+        elif self._loaded:
+            self._tree.add(int(phash, 16), meme_uuid)
+
+    async def find_original(
+        self,
+        phash: str,
+        max_distance: int
+    ) -> tuple[str,
+               int] | None:
+        """
+        Return the closest original meme to a hash.
+
+        Args:
+            phash (str): The hash of the new image.
+            max_distance (int): The largest Hamming distance of a repost.
+
+        Returns:
+            tuple[str, int] | None: The UUID of the original and its
+            distance to the hash, None if there is none.
+        """
+        if not self._loaded:
+            await self.load()
+
+        matches = self._tree.find(int(phash, 16), max_distance)
+        if len(matches) == 0:
+            return None
+        distance, meme_uuid = matches[0]
+        return meme_uuid, distance
+
+
+def find_duplicate_clusters(
+    memes: list[tuple[str,
+                      str | None,
+                      str | None]],
+    max_distance: int
+) -> list[list[str]]:
+    """
+    Group memes into clusters of reposts.
+
+    Memes are in one cluster if they are linked as duplicates or if their
+    hashes are within `max_distance` of each other (transitively).
+
+    Args:
+        memes (list[tuple[str, str | None, str | None]]): The UUID, hash and
+            original UUID of every meme.
+        max_distance (int): The largest Hamming distance of a repost.
+
+    Returns:
+        list[list[str]]: All clusters with more than one meme, largest
+        first.
+    """
+    parents: dict[str,
+                  str] = {
+                      meme_uuid: meme_uuid
+                      for meme_uuid,
+                      _,
+                      _ in memes
+                  }
+
+    def root(meme_uuid: str) -> str:
+        while parents[meme_uuid] != meme_uuid:
+            parents[meme_uuid] = parents[parents[meme_uuid]]
+            meme_uuid = parents[meme_uuid]
+        return meme_uuid
+
+    def union(first: str, second: str) -> None:
+        parents[root(first)] = root(second)
+
+    tree = BKTree()
+    for meme_uuid, phash, duplicate_of in memes:
+        if duplicate_of is not None and duplicate_of in parents:
+            union(meme_uuid, duplicate_of)
+        if phash is not None:
+            value = int(phash, 16)
+            for _, other in tree.find(value, max_distance):
+                union(meme_uuid, other)
+            tree.add(value, meme_uuid)
+
+    clusters: dict[str, list[str]] = {}
+    for meme_uuid in parents:
+        clusters.setdefault(root(meme_uuid), []).append(meme_uuid)
+
+    return sorted(
+        (cluster for cluster in clusters.values() if len(cluster) > 1),
+        key=len,
+        reverse=True
+    )
+
+
+async def backfill_meme_hashes(chunk_size: int = 100) -> int:
+    """
+    Compute the missing hashes of stored memes.
+
+    The memes are read in chunks ordered by UUID, every chunk is hashed in a
+    thread and written with one bulk update.
+
+    Args:
+        chunk_size (int): The number of memes per chunk.
+
+    Returns:
+        int: The number of hashed memes.
+    """
+    hashed = 0
+    last_uuid: str | None = None
+
+    while True:
+        # keyset pagination, memes that cannot be hashed stay without a hash
+        # and must not be read again
+        query = Meme.filter(phash__isnull=True)
+        if last_uuid is not None:
+            query = query.filter(uuid__gt=last_uuid)
+        chunk = await query.order_by("uuid").limit(chunk_size)
+        if len(chunk) == 0:
+            break
+
+        hashes = await asyncio.to_thread(_hash_meme_files, chunk)
+
+        changed: list[Meme] = []
+        for meme, phash in zip(chunk, hashes):
+            if phash is not None:
+                meme.phash = phash
+                changed.append(meme)
+                # only originals are matched against, reposts link to them
+                if meme.duplicate_of_id is None:
+                    meme_hash_index.add(str(meme.uuid), phash)
+
+        if len(changed) > 0:
+            await Meme.bulk_update(changed, fields=["phash"])
+        hashed += len(changed)
+        last_uuid = str(chunk[-1].uuid)
+
+    return hashed
+
+
+def _hash_meme_files(memes: list[Meme]) -> list[str | None]:
+    hashes: list[str | None] = []
+    for meme in memes:
+        path = os.path.join(
+            Constants.FILE_PATHS.RAW_MEME_FOLDER,
+            meme.file_path
+        )
+        try:
+            with open(path, "rb") as f:
+                hashes.append(hash_image_data(f.read()))
+        except OSError as ex:
+            logger.warning("Could not hash meme %s: %s", meme.uuid, ex)
+            hashes.append(None)
+    return hashes
+
+
+meme_hash_index = MemeHashIndex()
@@ -0,0 +1,262 @@
+"""
+A bounded pipeline that processes new memes outside of the event loop.
+
+OCR, bannerization and the file writes of a meme take seconds and block
+whatever thread runs them. The pipeline queues new memes and lets a pool of
+worker processes do this work, only the metadata is stored on the event
+loop afterwards.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, TypeVar
+
+from models.database.memeData import Meme
+from models.database.userData import User
+from utils.constants import Constants
+from utils.memeUtils import memeUtils, ocrUtils
+from utils.memeUtils.memeHashUtils import hash_image_data, meme_hash_index
+
+T = TypeVar("T")
+
+
+@dataclass
+class MemeIngestJob:
+    """
+    A meme waiting to be processed.
+    """
+    image_data: bytes
+    author: User
+    message: str
+    date: datetime
+    filename: str
+
+
+@dataclass
+class MemeIngestStats:
+    """
+    The status counters of the meme ingest pipeline.
+    """
+    queued: int
+    running: int
+    completed: int
+    failed: int
+    duplicates: int
+    workers: int
+    queue_size: int
+
+
+class MemeIngestPipeline:
+    """
+    Processes memes with a bounded queue and a pool of worker processes.
+
+    `enqueue` only waits while the queue is full, which applies backpressure
+    to the caller instead of piling up unbounded work. Every worker process
+    handles one meme at a time.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        workers: int,
+        queue_size: int,
+        executor: Executor | None = None
+    ) -> None:
+        self.logger = logger
+        self.workers = workers
+
+        self._queue: asyncio.Queue[MemeIngestJob] = asyncio.Queue(queue_size)
+        self._executor = executor
+        self._consumers: list[asyncio.Task[None]] = []
+
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._duplicates = 0
+
+    @property
+    def is_running(self) -> bool:
+        return len(self._consumers) > 0
+
+    def start(self) -> None:
+        """
+        Start the worker pool and the consumers, does nothing if running.
+        """
+        if self.is_running:
+            return
+
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+        self._consumers = [
+            asyncio.create_task(self._consume()) for _ in range(self.workers)
+        ]
+        self.logger.info(
+            "Started meme ingest pipeline with %d workers",
+            self.workers
+        )
+
+    def stop(self) -> None:
+        """
+        Stop the consumers and shut the worker pool down.
+
+        Memes that are still queued are dropped.
+        """
+        for consumer in self._consumers:
+            consumer.cancel()
+        self._consumers = []
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run_in_worker(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a function in the worker pool.
+
+        Args:
+            func (Callable): A picklable module level function.
+
+        Returns:
+            T: The result of the function.
+        """
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            func,
+            *args
+        )
+
+    async def enqueue(self, job: MemeIngestJob) -> None:
+        """
+        Queue a meme for processing, waiting while the queue is full.
+
+        Args:
+            job (MemeIngestJob): The meme to process.
+        """
+        self.start()
+
+        if self._queue.full():
+            self.logger.warning(
+                "Meme ingest queue is full, waiting to queue %s",
+                job.filename
+            )
+
+        await self._queue.put(job)
+
+    def stats(self) -> MemeIngestStats:
+        """
+        Return the current status counters of the pipeline.
+        """
+        return MemeIngestStats(
+            queued=self._queue.qsize(),
+            running=self._running,
+            completed=self._completed,
+            failed=self._failed,
+            duplicates=self._duplicates,
+            workers=self.workers,
+            queue_size=self._queue.maxsize,
+        )
+
+    async def _consume(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+
+            try:
+                await self._process(job)
+                self._completed += 1
+            except BrokenProcessPool as ex:
+                # a worker died (e.g. out of memory), later jobs need a new
+                # pool
+                self._failed += 1
+                self.logger.error(
+                    "Meme worker died while processing %s: %s",
+                    job.filename,
+                    ex
+                )
+                self._replace_executor()
+            except Exception as ex:
+                self._failed += 1
+                self.logger.error(
+                    "Failed to process meme %s: %s",
+                    job.filename,
+                    ex
+                )
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    def _create_executor(self) -> Executor:
+        # spawn, as forking the bot would copy its sockets and threads
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=ocrUtils.preload_ocr_engine
+        )
+
+    def _replace_executor(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._create_executor()
+
+    async def _process(self, job: MemeIngestJob) -> None:
+        meme_uuid = str(uuid.uuid4())
+
+        # hashing is cheap, the original is looked up before any OCR
+        phash = await asyncio.to_thread(hash_image_data, job.image_data)
+        match = await meme_hash_index.find_original(
+            phash,
+            Constants.MEME_DUPLICATES.MAX_DISTANCE
+        )
+        original = (
+            await Meme.get_or_none(uuid=match[0]) if match is not None else None
+        )
+
+        if (
+            original is not None and match is not None and match[1] == 0
+            and original.content_hash is not None
+        ):
+            # an identical hash is the same picture, it shares the file and
+            # the text of the original and skips the worker
+            meme_format = original.format
+            ocr_content = original.content
+            content_hash = original.content_hash
+        else:
+            # a close hash can also be the same template with a new caption,
+            # so near reposts keep their own image and text
+            meme_format, ocr_content, content_hash = await self.run_in_worker(
+                memeUtils.process_meme_image,
+                job.image_data
+            )
+
+        await memeUtils.save_meme_metadata(
+            meme_uuid,
+            meme_format,
+            ocr_content,
+            job.author,
+            job.message,
+            job.date,
+            phash,
+            content_hash,
+            original
+        )
+
+        if original is not None:
+            self._duplicates += 1
+            self.logger.info(
+                "Saved meme %s from %s as repost of %s",
+                job.filename,
+                job.author,
+                original
+            )
+        else:
+            self.logger.info("Saved meme %s from %s", job.filename, job.author)
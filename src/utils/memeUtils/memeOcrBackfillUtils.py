@@ -0,0 +1,319 @@
+"""
+A resumable background job that runs OCR again for all stored memes.
+
+`Meme.content` is only written when a meme is saved. After the OCR settings
+change, the backfill walks all memes ordered by UUID in chunks, recognises
+every chunk with batched easyocr calls in a worker process of its own and
+writes the new contents back with one bulk update per chunk. The UUID of the
+last finished chunk is checkpointed to disk, so a restarted bot continues
+where it stopped.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+
+from models.database.memeData import Meme
+from utils.constants import Constants
+from utils.memeUtils.memeSearchUtils import meme_search_index
+from utils.memeUtils.ocrUtils import ocr_engine
+
+
+def ocr_meme_files(paths: list[str]) -> list[str | None]:
+    """
+    Recognise the text of several meme files with batched OCR calls.
+
+    easyocr can only batch images of the same size, so every image (the
+    first frame of GIFs) is padded to the next multiple of
+    `Constants.OCR.BACKFILL_SIZE_STEP` and the images of the same padded
+    size are recognised together. The text keeps its original scale, as in
+    the ingest. This function blocks and is meant to run in a worker process.
+
+    Args:
+        paths (list[str]): The paths of the raw meme images.
+
+    Returns:
+        list[str | None]: The recognised text of every image, None if the
+        image could not be read.
+    """
+    step = Constants.OCR.BACKFILL_SIZE_STEP
+    buckets: dict[tuple[int, int], list[tuple[int, NDArray[Any]]]] = {}
+
+    for index, path in enumerate(paths):
+        try:
+            with Image.open(path) as img:
+                frame = img.convert("RGB")
+        except OSError:
+            continue
+
+        size = (
+            -(-frame.width // step) * step,
+            -(-frame.height // step) * step,
+        )
+        padded = Image.new("RGB", size, "white")
+        padded.paste(frame)
+        buckets.setdefault(size, []).append((index, np.array(padded)))
+
+    contents: list[str | None] = [None] * len(paths)
+    for bucket in buckets.values():
+        results = ocr_engine.readtext_batched(
+            [image for _, image in bucket],
+            batch_size=Constants.OCR.BACKFILL_RECOGNITION_BATCH_SIZE
+        )
+        for (index, _), result in zip(bucket, results):
+            contents[index] = "\n".join([item[1] for item in result])
+    return contents
+
+
+@dataclass
+class MemeOcrBackfillStats:
+    """
+    The progress of the re-OCR backfill.
+    """
+    running: bool
+    processed: int
+    updated: int
+    missing: int
+    total: int | None
+    last_uuid: str | None
+    images_per_second: float
+
+
+class MemeOcrBackfill:
+    """
+    Runs OCR again for all memes as a background task.
+
+    Only one run can be active at a time. Its progress is saved after every
+    chunk to `checkpoint_path` and removed once all memes are done.
+
+    The OCR runs in a worker process of its own that only lives as long as
+    the run, so the chunks never queue up in front of new memes in the
+    ingest workers.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        checkpoint_path: str,
+        chunk_size: int,
+        executor: Executor | None = None
+    ) -> None:
+        self.logger = logger
+        self.checkpoint_path = checkpoint_path
+        self.chunk_size = chunk_size
+        self._executor = executor
+
+        self._task: asyncio.Task[None] | None = None
+        self._last_uuid: str | None = None
+        self._processed = 0
+        self._updated = 0
+        self._missing = 0
+        self._total: int | None = None
+        self._ocr_seconds = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def has_checkpoint(self) -> bool:
+        """
+        Return whether an unfinished run can be resumed.
+        """
+        return os.path.exists(self.checkpoint_path)
+
+    def start(self) -> bool:
+        """
+        Start the backfill, resuming from the checkpoint if one exists.
+
+        Returns:
+            bool: False if the backfill is already running.
+        """
+        if self.is_running:
+            return False
+
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+        self._load_checkpoint()
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    def stop(self) -> None:
+        """
+        Stop the backfill, the checkpoint of the last chunk is kept.
+        """
+        if self._task is not None:
+            self._task.cancel()
+
+    def reset(self) -> bool:
+        """
+        Forget the checkpoint, the next run starts with the first meme.
+
+        Returns:
+            bool: False if the backfill is running and cannot be reset.
+        """
+        if self.is_running:
+            return False
+
+        if self.has_checkpoint():
+            os.remove(self.checkpoint_path)
+        self._load_checkpoint()
+        return True
+
+    def stats(self) -> MemeOcrBackfillStats:
+        """
+        Return the progress of the current or last run.
+        """
+        return MemeOcrBackfillStats(
+            running=self.is_running,
+            processed=self._processed,
+            updated=self._updated,
+            missing=self._missing,
+            total=self._total,
+            last_uuid=self._last_uuid,
+            images_per_second=self._images_per_second(),
+        )
+
+    async def _run(self) -> None:
+        self._total = await Meme.all().count()
+        self.logger.info(
+            "Starting meme re-OCR at %s, %d memes in total",
+            self._last_uuid or "the beginning",
+            self._total
+        )
+
+        try:
+            while await self._process_chunk():
+                pass
+        except asyncio.CancelledError:
+            self.logger.info(
+                "Meme re-OCR stopped after %d memes",
+                self._processed
+            )
+            raise
+        except Exception as ex:
+            self.logger.error("Meme re-OCR failed: %s", ex)
+            return
+        finally:
+            # releases the OCR models of the worker
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+        if self.has_checkpoint():
+            os.remove(self.checkpoint_path)
+        self.logger.info(
+            "Finished meme re-OCR: %d memes, %d updated, %d missing files, "
+            "%.2f images/s",
+            self._processed,
+            self._updated,
+            self._missing,
+            self._images_per_second()
+        )
+
+    async def _process_chunk(self) -> bool:
+        # keyset pagination, an offset would rescan all previous memes
+        query = Meme.all()
+        if self._last_uuid is not None:
+            query = query.filter(uuid__gt=self._last_uuid)
+        memes = await query.order_by("uuid").limit(self.chunk_size)
+
+        if len(memes) == 0:
+            return False
+
+        paths = [
+            os.path.join(Constants.FILE_PATHS.RAW_MEME_FOLDER,
+                         meme.file_path) for meme in memes
+        ]
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        contents: list[str | None] = await loop.run_in_executor(
+            self._executor,
+            ocr_meme_files,
+            paths
+        )
+        self._ocr_seconds += time.perf_counter() - start
+
+        changed: list[Meme] = []
+        for meme, content in zip(memes, contents):
+            if content is None:
+                self._missing += 1
+            elif content != meme.content:
+                meme.content = content
+                changed.append(meme)
+
+        if len(changed) > 0:
+            await Meme.bulk_update(changed, fields=["content"])
+            for meme in changed:
+                meme_search_index.add_meme(
+                    str(meme.uuid),
+                    meme.content,
+                    meme.message
+                )
+
+        self._processed += len(memes)
+        self._updated += len(changed)
+        self._last_uuid = str(memes[-1].uuid)
+        self._save_checkpoint()
+
+        self.logger.info(
+            "Meme re-OCR: %d/%s memes, %.2f images/s",
+            self._processed,
+            self._total,
+            self._images_per_second()
+        )
+        return True
+
+    def _create_executor(self) -> Executor:
+        # spawn, as forking the bot would copy its sockets and threads
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _images_per_second(self) -> float:
+        if self._ocr_seconds == 0:
+            return 0.0
+        return (self._processed - self._missing) / self._ocr_seconds
+
+    def _load_checkpoint(self) -> None:
+        checkpoint: dict[str, Any] = {}
+        if self.has_checkpoint():
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+
+        self._last_uuid = checkpoint.get("last_uuid")
+        self._processed = checkpoint.get("processed", 0)
+        self._updated = checkpoint.get("updated", 0)
+        self._missing = checkpoint.get("missing", 0)
+        self._ocr_seconds = checkpoint.get("ocr_seconds", 0.0)
+        self._total = None
+
+    def _save_checkpoint(self) -> None:
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+
+        # write and rename, so a crash never leaves a broken checkpoint
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "last_uuid": self._last_uuid,
+                    "processed": self._processed,
+                    "updated": self._updated,
+                    "missing": self._missing,
+                    "ocr_seconds": self._ocr_seconds,
+                },
+                f
+            )
+        os.replace(temp_path, self.checkpoint_path)
@@ -0,0 +1,368 @@
+"""
+A TF-IDF index over the OCR content and messages of all memes.
+
+Every meme is tokenised once into words and character trigrams of words,
+the trigrams make the index tolerant to OCR errors and typos. The weights
+are kept as a sparse term-by-meme matrix in CSC form (plain NumPy arrays),
+so a query is one sparse matrix-vector product over the columns of its
+terms, which yields the cosine similarity of every meme.
+
+The process-wide `meme_search_index` is loaded once and updated whenever a
+meme is stored or its content changes.
+"""
+
+import asyncio
+import logging
+import math
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import NDArray
+
+from models.database.memeData import Meme
+
+logger = logging.getLogger("bot")
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> Counter[str]:
+    """
+    Split a text into word and character trigram tokens.
+
+    Args:
+        text (str): The text to tokenise.
+
+    Returns:
+        Counter[str]: How often every token occurs.
+    """
+    tokens: Counter[str] = Counter()
+    for word in WORD_PATTERN.findall(text.lower()):
+        tokens[f"w:{word}"] += 1
+
+        padded = f" {word} "
+        for start in range(len(padded) - 2):
+            tokens[f"c:{padded[start:start + 3]}"] += 1
+    return tokens
+
+
+@dataclass
+class MemeSearchStats:
+    """
+    The size and timing counters of the meme search index.
+    """
+    memes: int
+    terms: int
+    nonzeros: int
+    memory_bytes: int
+    build_ms: float | None
+    compile_ms: float | None
+    queries: int
+    last_query_ms: float | None
+    avg_query_ms: float | None
+
+
+class MemeSearchIndex:
+    """
+    The in-memory TF-IDF index that meme searches read from.
+
+    Memes are added as token counts. The weighted CSC matrix is compiled
+    lazily on the next query after a change, as every new meme changes the
+    document frequencies and therefore all weights. The compilation runs in
+    a thread, memes added meanwhile are compiled by the following query.
+    """
+
+    def __init__(self) -> None:
+        self._lock = asyncio.Lock()
+        self._compile_lock = asyncio.Lock()
+        self._loaded = False
+        self._pending: list[tuple[str, str, str]] | None = None
+
+        self._vocabulary: dict[str, int] = {}
+        self._uuids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._doc_terms: list[NDArray[np.int32]] = []
+        self._doc_counts: list[NDArray[np.float64]] = []
+
+        # the compiled matrix, outdated while the versions differ
+        self._version = 0
+        self._compiled_version = 0
+        self._idf: NDArray[np.float64] = np.zeros(0, dtype=np.float64)
+        self._indptr: NDArray[np.int64] = np.zeros(1, dtype=np.int64)
+        self._indices: NDArray[np.int32] = np.zeros(0, dtype=np.int32)
+        self._data: NDArray[np.float64] = np.zeros(0, dtype=np.float64)
+
+        self._build_ms: float | None = None
+        self._compile_ms: float | None = None
+        self._queries = 0
+        self._query_ms_total = 0.0
+        self._last_query_ms: float | None = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._uuids)
+
+    async def load(self) -> None:
+        """
+        Load all memes from the database unless the index is loaded.
+        """
+        async with self._lock:
+            if not self._loaded:
+                await self._build()
+
+    async def rebuild(self) -> None:
+        """
+        Replace the index with a fresh copy of the database.
+        """
+        async with self._lock:
+            await self._build()
+
+    def add_meme(self, meme_uuid: str, content: str, message: str) -> None:
+        """
+        Add a meme to the index or replace its text if it is indexed.
+
+        Args:
+            meme_uuid (str): The UUID of the meme.
+            content (str): The OCRed content.
+            message (str): The message attached to the meme.
+        """
+        if self._pending is not None:
+            self._pending.append((meme_uuid, content, message))
+
+        counts = tokenize(content + "\n" + message)
+        terms = np.fromiter(
+            (
+                self._vocabulary.setdefault(token,
+                                            len(self._vocabulary))
+                for token in counts
+            ),
+            dtype=np.int32,
+            count=len(counts)
+        )
+        weights = np.fromiter(
+            counts.values(),
+            dtype=np.float64,
+            count=len(counts)
+        )
+
+        row = self._rows.get(meme_uuid)
+        if row is None:
+            self._rows[meme_uuid] = len(self._uuids)
+            self._uuids.append(meme_uuid)
+            self._doc_terms.append(terms)
+            self._doc_counts.append(weights)
+        else:
+            self._doc_terms[row] = terms
+            self._doc_counts[row] = weights
+
+        self._version += 1
+
+    async def search(self, query: str, limit: int) -> list[str]:
+        """
+        Return the memes most similar to the query.
+
+        Args:
+            query (str): The search term.
+            limit (int): The maximum number of results.
+
+        Returns:
+            list[str]: The UUIDs of the matching memes, best first. Memes
+            without any common token are never returned.
+        """
+        if not self._loaded:
+            await self.load()
+        await self._compile()
+
+        start = time.perf_counter()
+        result = self._search(query, limit)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._queries += 1
+        self._query_ms_total += elapsed_ms
+        self._last_query_ms = elapsed_ms
+
+        return result
+
+    def stats(self) -> MemeSearchStats:
+        """
+        Return the size and timing counters of the index.
+        """
+        memory = sys.getsizeof(self._vocabulary) + sum(
+            sys.getsizeof(token) for token in self._vocabulary
+        )
+        for terms, counts in zip(self._doc_terms, self._doc_counts):
+            memory += terms.nbytes + counts.nbytes
+        memory += self._indptr.nbytes + self._indices.nbytes
+        memory += self._data.nbytes
+
+        return MemeSearchStats(
+            memes=len(self._uuids),
+            terms=len(self._vocabulary),
+            nonzeros=sum(len(terms) for terms in self._doc_terms),
+            memory_bytes=memory,
+            build_ms=self._build_ms,
+            compile_ms=self._compile_ms,
+            queries=self._queries,
+            last_query_ms=self._last_query_ms,
+            avg_query_ms=(
+                self._query_ms_total /
+                self._queries if self._queries > 0 else None
+            ),
+        )
+
+    def _search(self, query: str, limit: int) -> list[str]:
+        if len(self._uuids) == 0:
+            return []
+
+        idf = self._idf
+
+        # tokens that are new since the last compilation have no column yet
+        query_counts = tokenize(query)
+        query_terms = [
+            (term,
+             count) for token,
+            count in query_counts.items()
+            if (term := self._vocabulary.get(token, len(idf))) < len(idf)
+        ]
+        if len(query_terms) == 0:
+            return []
+
+        # scores = X @ q, only the columns of the query terms are non-zero
+        scores = np.zeros(len(self._uuids), dtype=np.float64)
+        for term, count in query_terms:
+            start, end = self._indptr[term], self._indptr[term + 1]
+            weight = (1 + math.log(count)) * idf[term]
+            scores[self._indices[start:end]] += self._data[start:end] * weight
+
+        matches = np.flatnonzero(scores > 0)
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit)[:limit]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+
+        return [self._uuids[row] for row in matches]
+
+    async def _compile(self) -> None:
+        async with self._compile_lock:
+            if self._compiled_version == self._version:
+                return
+
+            # add_meme only appends and replaces, copies of the lists stay
+            # unchanged while the thread reads them
+            version = self._version
+            start = time.perf_counter()
+            self._idf, self._indptr, self._indices, self._data = (
+                await asyncio.to_thread(
+                    _compile_matrix,
+                    list(self._doc_terms),
+                    list(self._doc_counts),
+                    len(self._vocabulary)
+                )
+            )
+            self._compiled_version = version
+            self._compile_ms = (time.perf_counter() - start) * 1000
+
+    async def _build(self) -> None:
+        start = time.perf_counter()
+        self._pending = []
+
+        try:
+            memes = await Meme.all().order_by("date").values_list(
+                "uuid",
+                "content",
+                "message"
+            )
+
+            index = MemeSearchIndex()
+            for meme_uuid, content, message in memes:
+                index.add_meme(str(meme_uuid), content, message)
+
+            # memes stored while the database was read
+            for meme_uuid, content, message in self._pending:
+                index.add_meme(meme_uuid, content, message)
+        finally:
+            self._pending = None
+
+        # a running compilation must not install a matrix of the old rows
+        async with self._compile_lock:
+            self._vocabulary = index._vocabulary
+            self._uuids = index._uuids
+            self._rows = index._rows
+            self._doc_terms = index._doc_terms
+            self._doc_counts = index._doc_counts
+            self._version += 1
+        await self._compile()
+
+        self._loaded = True
+        self._build_ms = (time.perf_counter() - start) * 1000
+
+        logger.info(
+            "Loaded %d memes into the meme search index in %.1f ms",
+            len(self._uuids),
+            self._build_ms
+        )
+
+
+def _compile_matrix(
+    doc_terms: list[NDArray[np.int32]],
+    doc_counts: list[NDArray[np.float64]],
+    num_terms: int
+) -> tuple[NDArray[np.float64],
+           NDArray[np.int64],
+           NDArray[np.int32],
+           NDArray[np.float64]]:
+    """
+    Compile the token counts of all memes into a weighted CSC matrix.
+
+    Args:
+        doc_terms (list[NDArray[np.int32]]): The term ids of every meme.
+        doc_counts (list[NDArray[np.float64]]): The counts of the terms.
+        num_terms (int): The size of the vocabulary.
+
+    Returns:
+        tuple: The idf of every term and the indptr, indices and data
+        arrays of the matrix.
+    """
+    num_docs = len(doc_terms)
+
+    if num_docs == 0:
+        return (
+            np.zeros(num_terms,
+                     dtype=np.float64),
+            np.zeros(num_terms + 1,
+                     dtype=np.int64),
+            np.zeros(0,
+                     dtype=np.int32),
+            np.zeros(0,
+                     dtype=np.float64),
+        )
+
+    lengths = np.fromiter(
+        (len(terms) for terms in doc_terms),
+        dtype=np.int64,
+        count=num_docs
+    )
+    rows = np.repeat(np.arange(num_docs, dtype=np.int32), lengths)
+    terms = np.concatenate(doc_terms)
+    counts = np.concatenate(doc_counts)
+
+    # smoothed idf and sublinear tf as in the usual TF-IDF variants
+    df = np.bincount(terms, minlength=num_terms)
+    idf = np.log((1 + num_docs) / (1 + df)) + 1
+    weights = (1 + np.log(counts)) * idf[terms]
+
+    norms = np.sqrt(np.bincount(rows, weights**2, minlength=num_docs))
+    weights /= norms[rows]
+
+    order = np.argsort(terms, kind="stable")
+    indptr = np.concatenate(([0], np.cumsum(df)))
+    return idf, indptr, rows[order], weights[order]
+
+
+meme_search_index = MemeSearchIndex()
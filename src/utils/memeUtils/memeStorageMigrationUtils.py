@@ -0,0 +1,234 @@
+"""
+A one-shot background job that moves the flat meme archive into the
+content-addressed layout of `memeStorageUtils`.
+
+Every meme without a content hash is streamed from its legacy `uuid.ext`
+file into the sharded store, then the hash is written to the meme, and only
+then the legacy file (and its cached banner and preview) is deleted. A crash
+at any point leaves either the old or the new layout readable, so an
+interrupted run is simply started again.
+The copy is throttled to a fixed number of bytes per second to keep the disk
+usable for the bot and the backups.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from models.database.memeData import Meme
+from utils.memeUtils.memeStorageUtils import MemeStorage
+
+
+class ThroughputLimiter:
+    """
+    Limits the throughput of a blocking copy by sleeping between blocks.
+
+    Meant to be called from a worker thread, it never blocks the event loop.
+    """
+
+    def __init__(self, bytes_per_second: float) -> None:
+        self.bytes_per_second = bytes_per_second
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._bytes = 0
+
+    def consume(self, size: int) -> None:
+        """
+        Account for `size` copied bytes and wait until they are allowed.
+        """
+        with self._lock:
+            self._bytes += size
+            due = self._start + self._bytes / self.bytes_per_second
+
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+@dataclass
+class MemeStorageMigrationStats:
+    """
+    The progress of the storage migration.
+    """
+    running: bool
+    migrated: int
+    missing: int
+    total: int | None
+    bytes_copied: int
+    bytes_per_second: float
+
+
+class MemeStorageMigration:
+    """
+    Moves the legacy flat meme files into the content-addressed store as a
+    background task.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        storage: MemeStorage,
+        banner_folder: str,
+        preview_folder: str,
+        bytes_per_second: float,
+        chunk_size: int,
+        block_size: int
+    ) -> None:
+        self.logger = logger
+        self.storage = storage
+        self.banner_folder = banner_folder
+        self.preview_folder = preview_folder
+        self.bytes_per_second = bytes_per_second
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+
+        self._task: asyncio.Task[None] | None = None
+        self._migrated = 0
+        self._missing = 0
+        self._total: int | None = None
+        self._bytes_copied = 0
+        self._copy_seconds = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> bool:
+        """
+        Start the migration of all memes that are not migrated yet.
+
+        Returns:
+            bool: False if the migration is already running.
+        """
+        if self.is_running:
+            return False
+
+        self._migrated = 0
+        self._missing = 0
+        self._total = None
+        self._bytes_copied = 0
+        self._copy_seconds = 0.0
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    def stop(self) -> None:
+        """
+        Stop the migration, the memes migrated so far stay migrated.
+        """
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self) -> MemeStorageMigrationStats:
+        """
+        Return the progress of the current or last run.
+        """
+        return MemeStorageMigrationStats(
+            running=self.is_running,
+            migrated=self._migrated,
+            missing=self._missing,
+            total=self._total,
+            bytes_copied=self._bytes_copied,
+            bytes_per_second=(
+                self._bytes_copied /
+                self._copy_seconds if self._copy_seconds > 0 else 0.0
+            ),
+        )
+
+    async def _run(self) -> None:
+        self._total = await self._legacy_memes().count()
+        self.logger.info(
+            "Starting meme storage migration of %d memes",
+            self._total
+        )
+
+        limiter = ThroughputLimiter(self.bytes_per_second)
+        last_uuid: str | None = None
+
+        try:
+            while True:
+                # keyset pagination, memes with missing files stay legacy
+                query = self._legacy_memes()
+                if last_uuid is not None:
+                    query = query.filter(uuid__gt=last_uuid)
+                memes = await query.order_by("uuid").limit(self.chunk_size)
+
+                if len(memes) == 0:
+                    break
+
+                for meme in memes:
+                    await self._migrate(meme, limiter)
+                last_uuid = str(memes[-1].uuid)
+
+                self.logger.info(
+                    "Meme storage migration: %d/%d memes, %.1f MiB/s",
+                    self._migrated + self._missing,
+                    self._total,
+                    self.stats().bytes_per_second / 1024 / 1024
+                )
+        except asyncio.CancelledError:
+            self.logger.info(
+                "Meme storage migration stopped after %d memes",
+                self._migrated
+            )
+            raise
+        except Exception as ex:
+            self.logger.error("Meme storage migration failed: %s", ex)
+            return
+
+        self.logger.info(
+            "Finished meme storage migration: %d memes, %d missing files, "
+            "%.1f MiB copied",
+            self._migrated,
+            self._missing,
+            self._bytes_copied / 1024 / 1024
+        )
+
+    def _legacy_memes(self):
+        return Meme.filter(content_hash__isnull=True)
+
+    async def _migrate(self, meme: Meme, limiter: ThroughputLimiter) -> None:
+        legacy_path = os.path.join(self.storage.raw_folder, meme.file_name)
+
+        start = time.perf_counter()
+        try:
+            content_hash = await asyncio.to_thread(
+                self.storage.import_file,
+                legacy_path,
+                meme.format,
+                self.block_size,
+                limiter.consume
+            )
+        except FileNotFoundError:
+            self._missing += 1
+            self.logger.warning("Meme file %s is missing", legacy_path)
+            return
+        self._copy_seconds += time.perf_counter() - start
+        self._bytes_copied += await asyncio.to_thread(
+            os.path.getsize,
+            legacy_path
+        )
+
+        await Meme.filter(uuid=meme.uuid).update(content_hash=content_hash)
+
+        await asyncio.to_thread(self._remove_legacy_files, meme.file_name)
+        self._migrated += 1
+
+    def _remove_legacy_files(self, file_name: str) -> None:
+        os.remove(os.path.join(self.storage.raw_folder, file_name))
+
+        derived = [
+            os.path.join(self.banner_folder,
+                         file_name),
+            os.path.join(
+                self.preview_folder,
+                f"{os.path.splitext(file_name)[0]}.webp"
+            ),
+        ]
+        for path in derived:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,313 @@
+"""
+Async access to the meme images on disk.
+
+The event loop never touches meme files directly: every read goes through
+the process-wide `meme_storage`, which runs it in the default thread pool
+and counts how many bytes were read. Searches and random picks only return
+`Meme` metadata, the bytes of an image are loaded only where they are
+really needed (the profile banner). Memes sent to Discord are uploaded from
+their path, see `Meme.create_embed`.
+
+Image files are addressed by the SHA-256 hash of their content and sharded
+into two directory levels, so identical files are stored once and no
+directory grows beyond a few hundred entries. A file may be shared by
+several memes, its references are the `Meme` rows with its hash. Files are
+written to a temporary file first and renamed into place, so a crash never
+leaves a half-written image behind.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from tortoise.functions import Count
+
+from models.database.memeData import Meme, MemeFormat
+from utils.constants import Constants
+from utils.memeUtils.memeBannerCacheUtils import (
+    MemeBannerCache,
+    meme_banner_cache,
+)
+
+logger = logging.getLogger("bot")
+
+
+@dataclass
+class MemeStorageStats:
+    """
+    The read counters of the meme storage.
+    """
+    raw_reads: int
+    raw_bytes: int
+    banner_reads: int
+    banner_bytes: int
+
+    @property
+    def reads(self) -> int:
+        return self.raw_reads + self.banner_reads
+
+    @property
+    def bytes_read(self) -> int:
+        return self.raw_bytes + self.banner_bytes
+
+
+class MemeStorage:
+    """
+    Reads meme images and banners without blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        raw_folder: str,
+        banner_cache: MemeBannerCache,
+        preview_folder: str
+    ) -> None:
+        self.raw_folder = raw_folder
+        self.banner_cache = banner_cache
+        self.preview_folder = preview_folder
+
+        # the counters are updated from the worker threads
+        self._lock = threading.Lock()
+        self._raw_reads = 0
+        self._raw_bytes = 0
+        self._banner_reads = 0
+        self._banner_bytes = 0
+
+    def raw_path(self, meme: Meme) -> str:
+        """
+        Return the path of the original image of a meme.
+        """
+        return os.path.join(self.raw_folder, meme.file_path)
+
+    async def read_raw(self, meme: Meme) -> bytes:
+        """
+        Read the original image of a meme in a thread.
+
+        Args:
+            meme (Meme): The meme.
+
+        Returns:
+            bytes: The encoded image.
+        """
+        return await asyncio.to_thread(self._read_raw, meme)
+
+    async def read_banner(self, meme: Meme) -> bytes:
+        """
+        Read the banner of a meme in a thread, rendering it if it is not
+        cached yet.
+
+        Args:
+            meme (Meme): The meme.
+
+        Returns:
+            bytes: The encoded PNG or GIF banner.
+        """
+        banner = await asyncio.to_thread(self.banner_cache.get_banner, meme)
+
+        with self._lock:
+            self._banner_reads += 1
+            self._banner_bytes += len(banner)
+        return banner
+
+    def stats(self) -> MemeStorageStats:
+        """
+        Return the read counters.
+        """
+        with self._lock:
+            return MemeStorageStats(
+                raw_reads=self._raw_reads,
+                raw_bytes=self._raw_bytes,
+                banner_reads=self._banner_reads,
+                banner_bytes=self._banner_bytes,
+            )
+
+    def write_file(self, image_data: bytes, meme_format: MemeFormat) -> str:
+        """
+        Store an image file under its content hash.
+
+        Files that are already stored are not written again, only their
+        modification time is renewed so that `remove_unreferenced` keeps them
+        until the new meme references them. This function blocks and is
+        meant to run in a meme worker process or a thread.
+
+        Args:
+            image_data (bytes): The encoded image.
+            meme_format (MemeFormat): The format of the image.
+
+        Returns:
+            str: The content hash of the file.
+        """
+        content_hash = hashlib.sha256(image_data).hexdigest()
+        path = os.path.join(
+            self.raw_folder,
+            Meme.content_file_path(content_hash,
+                                   meme_format)
+        )
+        try:
+            os.utime(path)
+            return content_hash
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path),
+            suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(image_data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        return content_hash
+
+    def import_file(
+        self,
+        source_path: str,
+        meme_format: MemeFormat,
+        block_size: int,
+        on_block: Callable[[int],
+                           None] | None = None
+    ) -> str:
+        """
+        Copy a file into the content-addressed layout.
+
+        The file is streamed in blocks into a temporary file and hashed on
+        the way, then renamed to its hash. The source is not removed. This
+        function blocks and is meant to run in a thread.
+
+        Args:
+            source_path (str): The path of the file to copy.
+            meme_format (MemeFormat): The format of the image.
+            block_size (int): The number of bytes copied at once.
+            on_block (Callable[[int], None] | None): Called with the size of
+                every copied block, e.g. to limit the throughput.
+
+        Returns:
+            str: The content hash of the file.
+        """
+        os.makedirs(self.raw_folder, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.raw_folder, suffix=".tmp")
+
+        try:
+            with open(source_path, "rb") as source, os.fdopen(fd, "wb") as f:
+                while block := source.read(block_size):
+                    digest.update(block)
+                    f.write(block)
+                    if on_block is not None:
+                        on_block(len(block))
+                f.flush()
+                os.fsync(f.fileno())
+
+            content_hash = digest.hexdigest()
+            path = os.path.join(
+                self.raw_folder,
+                Meme.content_file_path(content_hash,
+                                       meme_format)
+            )
+            try:
+                # renews the grace period of an unreferenced file
+                os.utime(path)
+                os.remove(temp_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return content_hash
+
+    async def reference_counts(self) -> dict[str, int]:
+        """
+        Return how many memes reference every content-addressed file.
+        """
+        rows = await Meme.filter(content_hash__isnull=False).annotate(
+            references=Count("uuid")
+        ).group_by("content_hash").values_list("content_hash",
+                                               "references")
+        return {content_hash: references for content_hash, references in rows}
+
+    async def remove_unreferenced(self, grace_seconds: float) -> int:
+        """
+        Delete the content-addressed files that no meme references, together
+        with their previews (see memeVariantUtils).
+
+        Files younger than `grace_seconds` are kept, their meme may still be
+        on its way through the ingest pipeline.
+
+        Returns:
+            int: The number of deleted files.
+        """
+        files = await asyncio.to_thread(self._content_files)
+        references = await self.reference_counts()
+        deadline = time.time() - grace_seconds
+
+        orphans = [
+            path for content_hash,
+            path,
+            mtime in files
+            if mtime < deadline and references.get(content_hash,
+                                                   0) == 0
+        ]
+        for path in orphans:
+            await asyncio.to_thread(self._remove_file, path)
+            logger.info("Removed unreferenced meme file %s", path)
+
+        return len(orphans)
+
+    def _remove_file(self, path: str) -> None:
+        os.remove(path)
+
+        # the preview mirrors the path of the raw file
+        relative_path = os.path.relpath(path, self.raw_folder)
+        preview_path = os.path.join(
+            self.preview_folder,
+            f"{os.path.splitext(relative_path)[0]}.webp"
+        )
+        try:
+            os.remove(preview_path)
+        except FileNotFoundError:
+            pass
+
+    def _content_files(self) -> list[tuple[str, str, float]]:
+        files: list[tuple[str, str, float]] = []
+        for directory, _, names in os.walk(self.raw_folder):
+            # the legacy flat files live in the root folder
+            if os.path.samefile(directory, self.raw_folder):
+                continue
+
+            for name in names:
+                path = os.path.join(directory, name)
+                content_hash = name.split(".")[0]
+                files.append((content_hash, path, os.path.getmtime(path)))
+        return files
+
+    def _read_raw(self, meme: Meme) -> bytes:
+        with open(self.raw_path(meme), "rb") as f:
+            image_data = f.read()
+
+        with self._lock:
+            self._raw_reads += 1
+            self._raw_bytes += len(image_data)
+        return image_data
+
+
+meme_storage = MemeStorage(
+    Constants.FILE_PATHS.RAW_MEME_FOLDER,
+    meme_banner_cache,
+    Constants.FILE_PATHS.PREVIEW_MEME_FOLDER
+)
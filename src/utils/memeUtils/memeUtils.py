@@ -1,84 +1,69 @@
-import os
+import logging
 import random
-import uuid
 from datetime import datetime
 from io import BytesIO
-from logging import Logger
-from typing import Tuple
 
-import discord
 from PIL import Image, ImageSequence
 from thefuzz import fuzz  # type: ignore
 
 from models.database.memeData import Meme, MemeFormat
 from models.database.userData import User
 from utils.constants import Constants
+from utils.databaseUtils import get_random_instance
 from utils.memeUtils import ocrUtils
-from utils.memeUtils.memeBannerUtils import bannerize_meme_image
+from utils.memeUtils.memeHashUtils import meme_hash_index
+from utils.memeUtils.memeSearchUtils import meme_search_index
+from utils.memeUtils.memeStorageUtils import meme_storage
+from utils.memeUtils.memeVariantUtils import meme_variants
 
+logger = logging.getLogger("bot")
 
-def _ensure_parent_dir(path: str) -> None:
-    directory = os.path.dirname(path)
-    if directory:
-        os.makedirs(directory, exist_ok=True)
 
-
-async def save_meme_image(
-    logger: Logger,
-    image: discord.Attachment,
-    author: User,
-    message: str,
-    date: datetime
-) -> None:
-    """
-    Saves the original meme image to the meme_images directory.
+def process_meme_image(image_data: bytes) -> tuple[MemeFormat, str, str]:
     """
-    image_data = await image.read()
-    image_stream = BytesIO(image_data)
-    img = Image.open(image_stream)
+    Runs the CPU heavy part of saving a meme.
 
-    meme_uuid = str(uuid.uuid4())
-    extension = 'gif' if img.format == 'GIF' else 'png'
+    The original image is stored under its content hash (see
+    memeStorageUtils) together with its preview (see memeVariantUtils), its
+    banner is only rendered when it is needed (see memeBannerCacheUtils).
+    This function blocks for a long time and is meant to run in a worker
+    process of the meme ingest pipeline.
+
+    :param image_data: The raw bytes of the uploaded image.
+    :return: The format of the meme, its OCRed content and the content hash
+        of the stored file.
+    """
+    img = Image.open(BytesIO(image_data))
+    meme_format = MemeFormat.GIF if img.format == 'GIF' else MemeFormat.PNG
 
     # Get the OCRed content of the image
     ocr_content = ocrUtils.get_text_from_image(logger, img)
 
-    # Save the original image
-    original_image_path = f"{Constants.FILE_PATHS.RAW_MEME_FOLDER}/{meme_uuid}.{extension}"
-    save_meme_image_file(img, original_image_path)
-
-    # Create a bannerized version of the image and save it
-    bannerized_image = bannerize_meme_image(image_data, extension == "gif")
-    bannerized_image_path = f"{Constants.FILE_PATHS.BANNERIZED_MEME_FOLDER}/{meme_uuid}.{extension}"
-    save_meme_image_file(
-        Image.open(BytesIO(bannerized_image)),
-        bannerized_image_path
+    # Save the original image and its smaller upload variant
+    content_hash = meme_storage.write_file(encode_meme_image(img), meme_format)
+    meme_variants.write_preview(
+        img,
+        Meme.content_file_path(content_hash,
+                               meme_format)
     )
 
-    # Save metadata about the meme image
-    await save_meme_metadata(
-        meme_uuid,
-        MemeFormat(extension),
-        ocr_content,
-        author,
-        message,
-        date
-    )
+    return meme_format, ocr_content, content_hash
 
 
-def save_meme_image_file(img: Image.Image, path: str) -> None:
-    _ensure_parent_dir(path)
+def encode_meme_image(img: Image.Image) -> bytes:
+    output = BytesIO()
     if img.format == "GIF":
         frames = [frame.copy() for frame in ImageSequence.Iterator(img)]
         frames[0].save(
-            path,
+            output,
             save_all=True,
             append_images=frames[1:],
             loop=0,
             format='GIF'
         )
     else:
-        img.save(path)
+        img.save(output, format='PNG')
+    return output.getvalue()
 
 
 async def save_meme_metadata(
@@ -87,10 +72,16 @@ async def save_meme_metadata(
     content: str,
     author: User,
     message: str,
-    date: datetime
+    date: datetime,
+    phash: str | None = None,
+    content_hash: str | None = None,
+    duplicate_of: Meme | None = None
 ) -> None:
     """
-    Saves metadata about the meme image to a CSV file.
+    Saves metadata about the meme image to the database.
+
+    Reposts are linked to their original through `duplicate_of`, only
+    originals are added to the hash index.
     """
     await Meme.create(
         uuid=meme_uuid,
@@ -98,68 +89,62 @@ async def save_meme_metadata(
         content=content,
         author=author,
         message=message,
-        date=date
+        date=date,
+        phash=phash,
+        content_hash=content_hash,
+        duplicate_of=duplicate_of
     )
+    meme_search_index.add_meme(meme_uuid, content, message)
+    if phash is not None and duplicate_of is None:
+        meme_hash_index.add(meme_uuid, phash)
 
 
-async def get_random_meme(bannerized: bool) -> Tuple[bytes, Meme]:
+async def get_random_meme() -> Meme:
     """
-    Returns a random meme image from the database.
-    :param bannerized: Whether to return a bannerized version of the meme.
-    :return: A tuple containing the meme image and the Meme metadata.
+    Returns a random meme from the database.
+    :return: The Meme metadata, the image is not read.
     """
-    memes = await Meme.all()
+    random_meme = await get_random_instance(Meme)
 
-    if len(memes) == 0:
+    if random_meme is None:
         raise ValueError("No meme images found in the database.")
 
-    random_meme: Meme = random.choice(memes)
-    meme_path = os.path.join(
-        Constants.FILE_PATHS.BANNERIZED_MEME_FOLDER
-        if bannerized else Constants.FILE_PATHS.RAW_MEME_FOLDER,
-        f"{random_meme.uuid}.{random_meme.format.value}"
-    )
+    return random_meme
 
-    with open(meme_path, 'rb') as f:
-        meme_image = f.read()
 
-    return meme_image, random_meme
+async def get_random_meme_banner() -> bytes:
+    """
+    Returns the banner of a random meme.
+    :return: The encoded banner, rendered in a thread if it is not cached.
+    """
+    return await meme_storage.read_banner(await get_random_meme())
 
 
-async def search_memes(search: str,
-                       num: int,
-                       bannerized: bool = False) -> list[tuple[bytes,
-                                                               Meme]]:
+async def search_memes(search: str, num: int) -> list[Meme]:
     """
     Searches for memes containing the given search term.
+
+    The TF-IDF index preselects the best matches, only those are compared
+    with the fuzzy matcher.
+
+    :return: The metadata of up to `num` randomly chosen matches, the images
+        are not read.
     """
-    memes: list[
-        tuple[int,
-              Meme]
-    ] = [
-        (
-            fuzz.token_set_ratio(search,
-                                 meme.content + "\n" + meme.message),
-            meme
-        ) for meme in await Meme.all()
-    ]
+    candidate_uuids = await meme_search_index.search(
+        search,
+        Constants.MEME_SEARCH.CANDIDATE_LIMIT
+    )
+    if len(candidate_uuids) == 0:
+        return []
 
-    filtered_memes: list[tuple[int, Meme]]
-    filtered_memes = [(ratio, meme) for ratio, meme in memes if ratio > 50]
+    filtered_memes: list[Meme] = [
+        meme for meme in await Meme.filter(uuid__in=candidate_uuids)
+        if fuzz.token_set_ratio(search,
+                                meme.content + "\n" +
+                                meme.message) > Constants.MEME_SEARCH.MIN_SCORE
+    ]
 
     if len(filtered_memes) == 0:
         return []
 
-    # Read the selected meme images
-    result: list[tuple[bytes, Meme]] = []
-    for _, meme in random.choices(filtered_memes, k=num):
-        meme_path = os.path.join(
-            Constants.FILE_PATHS.BANNERIZED_MEME_FOLDER
-            if bannerized else Constants.FILE_PATHS.RAW_MEME_FOLDER,
-            f"{meme.uuid}.{meme.format.value}"
-        )
-        with open(meme_path, 'rb') as f:
-            meme_image = f.read()
-        result.append((meme_image, meme))
-
-    return result
+    return random.choices(filtered_memes, k=num)
@@ -0,0 +1,207 @@
+"""
+Size-tiered variants of meme images for uploads to Discord.
+
+Next to the original, every meme gets a preview: a WebP (animated for GIFs)
+scaled down to `MEME_VARIANTS.PREVIEW_MAX_SIZE`. Previews are written in the
+ingest worker for new memes and rendered lazily for older ones. `/meme`
+uploads the best variant that fits the upload budget, the original stays
+one button click away.
+"""
+
+import asyncio
+import math
+import os
+import tempfile
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image, ImageSequence
+
+from models.database.memeData import Meme
+from utils.constants import Constants
+
+
+def render_preview(
+    img: Image.Image,
+    max_size: int,
+    quality: int,
+    max_frames: int
+) -> bytes:
+    """
+    Render the WebP preview of a meme image.
+
+    Animated images keep at most `max_frames` frames, the durations of
+    dropped frames are added to the frame before them.
+
+    Args:
+        img (Image.Image): The original image.
+        max_size (int): The longest side of the preview.
+        quality (int): The WebP quality from 0 to 100.
+        max_frames (int): The maximum number of frames of the preview.
+
+    Returns:
+        bytes: The encoded WebP.
+    """
+    output = BytesIO()
+    source_frames = getattr(img, "n_frames", 1)
+
+    if source_frames == 1:
+        preview = img.convert("RGBA")
+        preview.thumbnail((max_size, max_size), Image.LANCZOS)  # type: ignore
+        preview.save(output, format="WEBP", quality=quality)
+        return output.getvalue()
+
+    step = max(1, math.ceil(source_frames / max_frames))
+    frames: list[Image.Image] = []
+    durations: list[int] = []
+
+    for index, frame in enumerate(ImageSequence.Iterator(img)):
+        duration = int(frame.info.get("duration", 0))
+        if index % step != 0:
+            durations[-1] += duration
+            continue
+
+        preview = frame.convert("RGBA")
+        preview.thumbnail((max_size, max_size), Image.LANCZOS)  # type: ignore
+        frames.append(preview)
+        durations.append(duration)
+
+    frames[0].save(
+        output,
+        format="WEBP",
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=0,
+        quality=quality
+    )
+    return output.getvalue()
+
+
+@dataclass
+class MemeVariant:
+    """
+    A stored variant of a meme image.
+    """
+    path: str
+    size_bytes: int
+    is_original: bool
+
+
+class MemeVariantStore:
+    """
+    Writes, renders and picks the variants of meme images.
+
+    The previews mirror the layout of the raw folder, a content-addressed
+    meme `ab/cd/<hash>.gif` has the preview `ab/cd/<hash>.webp`. The
+    synchronous methods block on PIL and the disk.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        raw_folder: str,
+        max_size: int,
+        quality: int,
+        max_frames: int
+    ) -> None:
+        self.folder = folder
+        self.raw_folder = raw_folder
+        self.max_size = max_size
+        self.quality = quality
+        self.max_frames = max_frames
+
+    def preview_path(self, file_path: str) -> str:
+        """
+        Return the path of the preview of a raw meme file.
+
+        Args:
+            file_path (str): The path of the meme relative to the raw
+                folder, see `Meme.file_path`.
+        """
+        return os.path.join(
+            self.folder,
+            f"{os.path.splitext(file_path)[0]}.webp"
+        )
+
+    def write_preview(self, img: Image.Image, file_path: str) -> None:
+        """
+        Render and store the preview of a meme unless it exists.
+
+        Args:
+            img (Image.Image): The original image.
+            file_path (str): The path of the meme relative to the raw
+                folder.
+        """
+        path = self.preview_path(file_path)
+        if os.path.exists(path):
+            return
+
+        preview = render_preview(
+            img,
+            self.max_size,
+            self.quality,
+            self.max_frames
+        )
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path),
+            suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(preview)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def select(self, meme: Meme, max_bytes: int) -> MemeVariant:
+        """
+        Pick the variant of a meme to upload.
+
+        The original is used if it fits into `max_bytes`. Otherwise the
+        preview is rendered if needed and used if it is smaller than the
+        original.
+
+        Args:
+            meme (Meme): The meme.
+            max_bytes (int): The upload budget.
+
+        Returns:
+            MemeVariant: The chosen variant.
+        """
+        raw_path = os.path.join(self.raw_folder, meme.file_path)
+        original = MemeVariant(raw_path, os.path.getsize(raw_path), True)
+        if original.size_bytes <= max_bytes:
+            return original
+
+        preview_path = self.preview_path(meme.file_path)
+        if not os.path.exists(preview_path):
+            with Image.open(raw_path) as img:
+                self.write_preview(img, meme.file_path)
+
+        preview = MemeVariant(
+            preview_path,
+            os.path.getsize(preview_path),
+            False
+        )
+        if preview.size_bytes < original.size_bytes:
+            return preview
+        return original
+
+    async def select_variant(self, meme: Meme, max_bytes: int) -> MemeVariant:
+        """
+        Pick the variant of a meme to upload in a thread, see `select`.
+        """
+        return await asyncio.to_thread(self.select, meme, max_bytes)
+
+
+meme_variants = MemeVariantStore(
+    Constants.FILE_PATHS.PREVIEW_MEME_FOLDER,
+    Constants.FILE_PATHS.RAW_MEME_FOLDER,
+    Constants.MEME_VARIANTS.PREVIEW_MAX_SIZE,
+    Constants.MEME_VARIANTS.PREVIEW_QUALITY,
+    Constants.MEME_VARIANTS.PREVIEW_MAX_FRAMES
+)
@@ -1,13 +1,172 @@
+import logging
+import threading
+import time
 from logging import Logger
 from typing import Any
 
 import easyocr
 import numpy as np
+from numpy.typing import NDArray
 from PIL import ImageSequence
 from PIL.Image import Image as PILImage
 
 from utils.constants import Constants
 
+logger = logging.getLogger("bot")
+
+
+class OCREngine:
+    """
+    Keeps an easyocr Reader loaded and reuses it for all images.
+
+    Loading the detection and recognition models takes seconds and hundreds
+    of MB, so the reader is created on first use (or by `preload`) and only
+    released again after it was idle for `idle_timeout` seconds. Every
+    process has its own engine, see `ocr_engine`.
+    """
+
+    def __init__(
+        self,
+        languages: list[str],
+        model_storage_directory: str,
+        idle_timeout: float
+    ) -> None:
+        self.languages = languages
+        self.model_storage_directory = model_storage_directory
+        self.idle_timeout = idle_timeout
+
+        self._reader: easyocr.Reader | None = None
+        # easyocr readers are not thread safe
+        self._lock = threading.Lock()
+        self._idle_timer: threading.Timer | None = None
+        self._last_used = 0.0
+
+        self.loads = 0
+        self.images = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._reader is not None
+
+    def preload(self) -> None:
+        """
+        Load the models now instead of on the first image.
+        """
+        with self._lock:
+            self._get_reader()
+            self._last_used = time.monotonic()
+            self._restart_idle_timer()
+
+    def readtext(self, image: NDArray[Any]) -> list[Any]:
+        """
+        Run OCR on an image, loading the models if necessary.
+
+        Args:
+            image (NDArray[Any]): The image as NumPy array.
+
+        Returns:
+            list[Any]: The easyocr results (box, text, confidence).
+        """
+        with self._lock:
+            reader = self._get_reader()
+            try:
+                result: list[Any] = reader.readtext(image)
+            finally:
+                self.images += 1
+                self._last_used = time.monotonic()
+                self._restart_idle_timer()
+        return result
+
+    def readtext_batched(self,
+                         images: list[NDArray[Any]],
+                         batch_size: int) -> list[list[Any]]:
+        """
+        Run OCR on several images of the same size at once.
+
+        Args:
+            images (list[NDArray[Any]]): The images as NumPy arrays.
+            batch_size (int): How many text boxes are recognised at once.
+
+        Returns:
+            list[list[Any]]: The easyocr results of every image.
+        """
+        if len(images) == 0:
+            return []
+
+        with self._lock:
+            reader = self._get_reader()
+            try:
+                result: list[
+                    list[Any]
+                ] = reader.readtext_batched(images,
+                                            batch_size=batch_size)
+            finally:
+                self.images += len(images)
+                self._last_used = time.monotonic()
+                self._restart_idle_timer()
+        return result
+
+    def release(self) -> None:
+        """
+        Drop the loaded models so their memory can be reclaimed.
+        """
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+
+            if self._reader is not None:
+                self._reader = None
+                logger.info("Released OCR models")
+
+    def _release_if_idle(self) -> None:
+        # a timer that fired while an image was processed is outdated
+        if time.monotonic() - self._last_used >= self.idle_timeout:
+            self.release()
+
+    def _get_reader(self) -> easyocr.Reader:
+        if self._reader is None:
+            start = time.perf_counter()
+            self._reader = easyocr.Reader(
+                self.languages,
+                model_storage_directory=self.model_storage_directory
+            )
+            self.loads += 1
+            logger.info(
+                "Loaded OCR models in %.1f s",
+                time.perf_counter() - start
+            )
+        return self._reader
+
+    def _restart_idle_timer(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+
+        self._idle_timer = threading.Timer(
+            self.idle_timeout,
+            self._release_if_idle
+        )
+        # an idle timer must not keep the process alive
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+
+ocr_engine = OCREngine(
+    Constants.OCR.LANGUAGES,
+    Constants.FILE_PATHS.OCR_DATA_FOLDER,
+    Constants.OCR.IDLE_TIMEOUT_SECONDS
+)
+
+
+def preload_ocr_engine() -> None:
+    """
+    Load the OCR models of this process if configured.
+
+    Used as initializer of the meme ingest worker processes.
+    """
+    if Constants.OCR.PRELOAD:
+        ocr_engine.preload()
+
 
 def get_text_from_image(logger: Logger, image_file: PILImage) -> str:
     if image_file.format == "GIF":
@@ -19,11 +178,6 @@ def get_text_from_image(logger: Logger, image_file: PILImage) -> str:
     np_arr = np.array(image)
 
     logger.info("Starting OCR")
-    reader = easyocr.Reader(
-        ["de",
-         "en"],
-        model_storage_directory=Constants.FILE_PATHS.OCR_DATA_FOLDER
-    )
-    result: list[Any] = reader.readtext(np_arr)
+    result = ocr_engine.readtext(np_arr)
     logger.info("Finished OCR : %s", result)
     return "\n".join([item[1] for item in result])
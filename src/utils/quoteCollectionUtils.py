@@ -0,0 +1,113 @@
+"""
+The per-user buffer of messages collected for a quote.
+"""
+
+from dataclasses import dataclass
+
+from cachetools import TTLCache
+
+from models.quotes.quoteModels import CollectedMessage
+
+
+@dataclass
+class QuoteCollectionStats:
+    """
+    The current size of the quote collection buffer.
+    """
+    users: int
+    messages: int
+    size_bytes: int
+    max_bytes: int
+
+
+class QuoteCollectionBuffer:
+    """
+    Stores the messages every user collects with "Nachricht zu Quote
+    hinzufügen" until they are posted, cleared or expire.
+
+    Only compact `CollectedMessage` entries are kept. Every user may collect
+    a limited number of messages and the estimated size of all entries is
+    bounded; if it is exceeded, the least recently used collections are
+    dropped.
+    """
+
+    def __init__(
+        self,
+        ttl: int,
+        max_messages_per_user: int,
+        max_bytes: int
+    ) -> None:
+        self.ttl = ttl
+        self.max_messages_per_user = max_messages_per_user
+
+        # tuples are immutable, so the cached size stays correct
+        self._cache: TTLCache[int, tuple[CollectedMessage, ...]]
+        self._cache = TTLCache(
+            maxsize=max_bytes,
+            ttl=ttl,
+            getsizeof=_collection_size,
+        )
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._cache
+
+    def add(self, user_id: int, message: CollectedMessage) -> int | None:
+        """
+        Add a message to the collection of a user.
+
+        Args:
+            user_id (int): The user collecting the message.
+            message (CollectedMessage): The collected message.
+
+        Returns:
+            int | None: The number of collected messages or None if the user
+            already collected the maximum number of messages.
+        """
+        messages = self._cache.get(user_id, ())
+
+        if len(messages) >= self.max_messages_per_user:
+            return None
+
+        self._cache[user_id] = messages + (message,
+                                           )
+        return len(messages) + 1
+
+    def get(self, user_id: int) -> list[CollectedMessage]:
+        """
+        Return the messages collected by a user.
+
+        Args:
+            user_id (int): The user.
+
+        Returns:
+            list[CollectedMessage]: The collected messages, may be empty.
+        """
+        return list(self._cache.get(user_id, ()))
+
+    def pop(self, user_id: int) -> list[CollectedMessage]:
+        """
+        Remove and return the messages collected by a user.
+
+        Args:
+            user_id (int): The user.
+
+        Returns:
+            list[CollectedMessage]: The collected messages, may be empty.
+        """
+        return list(self._cache.pop(user_id, ()))
+
+    def stats(self) -> QuoteCollectionStats:
+        """
+        Return the current size of the buffer.
+        """
+        self._cache.expire()
+        return QuoteCollectionStats(
+            users=len(self._cache),
+            messages=sum(len(messages) for messages in self._cache.values()),
+            size_bytes=int(self._cache.currsize),
+            max_bytes=int(self._cache.maxsize),
+        )
+
+
+def _collection_size(messages: tuple[CollectedMessage, ...]) -> int:
+    return sum(message.size() for message in messages)
@@ -0,0 +1,602 @@
+"""
+Batch scoring of quotes against a search term and a user name.
+
+The scores are identical to the ones of `quoteUtils.rank_quote`, but instead
+of calling `fuzz.token_set_ratio` once per message, comment and name, all
+texts and names are normalised once and scored in a single vectorised
+rapidfuzz call.
+
+The process-wide `quote_corpus` keeps such an engine for all quotes in
+memory. It is loaded once and updated whenever a quote is stored or deleted
+or a user changes their display name.
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+import numpy as np
+from numpy.typing import NDArray
+from rapidfuzz import fuzz, process
+from thefuzz.utils import full_process  # type: ignore
+
+from models.database.quoteData import Quote, QuoteMessage
+from utils.constants import Constants
+
+# Texts are cut to this length before scoring, see rank_quote
+MAX_TEXT_LENGTH = 2000
+
+logger = logging.getLogger("bot")
+
+
+def normalize(text: str) -> str:
+    """
+    Normalise a text the same way thefuzz does before comparing strings.
+
+    Args:
+        text (str): The text to normalise.
+
+    Returns:
+        str: The lowercased ASCII text with only letters, digits and spaces.
+    """
+    return full_process(text, force_ascii=True)
+
+
+class QuoteScoringEngine:
+    """
+    A pre-normalised corpus of quote texts and author / reporter names.
+
+    Every text and name is stored once in a flat list together with the row
+    of the quote it belongs to, so a query can be scored against the whole
+    corpus with one `process.cdist` call and reduced to one score per quote.
+    Names also keep the id of their user, so a renamed user can be updated
+    in place.
+    """
+
+    def __init__(self) -> None:
+        self.quote_ids: list[int] = []
+        self._rows: dict[int, int] = {}
+
+        self._texts: list[str] = []
+        self._text_rows: array[int] = array("l")
+        self._names: list[str] = []
+        self._name_rows: array[int] = array("l")
+        self._name_users: array[int] = array("q")
+
+    @classmethod
+    def from_quotes(cls, quotes: Iterable[Quote]) -> "QuoteScoringEngine":
+        """
+        Build an engine from quotes with prefetched messages and users.
+
+        Args:
+            quotes (Iterable[Quote]): The quotes to add to the corpus.
+
+        Returns:
+            QuoteScoringEngine: The engine containing all quotes.
+        """
+        engine = cls()
+        for quote in quotes:
+            engine.add_quote(
+                quote.id,
+                [quote.comment] + [msg.content for msg in quote.messages],
+                [(quote.reporter.id,
+                  quote.reporter.display_name)] +
+                [(msg.author.id,
+                  msg.author.display_name) for msg in quote.messages],
+            )
+        return engine
+
+    def __len__(self) -> int:
+        return len(self.quote_ids)
+
+    def __contains__(self, quote_id: int) -> bool:
+        return quote_id in self._rows
+
+    def add_quote(
+        self,
+        quote_id: int,
+        texts: Iterable[str | None],
+        users: Iterable[tuple[int, str]],
+    ) -> None:
+        """
+        Add a quote to the corpus.
+
+        Args:
+            quote_id (int): The id of the quote.
+            texts (Iterable[str | None]): The comment and message contents.
+                Empty texts are skipped like in rank_quote.
+            users (Iterable[tuple[int, str]]): The ids and display names of
+                the reporter and the authors.
+        """
+        if quote_id in self._rows:
+            return
+
+        row = len(self.quote_ids)
+        self.quote_ids.append(quote_id)
+        self._rows[quote_id] = row
+
+        for text in texts:
+            if text:
+                self._texts.append(normalize(text[:MAX_TEXT_LENGTH]))
+                self._text_rows.append(row)
+
+        for user_id, name in users:
+            self._names.append(normalize(name))
+            self._name_rows.append(row)
+            self._name_users.append(user_id)
+
+    def remove_quote(self, quote_id: int) -> bool:
+        """
+        Remove a quote from the corpus.
+
+        The rows of all later quotes move up by one, which copies the tail
+        of every list once.
+
+        Args:
+            quote_id (int): The id of the quote.
+
+        Returns:
+            bool: False if the quote is not in the corpus.
+        """
+        row = self._rows.pop(quote_id, None)
+        if row is None:
+            return False
+
+        del self.quote_ids[row]
+        for later_id in self.quote_ids[row:]:
+            self._rows[later_id] -= 1
+
+        start, end = self._remove_row(self._text_rows, row)
+        del self._texts[start:end]
+
+        start, end = self._remove_row(self._name_rows, row)
+        del self._names[start:end]
+        del self._name_users[start:end]
+        return True
+
+    def rename_user(self, user_id: int, display_name: str) -> int:
+        """
+        Replace the display name of a user in all of their quotes.
+
+        Args:
+            user_id (int): The id of the user.
+            display_name (str): The new display name.
+
+        Returns:
+            int: The number of replaced names.
+        """
+        positions = np.flatnonzero(
+            np.frombuffer(self._name_users,
+                          dtype=self._name_users.typecode) == user_id
+        )
+
+        name = normalize(display_name)
+        for position in positions.tolist():
+            self._names[position] = name
+        return len(positions)
+
+    def subset(self, quote_ids: Iterable[int]) -> "QuoteScoringEngine":
+        """
+        Create an engine that only contains the given quotes.
+
+        The texts and names are copied already normalised. Unknown ids are
+        ignored.
+
+        Args:
+            quote_ids (Iterable[int]): The ids of the quotes to keep.
+
+        Returns:
+            QuoteScoringEngine: The smaller engine.
+        """
+        engine = QuoteScoringEngine()
+        text_rows = np.frombuffer(
+            self._text_rows,
+            dtype=self._text_rows.typecode
+        )
+        name_rows = np.frombuffer(
+            self._name_rows,
+            dtype=self._name_rows.typecode
+        )
+
+        for quote_id in quote_ids:
+            row = self._rows.get(quote_id)
+            if row is None or quote_id in engine:
+                continue
+
+            new_row = len(engine.quote_ids)
+            engine.quote_ids.append(quote_id)
+            engine._rows[quote_id] = new_row
+
+            # rows are appended in ascending order, so they can be bisected
+            start, end = np.searchsorted(text_rows, [row, row + 1])
+            engine._texts.extend(self._texts[start:end])
+            engine._text_rows.extend([new_row] * int(end - start))
+
+            start, end = np.searchsorted(name_rows, [row, row + 1])
+            engine._names.extend(self._names[start:end])
+            engine._name_rows.extend([new_row] * int(end - start))
+            engine._name_users.extend(self._name_users[start:end])
+
+        return engine
+
+    def snapshot(self) -> "QuoteScoringEngine":
+        """
+        Create a copy of the engine that can be scored in a thread while
+        quotes are added to the original.
+
+        Only the lists are copied, the normalised strings are shared.
+
+        Returns:
+            QuoteScoringEngine: The copy.
+        """
+        engine = QuoteScoringEngine()
+        engine.quote_ids = self.quote_ids[:]
+        engine._rows = dict(self._rows)
+        engine._texts = self._texts[:]
+        engine._text_rows = self._text_rows[:]
+        engine._names = self._names[:]
+        engine._name_rows = self._name_rows[:]
+        engine._name_users = self._name_users[:]
+        return engine
+
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory used by the corpus.
+
+        Returns:
+            int: The size of the lists, strings, arrays and the id index in
+            bytes.
+        """
+        size = sys.getsizeof(self.quote_ids) + sys.getsizeof(self._rows)
+        size += sum(sys.getsizeof(quote_id) for quote_id in self.quote_ids)
+
+        for strings in (self._texts, self._names):
+            size += sys.getsizeof(strings)
+            size += sum(sys.getsizeof(string) for string in strings)
+
+        for rows in (self._text_rows, self._name_rows, self._name_users):
+            size += sys.getsizeof(rows)
+
+        return size
+
+    def score(
+        self,
+        search_term: str | None,
+        user_name: str | None,
+    ) -> NDArray[np.int64]:
+        """
+        Score all quotes of the corpus at once.
+
+        Args:
+            search_term (str | None): The search term.
+            user_name (str | None): The author / reporter to search.
+
+        Returns:
+            NDArray[np.int64]: The 0-100 score of every quote, in the order
+            of `quote_ids`.
+        """
+        text_scores = np.zeros(len(self.quote_ids), dtype=np.int64)
+        user_scores = np.zeros(len(self.quote_ids), dtype=np.int64)
+
+        if search_term:
+            self._max_scores(
+                text_scores,
+                normalize(search_term),
+                self._texts,
+                self._text_rows
+            )
+
+        if user_name:
+            self._max_scores(
+                user_scores,
+                normalize(user_name),
+                self._names,
+                self._name_rows
+            )
+
+        # weighted average, stays in 0-100 range
+        weighted = np.rint(
+            text_scores * Constants.QUOTE_WEIGHTS.TEXT_WEIGHT +
+            user_scores * Constants.QUOTE_WEIGHTS.USER_WEIGHT
+        ).astype(np.int64)
+
+        return np.where(
+            text_scores == 0,
+            user_scores,
+            np.where(user_scores == 0,
+                     text_scores,
+                     weighted)
+        )
+
+    def search(
+        self,
+        search_term: str | None,
+        user_name: str | None,
+    ) -> list[int]:
+        """
+        Return the ids of all quotes scoring above the minimum score.
+
+        Args:
+            search_term (str | None): The search term.
+            user_name (str | None): The author / reporter to search.
+
+        Returns:
+            list[int]: The ids of the matching quotes.
+        """
+        scores = self.score(search_term, user_name)
+        matches = np.flatnonzero(scores > Constants.QUOTE_SEARCH.MIN_SCORE)
+        return [self.quote_ids[row] for row in matches]
+
+    @staticmethod
+    def _remove_row(rows: "array[int]", row: int) -> tuple[int, int]:
+        values = np.frombuffer(rows, dtype=rows.typecode)
+        start, end = np.searchsorted(values, [row, row + 1])
+        later = (values[end:] - 1).tobytes()
+        # the buffer must be released before the array can shrink
+        del values
+
+        del rows[start:]
+        rows.frombytes(later)
+        return int(start), int(end)
+
+    @staticmethod
+    def _max_scores(
+        result: NDArray[np.int64],
+        query: str,
+        choices: list[str],
+        rows: "array[int]",
+    ) -> None:
+        if len(choices) == 0:
+            return
+
+        # token_set_ratio is symmetric, so the choices are passed as queries
+        # to let rapidfuzz split the work over its workers
+        scores = process.cdist(
+            choices,
+            [query],
+            scorer=fuzz.token_set_ratio,
+            processor=None,
+            dtype=np.float64,
+            workers=Constants.QUOTE_SEARCH.SCORING_WORKERS,
+        )[:,
+          0]
+
+        np.maximum.at(
+            result,
+            np.frombuffer(rows,
+                          dtype=rows.typecode),
+            np.rint(scores).astype(np.int64)
+        )
+
+
+@dataclass
+class QuoteCorpusStats:
+    """
+    Size and staleness counters of the in-memory quote corpus.
+    """
+    quotes: int
+    texts: int
+    names: int
+    memory_bytes: int
+    loaded_at: float | None
+    updates_since_load: int
+    rebuilds: int
+
+    @property
+    def age_seconds(self) -> float | None:
+        if self.loaded_at is None:
+            return None
+        return time.time() - self.loaded_at
+
+
+class QuoteCorpus:
+    """
+    The process-wide in-memory corpus that quote searches read from.
+
+    The corpus is loaded once from the database and afterwards kept up to
+    date by `add_quote`, `remove_quote` and `rename_user`, which have to be
+    called whenever a quote is stored or deleted or a user is renamed. It
+    can be rebuilt at any time, changes made during a rebuild are not lost.
+    """
+
+    def __init__(self) -> None:
+        self._engine: QuoteScoringEngine | None = None
+        self._lock = asyncio.Lock()
+        self._pending: list[Callable[[QuoteScoringEngine], object]] | None
+        self._pending = None
+
+        self._loaded_at: float | None = None
+        self._updates_since_load = 0
+        self._rebuilds = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._engine is not None
+
+    async def load(self) -> None:
+        """
+        Load the corpus from the database unless it is already loaded.
+        """
+        async with self._lock:
+            if self._engine is None:
+                await self._build()
+
+    async def rebuild(self) -> None:
+        """
+        Replace the corpus with a fresh copy from the database.
+        """
+        async with self._lock:
+            await self._build()
+
+    def add_quote(
+        self,
+        quote_id: int,
+        texts: list[str | None],
+        users: list[tuple[int, str]],
+    ) -> None:
+        """
+        Add a freshly stored quote to the corpus.
+
+        Args:
+            quote_id (int): The id of the quote.
+            texts (list[str | None]): The comment and message contents.
+            users (list[tuple[int, str]]): The ids and display names of the
+                reporter and the authors.
+        """
+        self._apply(lambda engine: engine.add_quote(quote_id, texts, users))
+
+    def remove_quote(self, quote_id: int) -> None:
+        """
+        Remove a deleted quote from the corpus.
+
+        Args:
+            quote_id (int): The id of the quote.
+        """
+        self._apply(lambda engine: engine.remove_quote(quote_id))
+
+    def rename_user(self, user_id: int, display_name: str) -> None:
+        """
+        Update the name of a renamed user in all of their quotes.
+
+        Args:
+            user_id (int): The id of the user.
+            display_name (str): The new display name.
+        """
+        self._apply(
+            lambda engine: engine.rename_user(user_id,
+                                              display_name)
+        )
+
+    async def search(
+        self,
+        search_term: str | None,
+        user_name: str | None,
+        candidate_ids: list[int] | None = None,
+    ) -> list[int]:
+        """
+        Return the ids of all quotes matching the search term and user.
+
+        Args:
+            search_term (str | None): The search term.
+            user_name (str | None): The author / reporter to search.
+            candidate_ids (list[int] | None): If given, only these quotes
+                are scored.
+
+        Returns:
+            list[int]: The ids of the matching quotes.
+        """
+        engine = await self._get_engine()
+
+        # the copy is not changed by quotes stored during the search
+        if candidate_ids is not None:
+            engine = engine.subset(candidate_ids)
+        else:
+            engine = engine.snapshot()
+
+        # rapidfuzz releases the GIL, name-only searches score the whole
+        # corpus and must not block the event loop
+        return await asyncio.to_thread(engine.search, search_term, user_name)
+
+    async def random_quote_id(self) -> int | None:
+        """
+        Return the id of a random quote of the corpus.
+
+        Returns:
+            int | None: The id or None if there are no quotes.
+        """
+        engine = await self._get_engine()
+
+        if len(engine) == 0:
+            return None
+
+        return random.choice(engine.quote_ids)
+
+    def stats(self) -> QuoteCorpusStats:
+        """
+        Return the current size and staleness counters of the corpus.
+        """
+        engine = self._engine or QuoteScoringEngine()
+        return QuoteCorpusStats(
+            quotes=len(engine),
+            texts=len(engine._texts),
+            names=len(engine._names),
+            memory_bytes=engine.memory_usage(),
+            loaded_at=self._loaded_at,
+            updates_since_load=self._updates_since_load,
+            rebuilds=self._rebuilds,
+        )
+
+    def _apply(self, change: Callable[[QuoteScoringEngine], object]) -> None:
+        # changes made while the database is read are applied again to the
+        # new engine
+        if self._pending is not None:
+            self._pending.append(change)
+
+        if self._engine is not None:
+            change(self._engine)
+            self._updates_since_load += 1
+
+    async def _get_engine(self) -> QuoteScoringEngine:
+        if self._engine is None:
+            await self.load()
+        assert self._engine is not None
+        return self._engine
+
+    async def _build(self) -> None:
+        start = time.perf_counter()
+        self._pending = []
+
+        try:
+            quotes = await Quote.all().order_by("id").values_list(
+                "id",
+                "comment",
+                "reporter_id",
+                "reporter__display_name"
+            )
+            messages = await QuoteMessage.all().order_by("id").values_list(
+                "quote_id",
+                "content",
+                "author_id",
+                "author__display_name"
+            )
+
+            texts: defaultdict[int, list[str | None]] = defaultdict(list)
+            users: defaultdict[int, list[tuple[int, str]]] = defaultdict(list)
+            for quote_id, content, author_id, author_name in messages:
+                texts[quote_id].append(content)
+                users[quote_id].append((author_id, author_name))
+
+            engine = QuoteScoringEngine()
+            for quote_id, comment, reporter_id, reporter_name in quotes:
+                engine.add_quote(
+                    quote_id,
+                    [comment] + texts[quote_id],
+                    [(reporter_id,
+                      reporter_name)] + users[quote_id]
+                )
+
+            # quotes stored, deleted or renamed while the database was read
+            for change in self._pending:
+                change(engine)
+        finally:
+            self._pending = None
+
+        self._engine = engine
+        self._loaded_at = time.time()
+        self._updates_since_load = 0
+        self._rebuilds += 1
+
+        logger.info(
+            "Loaded %d quotes into the quote corpus in %.1f ms",
+            len(engine),
+            (time.perf_counter() - start) * 1000
+        )
+
+
+quote_corpus = QuoteCorpus()
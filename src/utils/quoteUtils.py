@@ -1,15 +1,28 @@
+import logging
 import random
+import re
+import time
 
 import discord
 from discord import ApplicationContext, Color, Embed
 from discord.utils import utcnow
 from thefuzz import fuzz  # type: ignore
+from tortoise import connections
+from tortoise.transactions import in_transaction
 
 from models.database.quoteData import Quote, QuoteMessage
-from models.database.userData import User
-from models.quotes.quoteModels import PartialMessage
+from models.quotes.quoteModels import (
+    CollectedMessage,
+    MessageAuthor,
+    PartialMessage,
+)
 from utils.constants import Constants
+from utils.databaseUtils import get_random_instance
 from utils.externalUserUtils import get_or_create_external_user
+from utils.quoteSearchUtils import quote_corpus
+from utils.userUtils import user_directory
+
+logger = logging.getLogger("bot")
 
 
 def build_quote_embed(
@@ -75,39 +88,66 @@ def _build_quote_embed_link(message: PartialMessage) -> str:
 
 async def store_quote_in_db(
     ctx: ApplicationContext,
-    messages: list[discord.Message],
+    messages: list[CollectedMessage],
     comment: str | None
 ):
     """
     Stores a quote with its messages in the database.
 
+    The reporter and all authors are upserted with one statement and the
+    messages are inserted with one bulk insert, all in a single transaction.
+
     Args:
         ctx (ApplicationContext): The app context.
-        messages (list[discord.Message]): The messages to quote.
+        messages (list[CollectedMessage]): The messages to quote.
         comment (str | None): An optional comment to add.
     """
-    reporter, _ = await User.get_or_create(
-        id=int(ctx.author.id), defaults={
-            "global_name": ctx.author.name, "display_name": ctx.author.display_name})
-
+    start = time.perf_counter()
     date_reported = msg.created_at if (msg := ctx.message) else utcnow()
 
-    quote = await Quote.create(
-        reporter=reporter,
-        date_reported=date_reported,
-        comment=comment
+    members = [MessageAuthor.from_discord_user(ctx.author)]
+    members += [message.author for message in messages]
+
+    try:
+        async with in_transaction() as connection:
+            await user_directory.upsert_users(members, connection)
+
+            quote = await Quote.create(
+                reporter_id=int(ctx.author.id),
+                date_reported=date_reported,
+                comment=comment,
+                using_db=connection
+            )
+
+            await QuoteMessage.bulk_create(
+                [
+                    QuoteMessage(
+                        content=message.message.content or "",
+                        author_id=message.author.id,
+                        date=message.created_at,
+                        quote_id=quote.id
+                    ) for message in messages
+                ],
+                using_db=connection
+            )
+    except Exception:
+        # the cached names may not have been written
+        user_directory.invalidate(member.id for member in members)
+        raise
+
+    logger.info(
+        "Stored quote %d with %d messages in %.1f ms",
+        quote.id,
+        len(messages),
+        (time.perf_counter() - start) * 1000
     )
 
-    for message in messages:
-        author, _ = await User.get_or_create(
-            id=int(message.author.id), defaults={
-                "global_name": message.author.name, "display_name": message.author.display_name})
-        await QuoteMessage.create(
-            content=message.content,
-            author=author,
-            date=message.created_at,
-            quote=quote
-        )
+    quote_corpus.add_quote(
+        quote.id,
+        [comment] + [message.message.content for message in messages],
+        [(int(member.id),
+          member.display_name) for member in members]
+    )
 
 
 async def store_external_quote_in_db(
@@ -129,13 +169,7 @@ async def store_external_quote_in_db(
         comment (str | None): An optional comment to add.
     """
     # Get or create the reporter (real Discord user)
-    reporter, _ = await User.get_or_create(
-        id=int(ctx.author.id),
-        defaults={
-            "global_name": ctx.author.name,
-            "display_name": ctx.author.display_name
-        }
-    )
+    reporter = await user_directory.get_user(ctx.author)
 
     # Get or create the external author (negative ID)
     author = await get_or_create_external_user(author_name)
@@ -155,6 +189,16 @@ async def store_external_quote_in_db(
         quote=quote
     )
 
+    quote_corpus.add_quote(
+        quote.id,
+        [comment,
+         content],
+        [(reporter.id,
+          reporter.display_name),
+         (author.id,
+          author.display_name)]
+    )
+
 
 async def send_embed(
     ctx: ApplicationContext,
@@ -195,12 +239,20 @@ async def get_random_quote() -> Quote:
     Returns:
         Quote: A random quote from the database.
     """
-    quotes = await Quote.all()
+    quote_id = await quote_corpus.random_quote_id()
 
-    if len(quotes) == 0:
+    if quote_id is None:
         raise ValueError("No quotes found in the database.")
 
-    random_quote: Quote = random.choice(quotes)
+    random_quote = await Quote.get_or_none(id=quote_id)
+
+    if random_quote is None:
+        # the quote was deleted since the corpus was loaded
+        quote_corpus.remove_quote(quote_id)
+        random_quote = await get_random_instance(Quote)
+
+    if random_quote is None:
+        raise ValueError("No quotes found in the database.")
 
     return random_quote
 
@@ -215,6 +267,10 @@ async def search_quotes(
 
     If only one is given, it will not care about the other. If both are given, this is an AND.
 
+    The FTS index preselects the quotes to score. It only finds words that
+    start with a word of the search term, so if it yields fewer than `num`
+    matches the whole corpus is scored instead to still find typos.
+
     Args:
         search_term (str | None): The search term.
         user_name (str | None): The author / reporter to search.
@@ -223,35 +279,107 @@ async def search_quotes(
     Returns:
         list[Quote]: The matching results.
     """
-    quotes = await Quote.all().prefetch_related(
-        "messages",
-        "messages__author",
-        "reporter"
-    )
+    candidate_ids: list[int] | None = None
+
+    if search_term:
+        candidate_ids = await get_fts_candidate_ids(search_term)
+
+    matching_ids: list[int] = []
+    if candidate_ids is None or len(candidate_ids) > 0:
+        matching_ids = await quote_corpus.search(
+            search_term,
+            user_name,
+            candidate_ids
+        )
+
+    if candidate_ids is not None and len(matching_ids) < num:
+        # "kafee" is no prefix of "kaffee", only the fuzzy scoring finds it
+        matching_ids = await quote_corpus.search(search_term, user_name)
 
-    ranked_quotes = [
-        (
-            rank_quote(
-                quote,
-                search_term,
-                user_name,
-            ),
-            quote,
-        ) for quote in quotes
-    ]
-
-    filtered_quotes = [
-        (
-            score,
-            quote,
-        ) for score,
-        quote in ranked_quotes if score > 55
-    ]
-
-    if len(filtered_quotes) == 0:
+    if len(matching_ids) == 0:
         return []
 
-    return random.choices([quote for _, quote in filtered_quotes], k=num)
+    chosen_ids = random.choices(matching_ids, k=num)
+    quotes = {
+        quote.id: quote
+        for quote in await Quote.filter(id__in=set(chosen_ids))
+    }
+
+    # quotes deleted since the corpus was loaded
+    for quote_id in set(chosen_ids) - quotes.keys():
+        quote_corpus.remove_quote(quote_id)
+
+    return [quotes[quote_id] for quote_id in chosen_ids if quote_id in quotes]
+
+
+async def get_fts_candidate_ids(search_term: str) -> list[int] | None:
+    """
+    Uses the FTS5 index to preselect quotes that may match the search term.
+
+    Both the message contents and the quote comments are searched, the
+    results are ordered by their best bm25 rank and capped at
+    `Constants.QUOTE_SEARCH.FTS_CANDIDATE_LIMIT`.
+
+    Args:
+        search_term (str): The search term.
+
+    Returns:
+        list[int] | None: The ids of the candidate quotes, or None if the
+        search term contains no searchable tokens.
+    """
+    match_query = build_fts_query(search_term)
+
+    if match_query is None:
+        return None
+
+    rows = await connections.get("default").execute_query_dict(
+        """
+        SELECT "quote_id" FROM (
+            SELECT "quotemessage"."quote_id" AS "quote_id",
+                   bm25("quotemessage_fts") AS "rank"
+            FROM "quotemessage_fts"
+            JOIN "quotemessage"
+              ON "quotemessage"."id" = "quotemessage_fts"."rowid"
+            WHERE "quotemessage_fts" MATCH ?
+            UNION ALL
+            SELECT "rowid" AS "quote_id", bm25("quote_fts") AS "rank"
+            FROM "quote_fts"
+            WHERE "quote_fts" MATCH ?
+        )
+        GROUP BY "quote_id"
+        ORDER BY MIN("rank")
+        LIMIT ?
+        """,
+        [
+            match_query,
+            match_query,
+            Constants.QUOTE_SEARCH.FTS_CANDIDATE_LIMIT,
+        ]
+    )
+
+    return [int(row["quote_id"]) for row in rows]
+
+
+def build_fts_query(search_term: str) -> str | None:
+    """
+    Builds an FTS5 MATCH expression from a free text search term.
+
+    Every word becomes a quoted prefix query and the words are combined with
+    OR, so the index acts as a broad prefilter and the fuzzy ranking decides
+    about the final order.
+
+    Args:
+        search_term (str): The search term.
+
+    Returns:
+        str | None: The MATCH expression or None if there are no words.
+    """
+    tokens = dict.fromkeys(re.findall(r"\w+", search_term.lower()))
+
+    if len(tokens) == 0:
+        return None
+
+    return " OR ".join(f'"{token}"*' for token in tokens)
 
 
 def rank_quote(
@@ -0,0 +1,175 @@
+"""
+Utilities for looking up and storing Discord users in the database.
+
+The process-wide `user_directory` remembers recently seen users, so the
+database is only written when a user is new or changed their name. Renamed
+users are also renamed in the quote corpus.
+"""
+
+import asyncio
+import weakref
+from typing import Iterable
+
+import discord
+from cachetools import LRUCache
+from tortoise import BaseDBAsyncClient
+
+from models.database.userData import User
+from models.quotes.quoteModels import MessageAuthor
+from utils.constants import Constants
+from utils.quoteSearchUtils import quote_corpus
+
+DiscordUser = discord.User | discord.Member | MessageAuthor
+
+
+class UserDirectory:
+    """
+    A bounded LRU cache in front of the `User` table.
+
+    Lookups of known users with unchanged names do not touch the database.
+    First-time inserts of the same user are serialised with a lock per user
+    id, so concurrent events cannot race into an IntegrityError.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._cache: LRUCache[int, User] = LRUCache(maxsize=maxsize)
+        self._locks: weakref.WeakValueDictionary[int, asyncio.Lock]
+        self._locks = weakref.WeakValueDictionary()
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    async def get_user(self, member: DiscordUser) -> User:
+        """
+        Return the stored user for a Discord user, creating it if needed.
+
+        If the cached or stored names differ from the current ones, the user
+        is updated.
+
+        Args:
+            member (DiscordUser): The Discord user.
+
+        Returns:
+            User: The stored user.
+        """
+        user_id = int(member.id)
+
+        user = self._cache.get(user_id)
+        if user is not None and _has_names(user, member):
+            self.hits += 1
+            return user
+
+        self.misses += 1
+
+        async with self._lock_for(user_id):
+            user = self._cache.get(user_id)
+
+            if user is None:
+                user, created = await User.get_or_create(
+                    id=user_id,
+                    defaults={
+                        "global_name": member.name,
+                        "display_name": member.display_name
+                    }
+                )
+                if created:
+                    self.writes += 1
+
+            if not _has_names(user, member):
+                user.global_name = member.name
+                user.display_name = member.display_name
+                await user.save(update_fields=["global_name", "display_name"])
+                self.writes += 1
+                quote_corpus.rename_user(user_id, member.display_name)
+
+            self._cache[user_id] = user
+
+        return user
+
+    async def upsert_users(
+        self,
+        members: Iterable[DiscordUser],
+        connection: BaseDBAsyncClient
+    ) -> None:
+        """
+        Make sure all given Discord users are stored with their current names.
+
+        Cached users with unchanged names are skipped, all others are
+        upserted with a single statement on the given connection, which may
+        be a running transaction.
+
+        Args:
+            members (Iterable[DiscordUser]): The users, duplicates are only
+                written once.
+            connection (BaseDBAsyncClient): The connection / transaction to
+                use.
+        """
+        pending: dict[int, DiscordUser] = {}
+
+        for member in members:
+            user = self._cache.get(int(member.id))
+            if user is not None and _has_names(user, member):
+                self.hits += 1
+            else:
+                self.misses += 1
+                pending[int(member.id)] = member
+
+        if len(pending) == 0:
+            return
+
+        await User.bulk_create(
+            [
+                User(
+                    id=user_id,
+                    global_name=member.name,
+                    display_name=member.display_name
+                ) for user_id,
+                member in pending.items()
+            ],
+            on_conflict=["id"],
+            update_fields=["global_name",
+                           "display_name"],
+            using_db=connection
+        )
+        self.writes += len(pending)
+
+        # Uncached users are loaded on their next lookup, cached ones only
+        # need their new names. Whether an uncached user was renamed is
+        # unknown, their quotes are updated anyway.
+        for user_id, member in pending.items():
+            quote_corpus.rename_user(user_id, member.display_name)
+            user = self._cache.get(user_id)
+            if user is not None:
+                user.global_name = member.name
+                user.display_name = member.display_name
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        """
+        Forget the given users, e.g. after a failed transaction.
+
+        Args:
+            user_ids (Iterable[int]): The ids of the users to forget.
+        """
+        for user_id in user_ids:
+            self._cache.pop(user_id, None)
+
+    def _lock_for(self, user_id: int) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+
+def _has_names(user: User, member: DiscordUser) -> bool:
+    return (
+        user.global_name == member.name
+        and user.display_name == member.display_name
+    )
+
+
+user_directory = UserDirectory(Constants.USERS.DIRECTORY_CACHE_SIZE)
@@ -2,11 +2,60 @@
 Unit tests for cogs/aiService.py
 """
 
+import asyncio
+from types import SimpleNamespace
+from typing import Iterator
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 
+@pytest.fixture
+def translate_env(
+    mock_bot: MagicMock,
+    mock_logger: MagicMock
+) -> Iterator[SimpleNamespace]:
+    """
+    Fixture that provides an AIService for the translate command, with
+    mocked AI client, user directory, translation cache and quota ledger,
+    and a mocked context. Nothing is cached and no quota is reserved.
+    """
+    from cogs.aiService import AIService
+
+    with patch("cogs.aiService.ai.AIUtils"), \
+         patch.object(AIService, "purge_ai_usage"), \
+         patch("cogs.aiService.user_directory") as mock_directory, \
+         patch("cogs.aiService.translation_cache") as mock_cache, \
+         patch("cogs.aiService.quota_ledger") as mock_ledger:
+        mock_directory.get_user = AsyncMock(return_value=MagicMock())
+        mock_cache.get = AsyncMock(return_value=None)
+        mock_cache.put = AsyncMock()
+        mock_ledger.remaining = AsyncMock(return_value=MagicMock())
+        mock_ledger.reserve = AsyncMock()
+        mock_ledger.refund = AsyncMock()
+        mock_ledger.commit = AsyncMock()
+
+        ctx = MagicMock()
+        ctx.defer = AsyncMock()
+        ctx.respond = AsyncMock()
+
+        yield SimpleNamespace(
+            service=AIService(mock_bot,
+                              mock_logger),
+            ctx=ctx,
+            cache=mock_cache,
+            ledger=mock_ledger,
+        )
+
+
+def _reservation(tokens: int) -> MagicMock:
+    from utils.ai.quotaLedger import QuotaRemaining
+
+    reservation = MagicMock()
+    reservation.remaining = QuotaRemaining(requests=3, tokens=tokens)
+    return reservation
+
+
 class TestAIService:
     """Tests for AIService Cog"""
 
@@ -26,41 +75,149 @@ class TestAIService:
             assert hasattr(service, "ai")
 
     @pytest.mark.asyncio
-    async def test_reset_ai_usage_resets_all_users(
+    async def test_purge_ai_usage_deletes_old_days(
         self,
         mock_bot: MagicMock,
         mock_logger: MagicMock
     ):
-        """Test that reset_ai_usage task resets usage for all users."""
+        """Test that purge_ai_usage deletes days past the retention."""
+        from datetime import date
+
         from cogs.aiService import AIService
+        from utils.constants import Constants
 
         with patch("cogs.aiService.ai.AIUtils"), \
-             patch("cogs.aiService.User") as mock_user_class:
-
-            # Setup mock users
-            mock_user1 = AsyncMock()
-            mock_user1.fetch_related = AsyncMock()
-            mock_user1.ai_metadata = AsyncMock()
-            mock_user1.ai_metadata.reset_usage = AsyncMock()
-
-            mock_user2 = AsyncMock()
-            mock_user2.fetch_related = AsyncMock()
-            mock_user2.ai_metadata = AsyncMock()
-            mock_user2.ai_metadata.reset_usage = AsyncMock()
-
-            mock_user_class.all = AsyncMock(
-                return_value=[mock_user1,
-                              mock_user2]
-            )
+             patch("cogs.aiService.AIUsage") as mock_usage:
+            mock_usage.today.return_value = date(2026, 10, 31)
+            mock_usage.purge = AsyncMock(return_value=12)
 
             service = AIService(mock_bot, mock_logger)
 
-            # Execute reset task
-            await service.reset_ai_usage()
+            # Execute purge task
+            await service.purge_ai_usage()
 
-            # Verify all users were reset
-            mock_user1.ai_metadata.reset_usage.assert_called_once()
-            mock_user2.ai_metadata.reset_usage.assert_called_once()
+            before, batch_size = mock_usage.purge.await_args.args
+            assert (date(2026, 10, 31) - before).days == \
+                Constants.AI.USAGE_RETENTION_DAYS
+            assert batch_size == Constants.AI.USAGE_PURGE_BATCH_SIZE
 
             # Verify logging
             assert mock_logger.info.called
+
+    @pytest.mark.asyncio
+    async def test_translate_cache_hit_skips_openai_and_usage(
+        self,
+        translate_env: SimpleNamespace
+    ):
+        """Test that a cached translation is free."""
+        service, ctx = translate_env.service, translate_env.ctx
+
+        cached = MagicMock()
+        cached.create_embed = AsyncMock(return_value=MagicMock())
+        translate_env.cache.get = AsyncMock(return_value=cached)
+
+        await service.translate.callback(service, ctx, "Bavarian", "x")
+
+        ctx.respond.assert_awaited_once_with(
+            embed=cached.create_embed.return_value,
+            files=[]
+        )
+        translate_env.ledger.reserve.assert_not_called()
+        service.ai.code_translate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_translate_replaces_streamed_preview_with_embed(
+        self,
+        translate_env: SimpleNamespace
+    ):
+        """Test that partial code is shown and replaced by the result."""
+        service, ctx = translate_env.service, translate_env.ctx
+        reservation = _reservation(tokens=10000)
+        translate_env.ledger.reserve = AsyncMock(return_value=reservation)
+
+        response = MagicMock()
+        response.create_embed = AsyncMock(return_value=MagicMock())
+
+        preview_started = asyncio.Event()
+
+        async def edit(**kwargs):
+            if "embed" not in kwargs:
+                # a rate limited edit that never finishes
+                preview_started.set()
+                await asyncio.Event().wait()
+
+        async def code_translate(language, code, on_partial):
+            on_partial(["druck("])
+            await preview_started.wait()
+            # the stream goes on while the edit is stuck
+            on_partial(["druck('Servus')"])
+            return response
+
+        ctx.edit = AsyncMock(side_effect=edit)
+        service.ai.code_translate = code_translate
+        await service.translate.callback(service, ctx, "Bavarian", "x")
+
+        assert ctx.edit.await_count == 2
+        assert "druck(" in ctx.edit.await_args_list[0].kwargs["content"]
+        ctx.edit.assert_awaited_with(
+            content=None,
+            embed=response.create_embed.return_value,
+            files=[]
+        )
+        ctx.respond.assert_not_called()
+        translate_env.ledger.commit.assert_awaited_once_with(
+            reservation,
+            response.tokens_used
+        )
+
+    @pytest.mark.asyncio
+    async def test_translate_refunds_quota_on_error(
+        self,
+        translate_env: SimpleNamespace
+    ):
+        """Test that a failed translation gives the reserved request back."""
+        service, ctx = translate_env.service, translate_env.ctx
+        reservation = _reservation(tokens=10000)
+        translate_env.ledger.reserve = AsyncMock(return_value=reservation)
+
+        service.ai.code_translate = AsyncMock(side_effect=TimeoutError())
+        await service.translate.callback(service, ctx, "Bavarian", "x")
+
+        translate_env.ledger.refund.assert_awaited_once_with(reservation)
+        translate_env.ledger.commit.assert_not_called()
+        assert ctx.respond.await_args.kwargs["ephemeral"] is True
+
+    @pytest.mark.asyncio
+    async def test_translate_rejects_too_large_code(
+        self,
+        translate_env: SimpleNamespace
+    ):
+        """Test that oversized code is rejected before reserving quota."""
+        from utils.constants import Constants
+
+        service, ctx = translate_env.service, translate_env.ctx
+
+        code = "x" * (
+            (Constants.AI.MAX_CODE_TOKENS + 1) * Constants.AI.CHARS_PER_TOKEN
+        )
+        await service.translate.callback(service, ctx, "Bavarian", code)
+
+        assert "zu lang" in ctx.respond.await_args.args[0]
+        translate_env.ledger.reserve.assert_not_called()
+        service.ai.code_translate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_translate_refunds_when_the_token_budget_is_short(
+        self,
+        translate_env: SimpleNamespace
+    ):
+        """Test that a request over the token budget is never sent."""
+        service, ctx = translate_env.service, translate_env.ctx
+        reservation = _reservation(tokens=10)
+        translate_env.ledger.reserve = AsyncMock(return_value=reservation)
+
+        await service.translate.callback(service, ctx, "Bavarian", "x")
+
+        translate_env.ledger.refund.assert_awaited_once_with(reservation)
+        assert "Token-Budget" in ctx.respond.await_args.args[0]
+        service.ai.code_translate.assert_not_called()
@@ -77,22 +77,21 @@ class TestMemeService:
         from cogs.memeService import MemeService
         from utils.constants import Constants
 
-        with patch("cogs.memeService.User") as mock_user_class, \
-             patch("cogs.memeService.memeUtils") as mock_meme_utils:
+        with patch("cogs.memeService.user_directory") as mock_directory:
 
             service = MemeService(mock_bot, mock_logger)
+            service.ingest = MagicMock()
+            service.ingest.enqueue = AsyncMock()
 
             # Create mock user
             mock_user = AsyncMock()
-            mock_user_class.get_or_create = AsyncMock(
-                return_value=(mock_user,
-                              False)
-            )
+            mock_directory.get_user = AsyncMock(return_value=mock_user)
 
             # Create mock message with image attachment
             mock_attachment = MagicMock()
             mock_attachment.content_type = "image/png"
             mock_attachment.filename = "test.png"
+            mock_attachment.read = AsyncMock(return_value=b"image")
 
             mock_message = MagicMock()
             mock_message.author.bot = False
@@ -100,13 +99,120 @@ class TestMemeService:
             mock_message.attachments = [mock_attachment]
             mock_message.content = "Test meme"
 
-            mock_meme_utils.save_meme_image = AsyncMock()
-
             # Execute listener
             await service.save_memes(mock_message)
 
-            # Verify meme was saved
-            mock_meme_utils.save_meme_image.assert_called_once()
+            # Verify meme was queued for processing
+            service.ingest.enqueue.assert_called_once()
+            job = service.ingest.enqueue.call_args.args[0]
+            assert job.image_data == b"image"
+            assert job.author == mock_user
+            assert job.message == "Test meme"
+            assert job.filename == "test.png"
+
+    @pytest.mark.asyncio
+    async def test_set_random_meme_banner_prerenders_next_banner(
+        self,
+        mock_bot: MagicMock,
+        mock_logger: MagicMock
+    ):
+        """Test that every tick uses the banner rendered one tick ahead."""
+        from cogs.memeService import MemeService
+
+        with patch("cogs.memeService.memeUtils") as mock_meme_utils:
+            mock_meme_utils.get_random_meme_banner = AsyncMock(
+                side_effect=[b"first",
+                             b"second"]
+            )
+            mock_bot.user.edit = AsyncMock()
+
+            service = MemeService(mock_bot, mock_logger)
+
+            await service.set_random_meme_banner.coro(service)
+            mock_bot.user.edit.assert_awaited_once_with(banner=b"first")
+
+            # the next banner is already being rendered
+            assert service._next_banner is not None
+            await service._next_banner
+            assert mock_meme_utils.get_random_meme_banner.await_count == 2
+
+            await service.set_random_meme_banner.coro(service)
+            mock_bot.user.edit.assert_awaited_with(banner=b"second")
+
+            service.cog_unload()
+
+    @pytest.mark.asyncio
+    async def test_meme_sends_file_without_reading_it(
+        self,
+        mock_bot: MagicMock,
+        mock_logger: MagicMock
+    ):
+        """Test that /meme uploads a small original from its path."""
+        from cogs.memeService import MemeService
+        from utils.memeUtils.memeVariantUtils import MemeVariant
+
+        meme = MagicMock()
+        embed, meme_file = MagicMock(), MagicMock()
+        meme.create_embed = AsyncMock(return_value=(embed, meme_file))
+
+        with patch("cogs.memeService.memeUtils") as mock_meme_utils, \
+             patch("cogs.memeService.meme_storage") as mock_storage, \
+             patch("cogs.memeService.meme_variants") as mock_variants:
+            mock_meme_utils.get_random_meme = AsyncMock(return_value=meme)
+            mock_variants.select_variant = AsyncMock(
+                return_value=MemeVariant("raw/a.png",
+                                         1000,
+                                         True)
+            )
+            ctx = MagicMock()
+            ctx.defer = AsyncMock()
+            ctx.respond = AsyncMock()
+
+            service = MemeService(mock_bot, mock_logger)
+            await service.meme.callback(service, ctx, None)
+
+            meme.create_embed.assert_awaited_once_with(None, "raw/a.png")
+            ctx.respond.assert_awaited_once_with(embed=embed, file=meme_file)
+            assert not mock_storage.read_raw.called
+            assert not mock_storage.read_banner.called
+
+    @pytest.mark.asyncio
+    async def test_meme_sends_preview_with_original_button(
+        self,
+        mock_bot: MagicMock,
+        mock_logger: MagicMock
+    ):
+        """Test that a large meme is sent as preview with a button."""
+        from cogs.memeService import MemeService
+        from utils.memeUtils.memeVariantUtils import MemeVariant
+
+        meme = MagicMock()
+        embed, meme_file = MagicMock(), MagicMock()
+        meme.create_embed = AsyncMock(return_value=(embed, meme_file))
+
+        with patch("cogs.memeService.memeUtils") as mock_meme_utils, \
+             patch("cogs.memeService.meme_variants") as mock_variants, \
+             patch("cogs.memeService.MemeView") as mock_view:
+            mock_meme_utils.search_memes = AsyncMock(return_value=[meme])
+            mock_variants.select_variant = AsyncMock(
+                return_value=MemeVariant("preview/a.webp",
+                                         1000,
+                                         False)
+            )
+            ctx = MagicMock()
+            ctx.defer = AsyncMock()
+            ctx.respond = AsyncMock()
+
+            service = MemeService(mock_bot, mock_logger)
+            await service.meme.callback(service, ctx, "Trick")
 
-            # Verify logging occurred
-            assert mock_logger.info.called
+            meme.create_embed.assert_awaited_once_with(
+                "Trick",
+                "preview/a.webp"
+            )
+            mock_view.assert_called_once_with(meme)
+            ctx.respond.assert_awaited_once_with(
+                embed=embed,
+                file=meme_file,
+                view=mock_view.return_value
+            )
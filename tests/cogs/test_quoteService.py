@@ -2,7 +2,10 @@
 Unit tests for cogs/quoteService.py
 """
 
-from unittest.mock import MagicMock
+from typing import Any, Callable
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
 
 
 class TestQuoteService:
@@ -25,7 +28,8 @@ class TestQuoteService:
     def test_quote_cache_stores_messages(
         self,
         mock_bot: MagicMock,
-        mock_logger: MagicMock
+        mock_logger: MagicMock,
+        make_collected_message: Callable[..., Any]
     ):
         """Test that quote_cache can store and retrieve messages."""
         from cogs.quoteService import QuoteService
@@ -34,17 +38,19 @@ class TestQuoteService:
 
         # Add messages to cache
         user_id = 12345
-        mock_messages = [MagicMock(), MagicMock()]
-        service.quote_cache[user_id] = mock_messages  # type: ignore
+        mock_messages = [make_collected_message(), make_collected_message()]
+        for message in mock_messages:
+            service.quote_cache.add(user_id, message)
 
         # Verify retrieval
         assert user_id in service.quote_cache
-        assert service.quote_cache[user_id] == mock_messages
+        assert service.quote_cache.get(user_id) == mock_messages
 
     def test_quote_cache_can_be_cleared(
         self,
         mock_bot: MagicMock,
-        mock_logger: MagicMock
+        mock_logger: MagicMock,
+        make_collected_message: Callable[..., Any]
     ):
         """Test that quote_cache entries can be removed."""
         from cogs.quoteService import QuoteService
@@ -53,8 +59,30 @@ class TestQuoteService:
 
         # Add and then remove
         user_id = 12345
-        service.quote_cache[user_id] = [MagicMock()]
-        service.quote_cache.pop(user_id, None)
+        service.quote_cache.add(user_id, make_collected_message())
+        service.quote_cache.pop(user_id)
 
         # Verify removal
         assert user_id not in service.quote_cache
+
+    @pytest.mark.asyncio
+    async def test_clear_quotes_removes_collected_messages(
+        self,
+        mock_bot: MagicMock,
+        mock_logger: MagicMock,
+        make_collected_message: Callable[..., Any]
+    ):
+        """Test that /clear_quotes empties the buffer of the user."""
+        from cogs.quoteService import QuoteService
+
+        service = QuoteService(mock_bot, mock_logger)
+        service.quote_cache.add(42, make_collected_message())
+
+        ctx = MagicMock()
+        ctx.author.id = 42
+        ctx.respond = AsyncMock()
+
+        await service.clear_quotes.callback(service, ctx)
+
+        assert 42 not in service.quote_cache
+        ctx.respond.assert_awaited_once()
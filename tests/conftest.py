@@ -3,11 +3,58 @@ Shared pytest fixtures and configuration for cs24-1-bot tests.
 """
 
 import os
-from typing import Any
+from typing import Any, AsyncIterator, Callable
 from unittest.mock import AsyncMock, MagicMock
 
 import discord
 import pytest
+import pytest_asyncio
+
+
+class FakeQuerySet:
+    """
+    A minimal stand-in for a Tortoise queryset over a list of rows.
+
+    Supports the keyset pagination of the background jobs (`filter` with
+    `__gt` and `__isnull`, `order_by`, `limit`) and `values_list`.
+    """
+
+    def __init__(self, rows: list[Any]) -> None:
+        self.rows = rows
+
+    def filter(self, **conditions: Any) -> "FakeQuerySet":
+        rows = self.rows
+        for key, value in conditions.items():
+            field, _, lookup = key.partition("__")
+            if lookup == "gt":
+                rows = [row for row in rows if getattr(row, field) > value]
+            elif lookup == "isnull":
+                rows = [
+                    row for row in rows
+                    if (getattr(row, field) is None) == value
+                ]
+            else:
+                rows = [row for row in rows if getattr(row, field) == value]
+        return FakeQuerySet(rows)
+
+    def order_by(self, field: str) -> "FakeQuerySet":
+        return FakeQuerySet(
+            sorted(self.rows,
+                   key=lambda row: getattr(row,
+                                           field))
+        )
+
+    async def limit(self, num: int) -> list[Any]:
+        return self.rows[:num]
+
+    async def count(self) -> int:
+        return len(self.rows)
+
+    async def values_list(self, *fields: str) -> list[tuple[Any, ...]]:
+        return [
+            tuple(getattr(row,
+                          field) for field in fields) for row in self.rows
+        ]
 
 
 def pytest_configure(config: Any) -> None:
@@ -61,3 +108,77 @@ def mock_context():
     ctx.author.id = 987654321
     ctx.author.name = "TestUser"
     return ctx
+
+
+@pytest.fixture
+def make_collected_message() -> Callable[..., Any]:
+    """
+    Fixture that provides a factory for messages collected for a quote.
+    """
+    from datetime import datetime, timezone
+
+    from models.quotes.quoteModels import (
+        CollectedMessage,
+        MessageAuthor,
+        PartialMessage,
+    )
+
+    def make(content: str = "Test") -> CollectedMessage:
+        return CollectedMessage(
+            message=PartialMessage(
+                content=content,
+                jump_url="https://discord.com/channels/123/456/789",
+                author_name="TestUser"
+            ),
+            author=MessageAuthor(
+                id=1,
+                name="testuser",
+                display_name="TestUser"
+            ),
+            created_at=datetime.now(timezone.utc),
+        )
+
+    return make
+
+
+@pytest.fixture
+def make_meme_model() -> Callable[[list[Any]], MagicMock]:
+    """
+    Fixture that provides a factory for a mocked Meme model whose querysets
+    run on the given rows, see FakeQuerySet.
+    """
+
+    def make(memes: list[Any]) -> MagicMock:
+        model = MagicMock()
+        model.all.side_effect = lambda: FakeQuerySet(memes)
+        model.filter.side_effect = (
+            lambda **conditions: FakeQuerySet(memes).filter(**conditions)
+        )
+        model.bulk_update = AsyncMock()
+        return model
+
+    return make
+
+
+@pytest_asyncio.fixture
+async def in_memory_db() -> AsyncIterator[None]:
+    """
+    Fixture that provides an empty in-memory SQLite database with the tables
+    of all models, for tests of raw SQL that mocks cannot check.
+    """
+    from tortoise import Tortoise
+
+    await Tortoise.init(
+        db_url="sqlite://:memory:",
+        modules={
+            "models": [
+                "models.database.userData",
+                "models.database.memeData",
+                "models.database.aiData",
+                "models.database.quoteData",
+            ]
+        }
+    )
+    await Tortoise.generate_schemas()
+    yield
+    await Tortoise.close_connections()
@@ -0,0 +1,44 @@
+"""
+Unit tests for models/ai/response.py
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from models.ai.response import EMBED_DESCRIPTION_LIMIT, CodeTranslateResponse
+
+
+def _response(lines: list[str]) -> CodeTranslateResponse:
+    return CodeTranslateResponse(
+        detected_language="Python",
+        translated_language="Bavarian",
+        translated_code=lines,
+        humorous_comment="Prost!",
+        tokens_used=42
+    )
+
+
+class TestCodeTranslateResponse:
+    """Tests for the CodeTranslateResponse dataclass"""
+
+    @pytest.mark.asyncio
+    async def test_embed_contains_the_code(self):
+        """Test that short code is shown completely."""
+        response = _response(["druck('Servus')", "druck('Pfiat di')"])
+
+        embed = await response.create_embed(MagicMock(), 3)
+
+        assert response.fits_embed
+        assert "druck('Servus')\ndruck('Pfiat di')" in str(embed.description)
+
+    @pytest.mark.asyncio
+    async def test_long_code_is_cut_off(self):
+        """Test that code longer than an embed is cut to the limit."""
+        response = _response(["x = 1"] * 1000)
+
+        embed = await response.create_embed(MagicMock(), 3)
+
+        assert not response.fits_embed
+        assert len(str(embed.description)) <= EMBED_DESCRIPTION_LIMIT
+        assert "…" in str(embed.description)
@@ -2,10 +2,15 @@
 Unit tests for models/quotes/quoteModels.py
 """
 
+from datetime import datetime, timezone
 from unittest.mock import MagicMock
 
 from discord import Message
-from models.quotes.quoteModels import PartialMessage
+from models.quotes.quoteModels import (
+    CollectedMessage,
+    MessageAuthor,
+    PartialMessage,
+)
 
 
 class TestPartialMessage:
@@ -95,3 +100,44 @@ class TestPartialMessage:
 
         assert partial.content == "Test 🎉 emoji and **markdown** text"
         assert partial.author_name == "User🎮"
+
+
+class TestCollectedMessage:
+    """Tests for CollectedMessage dataclass and its methods"""
+
+    def test_from_discord_message_keeps_only_needed_data(self):
+        """Test conversion from discord.Message into a compact entry."""
+        mock_message = MagicMock(spec=Message)
+        mock_message.content = "Test message content"
+        mock_message.jump_url = "https://discord.com/channels/123/456/789"
+        mock_message.author = MagicMock()
+        mock_message.author.id = 42
+        mock_message.author.name = "testuser"
+        mock_message.author.display_name = "TestUser"
+        mock_message.created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+        collected = CollectedMessage.from_discord_message(mock_message)
+
+        assert collected.message.content == "Test message content"
+        assert collected.message.author_name == "TestUser"
+        assert collected.author == MessageAuthor(
+            id=42,
+            name="testuser",
+            display_name="TestUser"
+        )
+        assert collected.created_at == mock_message.created_at
+        assert not hasattr(collected, "__dict__")
+
+    def test_size_grows_with_content(self):
+        """Test that the size estimate includes the message content."""
+        created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        author = MessageAuthor(id=1, name="a", display_name="A")
+
+        short = CollectedMessage(
+            PartialMessage("a", None, "A"), author, created_at
+        )
+        long = CollectedMessage(
+            PartialMessage("a" * 1000, None, "A"), author, created_at
+        )
+
+        assert long.size() - short.size() >= 999
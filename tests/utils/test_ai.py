@@ -0,0 +1,327 @@
+"""
+Unit tests for utils/ai/ai.py
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+
+def _completion(tokens: int = 42) -> SimpleNamespace:
+    content = json.dumps(
+        {
+            "detected_language": "Python",
+            "translated_language": "Bavarian",
+            "translated_code": ["druck('Servus')"],
+            "humorous_comment": "Prost!",
+        }
+    )
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(total_tokens=tokens)
+    )
+
+
+def _stream(content: str, tokens: int = 42, size: int = 7):
+    async def chunks():
+        for start in range(0, len(content), size):
+            delta = SimpleNamespace(content=content[start:start + size])
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=delta)],
+                usage=None
+            )
+        # the usage arrives in a last chunk without choices
+        yield SimpleNamespace(
+            choices=[],
+            usage=SimpleNamespace(total_tokens=tokens)
+        )
+
+    return chunks()
+
+
+class TestExtractPartialCode:
+    """Tests for extract_partial_code function"""
+
+    def test_every_prefix_is_readable(self):
+        """Test that every prefix of a completion yields partial code."""
+        from utils.ai.ai import extract_partial_code
+
+        code = ["druck('Servus \\ \"Welt\"')", "zeig(\u00e4)", ""]
+        content = json.dumps(
+            {
+                "detected_language": "Python",
+                "translated_code": code,
+            }
+        )
+
+        assert extract_partial_code(content[:20]) is None
+        for end in range(len(content) + 1):
+            lines = extract_partial_code(content[:end])
+            if lines is None:
+                continue
+            assert len(lines) <= len(code)
+            for index, line in enumerate(lines):
+                assert code[index].startswith(line)
+        assert extract_partial_code(content) == code
+
+
+class TestAIUtils:
+    """Tests for AIUtils class"""
+
+    @pytest.mark.asyncio
+    async def test_code_translate_parses_response(self):
+        """Test that a completion is awaited and parsed."""
+        from utils.ai.ai import AIUtils
+
+        utils = AIUtils()
+        utils.client.chat.completions.create = AsyncMock(  # type: ignore
+            return_value=_completion()
+        )
+
+        response = await utils.code_translate("Bavarian", "print('hi')")
+
+        assert response.translated_code == ["druck('Servus')"]
+        assert response.tokens_used == 42
+
+        stats = utils.stats()
+        assert stats.completed == 1
+        assert stats.failed == 0
+        assert stats.last_completion_ms is not None
+        await utils.close()
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrent_completions(self):
+        """Test that only max_in_flight completions run at once."""
+        from utils.ai.ai import AIUtils
+
+        utils = AIUtils()
+        utils.max_in_flight = 2
+        utils._slots = asyncio.Semaphore(2)
+
+        running = 0
+        peak = 0
+
+        async def create(**kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            return _completion()
+
+        utils.client.chat.completions.create = create  # type: ignore
+
+        await asyncio.gather(
+            *(utils.code_translate("Bavarian",
+                                   f"x = {i}") for i in range(5))
+        )
+
+        stats = utils.stats()
+        assert peak == 2
+        assert stats.completed == 5
+        assert stats.waiting == 0
+        assert stats.in_flight == 0
+        # the later requests had to wait for a slot
+        assert stats.avg_queue_wait_ms is not None
+        assert stats.avg_queue_wait_ms > 0
+        await utils.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_completion_releases_slot(self):
+        """Test that a failing request is counted and frees its slot."""
+        from utils.ai.ai import AIUtils
+
+        utils = AIUtils()
+        # every model tier fails
+        tiers = len(utils.router.route(1))
+        utils.client.chat.completions.create = AsyncMock(  # type: ignore
+            side_effect=[TimeoutError()] * tiers + [_completion()]
+        )
+
+        with pytest.raises(TimeoutError):
+            await utils.code_translate("Bavarian", "x")
+        await utils.code_translate("Bavarian", "x")
+
+        stats = utils.stats()
+        assert stats.failed == 1
+        assert stats.completed == 1
+        assert stats.in_flight == 0
+        await utils.close()
+
+    @pytest.mark.asyncio
+    async def test_streamed_translation_reports_partial_code(self):
+        """Test that streamed lines are passed on and the result parsed."""
+        from utils.ai.ai import AIUtils
+
+        content = _completion().choices[0].message.content
+        utils = AIUtils()
+        create = AsyncMock(return_value=_stream(content))
+        utils.client.chat.completions.create = create  # type: ignore
+
+        partials: list[list[str]] = []
+
+        def on_partial(lines: list[str]):
+            partials.append(list(lines))
+
+        response = await utils.code_translate("Bavarian", "x", on_partial)
+
+        assert create.await_args.kwargs["stream"] is True
+        assert response.translated_code == ["druck('Servus')"]
+        assert response.tokens_used == 42
+        assert len(partials) > 1
+        assert partials[-1] == ["druck('Servus')"]
+        assert all(
+            "druck('Servus')".startswith(lines[0]) for lines in partials
+        )
+
+        stats = utils.stats()
+        assert stats.completed == 1
+        assert stats.last_first_content_ms is not None
+        assert stats.avg_first_content_ms is not None
+        await utils.close()
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_share_one_completion(self):
+        """Test that concurrent identical requests are coalesced."""
+        from utils.ai.ai import AIUtils
+
+        utils = AIUtils()
+        calls = 0
+
+        async def create(**kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return _completion()
+
+        utils.client.chat.completions.create = create  # type: ignore
+
+        responses = await asyncio.gather(
+            utils.code_translate("Bavarian",
+                                 "print( 'hi' )"),
+            utils.code_translate(" bavarian",
+                                 "print(\n'hi' )"),
+            utils.code_translate("Bavarian",
+                                 "print('hi')"),
+        )
+
+        assert calls == 2
+        assert utils.stats().coalesced == 1
+        # every caller gets its own copy
+        assert responses[0] is not responses[1]
+        assert responses[0].translated_code is not responses[1].translated_code
+
+        # a finished completion is not shared with later requests
+        await utils.code_translate("Bavarian", "print( 'hi' )")
+        assert calls == 3
+        await utils.close()
+
+    @pytest.mark.asyncio
+    async def test_coalesced_requests_share_failures(self):
+        """Test that a failed shared completion fails every caller."""
+        from utils.ai.ai import AIUtils
+
+        utils = AIUtils()
+
+        async def create(**kwargs):
+            await asyncio.sleep(0.01)
+            raise TimeoutError()
+
+        utils.client.chat.completions.create = create  # type: ignore
+
+        results = await asyncio.gather(
+            utils.code_translate("Bavarian",
+                                 "x"),
+            utils.code_translate("Bavarian",
+                                 "x"),
+            return_exceptions=True
+        )
+
+        assert all(isinstance(result, TimeoutError) for result in results)
+        stats = utils.stats()
+        assert stats.failed == 1
+        assert stats.coalesced == 1
+        await utils.close()
+
+    @pytest.mark.asyncio
+    async def test_large_code_is_translated_in_chunks(self):
+        """Test that chunks are translated concurrently and kept in order."""
+        from utils.ai.ai import AIUtils
+        from utils.constants import Constants
+
+        functions = [
+            f"def f{index}():\n    return '{'x' * 40}'\n\n"
+            for index in range(6)
+        ]
+        utils = AIUtils()
+
+        async def create(**kwargs):
+            code = kwargs["messages"][1]["content"]
+            names = [
+                f"f{index}" for index in range(6) if f"def f{index}(" in code
+            ]
+            # later chunks finish first
+            await asyncio.sleep(0.01 * (6 - int(names[0][1:])))
+            content = json.dumps(
+                {
+                    "detected_language": "Python",
+                    "translated_language": "Bavarian",
+                    "translated_code": names,
+                    "humorous_comment": "Prost!",
+                }
+            )
+            return SimpleNamespace(
+                choices=[
+                    SimpleNamespace(message=SimpleNamespace(content=content))
+                ],
+                usage=SimpleNamespace(total_tokens=10)
+            )
+
+        utils.client.chat.completions.create = create  # type: ignore
+
+        with patch.object(Constants.AI, "CHUNK_MAX_TOKENS", 40):
+            response = await utils.code_translate(
+                "Bavarian",
+                "".join(functions)
+            )
+
+        assert response.translated_code == [f"f{index}" for index in range(6)]
+        assert response.tokens_used == 10 * utils.stats().completed
+        assert utils.stats().completed > 1
+        await utils.close()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_the_next_model_tier(self):
+        """Test that a failing model is replaced by the next larger tier."""
+        from utils.ai.ai import AIUtils
+
+        utils = AIUtils()
+        models: list[str] = []
+        budgets: list[int] = []
+
+        async def create(**kwargs):
+            models.append(kwargs["model"])
+            budgets.append(kwargs["max_completion_tokens"])
+            if len(models) == 1:
+                raise TimeoutError()
+            return _completion()
+
+        utils.client.chat.completions.create = create  # type: ignore
+
+        response = await utils.code_translate("Bavarian", "print('hi')")
+
+        assert response.translated_code == ["druck('Servus')"]
+        assert models == [tier.model for tier in utils.router.tiers[:2]]
+        assert budgets == [
+            tier.max_completion_tokens for tier in utils.router.tiers[:2]
+        ]
+
+        stats = utils.model_stats()
+        assert stats[0].failures == 1
+        assert stats[1].fallbacks == 1
+        assert stats[1].tokens == 42
+        assert utils.stats().completed == 1
+        await utils.close()
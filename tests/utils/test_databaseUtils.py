@@ -0,0 +1,61 @@
+"""
+Unit tests for utils/databaseUtils.py
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+
+def _mock_model(count: int, rows: list[object | None]) -> MagicMock:
+    model = MagicMock()
+    model._meta.pk_attr = "id"
+
+    query = MagicMock()
+    query.count = AsyncMock(return_value=count)
+    query.order_by.return_value.offset.return_value.first = AsyncMock(
+        side_effect=rows
+    )
+    model.all.return_value = query
+    return model
+
+
+class TestGetRandomInstance:
+    """Tests for get_random_instance function"""
+
+    @pytest.mark.asyncio
+    async def test_returns_none_for_empty_table(self):
+        """Test that an empty table yields None without an offset query."""
+        from utils.databaseUtils import get_random_instance
+
+        model = _mock_model(0, [])
+
+        assert await get_random_instance(model) is None
+        model.all.return_value.order_by.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fetches_row_at_random_offset(self):
+        """Test that the row at the drawn offset is fetched by primary key."""
+        from utils.databaseUtils import get_random_instance
+
+        row = MagicMock()
+        model = _mock_model(10, [row])
+
+        with patch("utils.databaseUtils.random.randrange", return_value=7):
+            result = await get_random_instance(model)
+
+        assert result is row
+        query = model.all.return_value
+        query.order_by.assert_called_once_with("id")
+        query.order_by.return_value.offset.assert_called_once_with(7)
+
+    @pytest.mark.asyncio
+    async def test_retries_when_row_was_deleted(self):
+        """Test that a draw is repeated if the row vanished meanwhile."""
+        from utils.databaseUtils import get_random_instance
+
+        row = MagicMock()
+        model = _mock_model(3, [None, row])
+
+        assert await get_random_instance(model) is row
+        assert model.all.return_value.count.await_count == 2
@@ -0,0 +1,78 @@
+"""
+Unit tests for utils/memeUtils/memeBannerCacheUtils.py
+"""
+
+import os
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any
+
+
+def _write_meme(raw_folder: Any, name: str) -> Any:
+    from PIL import Image
+
+    from models.database.memeData import MemeFormat
+
+    image = Image.new("RGB", (200, 100), (255, 0, 0))
+    image.save(raw_folder / f"{name}.png")
+    return SimpleNamespace(
+        uuid=name,
+        format=MemeFormat.PNG,
+        file_path=f"{name}.png"
+    )
+
+
+class TestMemeBannerCache:
+    """Tests for MemeBannerCache class"""
+
+    def test_renders_banner_once(self, tmp_path: Any):
+        """Test that a banner is rendered on the first request only."""
+        from PIL import Image
+
+        from utils.memeUtils.memeBannerCacheUtils import MemeBannerCache
+
+        raw_folder = tmp_path / "raw"
+        raw_folder.mkdir()
+        meme = _write_meme(raw_folder, "a")
+
+        cache = MemeBannerCache(
+            str(tmp_path / "banner"),
+            str(raw_folder),
+            max_bytes=10**6
+        )
+
+        first = cache.get_banner(meme)  # type: ignore
+        second = cache.get_banner(meme)  # type: ignore
+
+        assert first == second
+        assert Image.open(BytesIO(first)).size == (960, 339)
+        assert cache.hits == 1
+        assert cache.misses == 1
+        assert os.listdir(tmp_path / "banner") == ["a.png"]
+
+    def test_evicts_least_recently_used_banner(self, tmp_path: Any):
+        """Test that the oldest banners are deleted above the size limit."""
+        from utils.memeUtils.memeBannerCacheUtils import MemeBannerCache
+
+        raw_folder = tmp_path / "raw"
+        raw_folder.mkdir()
+        memes = [_write_meme(raw_folder, name) for name in ("a", "b", "c")]
+
+        cache = MemeBannerCache(
+            str(tmp_path / "banner"),
+            str(raw_folder),
+            max_bytes=10**6
+        )
+        banner_size = len(cache.get_banner(memes[0]))  # type: ignore
+        cache.max_bytes = int(banner_size * 2.5)
+
+        cache.get_banner(memes[1])  # type: ignore
+        # a was used long ago, b just now
+        os.utime(tmp_path / "banner" / "a.png", (1, 1))
+        cache.get_banner(memes[2])  # type: ignore
+
+        stats = cache.stats()
+        assert sorted(os.listdir(tmp_path / "banner")) == ["b.png", "c.png"]
+        assert stats.evictions == 1
+        assert stats.files == 2
+        assert stats.size_bytes <= cache.max_bytes
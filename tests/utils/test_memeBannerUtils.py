@@ -0,0 +1,146 @@
+"""
+Unit tests for utils/memeUtils/memeBannerUtils.py
+"""
+
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageSequence
+
+
+def _moving_box_gif(num_frames: int) -> bytes:
+    frames = []
+    for i in range(num_frames):
+        frame = Image.new("RGB", (200, 200), (30, 30, 30))
+        ImageDraw.Draw(frame).rectangle(
+            [i * 3,
+             i * 3,
+             i * 3 + 40,
+             i * 3 + 40],
+            fill=(i * 4 % 256,
+                  100,
+                  200)
+        )
+        frames.append(frame)
+
+    output = BytesIO()
+    frames[0].save(
+        output,
+        format="GIF",
+        save_all=True,
+        append_images=frames[1:],
+        duration=40,
+        loop=0
+    )
+    return output.getvalue()
+
+
+class TestRenderGifBanner:
+    """Tests for render_gif_banner function"""
+
+    def test_frames_match_bannerized_source(self):
+        """Test that the streamed frames equal the bannerized source."""
+        from PIL import ImageChops
+
+        from utils.memeUtils.memeBannerUtils import (
+            create_banner_from_image,
+            render_gif_banner,
+        )
+
+        data = _moving_box_gif(20)
+        color = (10, 20, 30, 255)
+
+        result = render_gif_banner(data, color, 10**7, 100, 256, 32, True, 1)
+
+        banner = Image.open(BytesIO(result.data))
+        source = Image.open(BytesIO(data))
+        assert banner.size == (960, 339)
+        assert result.frames == banner.n_frames == 20
+        assert result.attempts == 1
+        assert 0 < result.peak_memory_bytes
+
+        for index in (0, 19):
+            banner.seek(index)
+            source.seek(index)
+            expected = create_banner_from_image(
+                source.convert("RGBA"),
+                color,
+                339,
+                960
+            ).convert("RGB")
+            diff = ImageChops.difference(banner.convert("RGB"), expected)
+            assert diff.getbbox() is None
+
+    def test_decimates_frames_and_keeps_duration(self):
+        """Test that the frame budget drops frames but not playback time."""
+        from utils.memeUtils.memeBannerUtils import render_gif_banner
+
+        result = render_gif_banner(
+            _moving_box_gif(30),
+            (0, 0, 0, 255),
+            10**7,
+            10,
+            256,
+            32,
+            True,
+            1
+        )
+
+        banner = Image.open(BytesIO(result.data))
+        durations = [
+            frame.info["duration"] for frame in ImageSequence.Iterator(banner)
+        ]
+        assert result.source_frames == 30
+        assert result.frames == len(durations) == 10
+        assert sum(durations) == 30 * 40
+
+    def test_reduces_colors_then_frames_to_fit_byte_budget(self):
+        """Test that a small byte budget is met by shrinking the banner."""
+        from utils.memeUtils.memeBannerUtils import render_gif_banner
+
+        data = _moving_box_gif(30)
+        full = render_gif_banner(
+            data,
+            (0, 0, 0, 255),
+            10**7,
+            100,
+            256,
+            8,
+            True,
+            1
+        )
+        budget = full.size_bytes // 3
+
+        result = render_gif_banner(
+            data,
+            (0, 0, 0, 255),
+            budget,
+            100,
+            256,
+            8,
+            True,
+            1
+        )
+
+        assert result.size_bytes <= budget
+        assert result.colors < 256
+        assert result.attempts > 1
+        assert Image.open(BytesIO(result.data)).n_frames == result.frames
+
+
+class TestRenderBanner:
+    """Tests for render_banner function"""
+
+    def test_renders_png_banner(self):
+        """Test that still images are rendered as one PNG frame."""
+        from utils.memeUtils.memeBannerUtils import render_banner
+
+        image = BytesIO()
+        Image.new("RGB", (100, 300), (255, 0, 0)).save(image, format="PNG")
+
+        result = render_banner(image.getvalue(), False)
+
+        banner = Image.open(BytesIO(result.data))
+        assert banner.format == "PNG"
+        assert banner.size == (960, 339)
+        assert result.frames == 1
+        assert result.size_bytes == len(result.data)
@@ -0,0 +1,160 @@
+"""
+Unit tests for utils/memeUtils/memeHashUtils.py
+"""
+
+import random
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any, Callable
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image, ImageDraw
+
+
+def _meme_image(seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (400, 300), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for _ in range(8):
+        x, y = rng.randrange(350), rng.randrange(250)
+        draw.rectangle(
+            [x,
+             y,
+             x + rng.randrange(20,
+                               150),
+             y + rng.randrange(20,
+                               150)],
+            fill=(rng.randrange(256),
+                  rng.randrange(256),
+                  rng.randrange(256))
+        )
+    return image
+
+
+def _encode(image: Image.Image, image_format: str, **params) -> bytes:
+    output = BytesIO()
+    image.save(output, format=image_format, **params)
+    return output.getvalue()
+
+
+class TestDhash:
+    """Tests for dhash and hash_image_data functions"""
+
+    def test_reencoded_image_is_close(self):
+        """Test that a resized JPEG repost hashes close to the original."""
+        from utils.memeUtils.memeHashUtils import (
+            hamming_distance,
+            hash_image_data,
+        )
+
+        original = _meme_image(1)
+        repost = original.resize((300, 225)).convert("RGB")
+
+        first = int(hash_image_data(_encode(original, "PNG")), 16)
+        second = int(hash_image_data(_encode(repost, "JPEG", quality=60)), 16)
+        other = int(hash_image_data(_encode(_meme_image(2), "PNG")), 16)
+
+        assert hamming_distance(first, second) <= 6
+        assert hamming_distance(first, other) > 6
+
+    def test_hash_is_hex(self):
+        """Test that the hash fits the phash column."""
+        from utils.memeUtils.memeHashUtils import hash_image_data
+
+        phash = hash_image_data(_encode(_meme_image(3), "GIF"))
+
+        assert len(phash) == 16
+        int(phash, 16)
+
+
+class TestBKTree:
+    """Tests for BKTree class"""
+
+    def test_find_matches_brute_force(self):
+        """Test that the tree finds exactly the hashes within the distance."""
+        from utils.memeUtils.memeHashUtils import BKTree, hamming_distance
+
+        rng = random.Random(7)
+        base = [rng.getrandbits(64) for _ in range(20)]
+        values = [
+            value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+            for value in base for _ in range(10)
+        ]
+
+        tree = BKTree()
+        for index, value in enumerate(values):
+            tree.add(value, str(index))
+
+        for query in base[:5]:
+            expected = sorted(
+                (hamming_distance(query,
+                                  value),
+                 str(index)) for index,
+                value in enumerate(values)
+                if hamming_distance(query, value) <= 4
+            )
+            assert tree.find(query, 4) == expected
+
+        assert len(tree) == len(values)
+
+
+class TestFindDuplicateClusters:
+    """Tests for find_duplicate_clusters function"""
+
+    def test_groups_links_and_similar_hashes(self):
+        """Test that linked and similar memes end up in one cluster."""
+        from utils.memeUtils.memeHashUtils import find_duplicate_clusters
+
+        clusters = find_duplicate_clusters(
+            [
+                ("a", "00000000000000ff", None),
+                ("b", None, "a"),
+                ("c", "00000000000000fe", None),
+                ("d", "ffffffffffffffff", None),
+                ("e", None, None),
+            ],
+            max_distance=2
+        )
+
+        assert [sorted(cluster) for cluster in clusters] == [["a", "b", "c"]]
+
+
+class TestBackfillMemeHashes:
+    """Tests for backfill_meme_hashes function"""
+
+    @pytest.mark.asyncio
+    async def test_reads_chunks_after_the_last_uuid(
+        self,
+        make_meme_model: Callable[[list[Any]],
+                                  MagicMock]
+    ):
+        """Test that unreadable memes are skipped instead of read again."""
+        from utils.memeUtils.memeHashUtils import backfill_meme_hashes
+
+        memes = [
+            SimpleNamespace(uuid=meme_uuid, phash=None, duplicate_of_id=None)
+            for meme_uuid in "abc"
+        ]
+        memes[2].duplicate_of_id = "b"
+        mock_meme = make_meme_model(memes)
+
+        with patch("utils.memeUtils.memeHashUtils.Meme", mock_meme), \
+             patch(
+                 "utils.memeUtils.memeHashUtils._hash_meme_files",
+                 side_effect=[[None, "0" * 16], ["f" * 16]]
+             ) as mock_hash, \
+             patch(
+                 "utils.memeUtils.memeHashUtils.meme_hash_index"
+             ) as mock_index:
+            hashed = await backfill_meme_hashes(chunk_size=2)
+
+        assert hashed == 2
+        assert [
+            [meme.uuid for meme in call.args[0]]
+            for call in mock_hash.call_args_list
+        ] == [["a", "b"], ["c"]]
+        assert [meme.phash for meme in memes] == [None, "0" * 16, "f" * 16]
+        assert mock_meme.bulk_update.await_count == 2
+        # the repost is hashed but only the original is indexed
+        mock_index.add.assert_called_once_with("b", "0" * 16)
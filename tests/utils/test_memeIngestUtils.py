@@ -0,0 +1,252 @@
+"""
+Unit tests for utils/memeUtils/memeIngestUtils.py
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+
+@pytest.fixture
+def mock_hash_index() -> Iterator[MagicMock]:
+    """
+    Fixture that hashes every image to zero and finds no originals.
+    """
+    with patch(
+        "utils.memeUtils.memeIngestUtils.hash_image_data",
+        return_value="0" * 16
+    ), patch("utils.memeUtils.memeIngestUtils.meme_hash_index") as index:
+        index.find_original = AsyncMock(return_value=None)
+        yield index
+
+
+def _job(filename: str = "test.png"):
+    from utils.memeUtils.memeIngestUtils import MemeIngestJob
+
+    return MemeIngestJob(
+        b"image",
+        MagicMock(),
+        "Test meme",
+        datetime(2024,
+                 1,
+                 1),
+        filename
+    )
+
+
+class TestMemeIngestPipeline:
+    """Tests for MemeIngestPipeline class"""
+
+    @pytest.mark.asyncio
+    async def test_processes_job_and_saves_metadata(
+        self,
+        mock_logger: MagicMock,
+        mock_hash_index: MagicMock
+    ):
+        """Test that a job is processed in the executor and then stored."""
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeIngestUtils import MemeIngestPipeline
+
+        with patch("utils.memeUtils.memeIngestUtils.memeUtils") as mock_utils:
+            mock_utils.process_meme_image = MagicMock(
+                return_value=(MemeFormat.PNG,
+                              "ocr text",
+                              "ab" * 32)
+            )
+            mock_utils.save_meme_metadata = AsyncMock()
+
+            pipeline = MemeIngestPipeline(
+                mock_logger,
+                workers=1,
+                queue_size=2,
+                executor=ThreadPoolExecutor(1)
+            )
+            job = _job()
+            await pipeline.enqueue(job)
+            await pipeline._queue.join()
+            pipeline.stop()
+
+            mock_utils.process_meme_image.assert_called_once_with(b"image")
+            meme_uuid = mock_utils.save_meme_metadata.call_args.args[0]
+            mock_utils.save_meme_metadata.assert_awaited_once_with(
+                meme_uuid,
+                MemeFormat.PNG,
+                "ocr text",
+                job.author,
+                job.message,
+                job.date,
+                "0" * 16,
+                "ab" * 32,
+                None
+            )
+            assert pipeline.stats().completed == 1
+            assert pipeline.stats().failed == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_job_does_not_stop_pipeline(
+        self,
+        mock_logger: MagicMock,
+        mock_hash_index: MagicMock
+    ):
+        """Test that a failing meme is counted and later memes still run."""
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeIngestUtils import MemeIngestPipeline
+
+        with patch("utils.memeUtils.memeIngestUtils.memeUtils") as mock_utils:
+            mock_utils.process_meme_image = MagicMock(
+                side_effect=[OSError("broken image"),
+                             (MemeFormat.GIF,
+                              "",
+                              "cd" * 32)]
+            )
+            mock_utils.save_meme_metadata = AsyncMock()
+
+            pipeline = MemeIngestPipeline(
+                mock_logger,
+                workers=1,
+                queue_size=2,
+                executor=ThreadPoolExecutor(1)
+            )
+            await pipeline.enqueue(_job("broken.png"))
+            await pipeline.enqueue(_job("ok.gif"))
+            await pipeline._queue.join()
+            pipeline.stop()
+
+            stats = pipeline.stats()
+            assert stats.completed == 1
+            assert stats.failed == 1
+            assert stats.running == 0
+            assert mock_logger.error.called
+
+    @pytest.mark.asyncio
+    async def test_repost_is_processed_and_linked(
+        self,
+        mock_logger: MagicMock,
+        mock_hash_index: MagicMock
+    ):
+        """Test that a near-duplicate keeps its image and text."""
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeIngestUtils import MemeIngestPipeline
+
+        original = MagicMock()
+        mock_hash_index.find_original = AsyncMock(
+            return_value=("original",
+                          2)
+        )
+
+        with patch("utils.memeUtils.memeIngestUtils.memeUtils") as mock_utils, \
+             patch("utils.memeUtils.memeIngestUtils.Meme") as mock_meme:
+            mock_meme.get_or_none = AsyncMock(return_value=original)
+            mock_utils.process_meme_image = MagicMock(
+                return_value=(MemeFormat.PNG,
+                              "new caption",
+                              "ef" * 32)
+            )
+            mock_utils.save_meme_metadata = AsyncMock()
+
+            pipeline = MemeIngestPipeline(
+                mock_logger,
+                workers=1,
+                queue_size=2,
+                executor=ThreadPoolExecutor(1)
+            )
+            job = _job()
+            await pipeline.enqueue(job)
+            await pipeline._queue.join()
+            pipeline.stop()
+
+            mock_meme.get_or_none.assert_awaited_once_with(uuid="original")
+            mock_utils.process_meme_image.assert_called_once_with(b"image")
+            meme_uuid = mock_utils.save_meme_metadata.call_args.args[0]
+            mock_utils.save_meme_metadata.assert_awaited_once_with(
+                meme_uuid,
+                MemeFormat.PNG,
+                "new caption",
+                job.author,
+                job.message,
+                job.date,
+                "0" * 16,
+                "ef" * 32,
+                original
+            )
+            assert pipeline.stats().duplicates == 1
+
+    @pytest.mark.asyncio
+    async def test_identical_repost_skips_processing(
+        self,
+        mock_logger: MagicMock,
+        mock_hash_index: MagicMock
+    ):
+        """Test that an identical hash reuses the original without OCR."""
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeIngestUtils import MemeIngestPipeline
+
+        original = MagicMock(
+            format=MemeFormat.GIF,
+            content="old caption",
+            content_hash="ab" * 32
+        )
+        mock_hash_index.find_original = AsyncMock(
+            return_value=("original",
+                          0)
+        )
+
+        with patch("utils.memeUtils.memeIngestUtils.memeUtils") as mock_utils, \
+             patch("utils.memeUtils.memeIngestUtils.Meme") as mock_meme:
+            mock_meme.get_or_none = AsyncMock(return_value=original)
+            mock_utils.save_meme_metadata = AsyncMock()
+
+            pipeline = MemeIngestPipeline(
+                mock_logger,
+                workers=1,
+                queue_size=2,
+                executor=ThreadPoolExecutor(1)
+            )
+            job = _job()
+            await pipeline.enqueue(job)
+            await pipeline._queue.join()
+            pipeline.stop()
+
+            mock_utils.process_meme_image.assert_not_called()
+            meme_uuid = mock_utils.save_meme_metadata.call_args.args[0]
+            mock_utils.save_meme_metadata.assert_awaited_once_with(
+                meme_uuid,
+                MemeFormat.GIF,
+                "old caption",
+                job.author,
+                job.message,
+                job.date,
+                "0" * 16,
+                "ab" * 32,
+                original
+            )
+            assert pipeline.stats().duplicates == 1
+
+    @pytest.mark.asyncio
+    async def test_enqueue_waits_while_queue_is_full(
+        self,
+        mock_logger: MagicMock
+    ):
+        """Test that enqueue applies backpressure on a full queue."""
+        from utils.memeUtils.memeIngestUtils import MemeIngestPipeline
+
+        pipeline = MemeIngestPipeline(
+            mock_logger,
+            workers=1,
+            queue_size=1,
+            executor=ThreadPoolExecutor(1)
+        )
+        # consumers are not started, so the queue is never drained
+        pipeline.start = MagicMock()  # type: ignore
+
+        await pipeline.enqueue(_job())
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pipeline.enqueue(_job()), timeout=0.05)
+
+        assert pipeline.stats().queued == 1
+        assert mock_logger.warning.called
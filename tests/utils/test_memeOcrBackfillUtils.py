@@ -0,0 +1,163 @@
+"""
+Unit tests for utils/memeUtils/memeOcrBackfillUtils.py
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+class TestOcrMemeFiles:
+    """Tests for ocr_meme_files function"""
+
+    def test_batches_images_of_the_same_size(self, tmp_path: Any):
+        """Test that images are padded to a step and batched by size."""
+        from PIL import Image
+
+        from utils.memeUtils.memeOcrBackfillUtils import ocr_meme_files
+
+        wide = str(tmp_path / "wide.png")
+        tall = str(tmp_path / "tall.gif")
+        similar = str(tmp_path / "similar.png")
+        Image.new("RGB", (300, 100)).save(wide)
+        Image.new("P", (50, 200)).save(tall)
+        Image.new("RGB", (310, 90)).save(similar)
+
+        with patch(
+            "utils.memeUtils.memeOcrBackfillUtils.ocr_engine"
+        ) as mock_engine:
+            mock_engine.readtext_batched.side_effect = [
+                [[([],
+                   "Hallo",
+                   0.9),
+                  ([],
+                   "Welt",
+                   0.8)],
+                 [([],
+                   "Mensa",
+                   0.7)]],
+                [[]],
+            ]
+
+            contents = ocr_meme_files(
+                [wide,
+                 str(tmp_path / "gone.png"),
+                 tall,
+                 similar]
+            )
+
+            batches = [
+                [image.shape for image in call.args[0]]
+                for call in mock_engine.readtext_batched.call_args_list
+            ]
+
+        assert batches == [[(128, 320, 3)] * 2, [(256, 64, 3)]]
+        assert contents == ["Hallo\nWelt", None, "", "Mensa"]
+
+
+class TestMemeOcrBackfill:
+    """Tests for MemeOcrBackfill class"""
+
+    @pytest.mark.asyncio
+    async def test_resumes_from_checkpoint(
+        self,
+        mock_logger: MagicMock,
+        make_meme_model: Callable[[list[Any]], MagicMock],
+        tmp_path: Any
+    ):
+        """Test that a failed run is resumed after the last finished chunk."""
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeOcrBackfillUtils import MemeOcrBackfill
+
+        memes = [
+            SimpleNamespace(
+                uuid=f"{i:04d}",
+                format=MemeFormat.PNG,
+                file_path=f"{i:04d}.png",
+                content="alt",
+                message=""
+            ) for i in range(5)
+        ]
+        checkpoint = str(tmp_path / "backfill.json")
+        seen: list[list[str]] = []
+
+        def ocr_meme_files(paths: list[str]) -> list[str]:
+            seen.append([os.path.basename(path) for path in paths])
+            if len(seen) == 2:
+                raise OSError("worker died")
+            return ["neu"] * len(paths)
+
+        with patch(
+            "utils.memeUtils.memeOcrBackfillUtils.Meme",
+            make_meme_model(memes)
+        ) as mock_meme, patch(
+            "utils.memeUtils.memeOcrBackfillUtils.meme_search_index"
+        ) as mock_index, patch(
+            "utils.memeUtils.memeOcrBackfillUtils.ocr_meme_files",
+            ocr_meme_files
+        ):
+            backfill = MemeOcrBackfill(
+                mock_logger,
+                checkpoint,
+                chunk_size=2,
+                executor=ThreadPoolExecutor(1)
+            )
+            assert backfill.start()
+            await backfill._task  # type: ignore
+
+            assert backfill.has_checkpoint()
+            assert backfill.stats().processed == 2
+            assert mock_logger.error.called
+
+            backfill = MemeOcrBackfill(
+                mock_logger,
+                checkpoint,
+                chunk_size=2,
+                executor=ThreadPoolExecutor(1)
+            )
+            backfill.start()
+            await backfill._task  # type: ignore
+
+            stats = backfill.stats()
+            assert seen == [
+                ["0000.png",
+                 "0001.png"],
+                ["0002.png",
+                 "0003.png"],
+                ["0002.png",
+                 "0003.png"],
+                ["0004.png"],
+            ]
+            assert stats.processed == 5
+            assert stats.updated == 5
+            assert stats.total == 5
+            assert not backfill.has_checkpoint()
+            assert mock_meme.bulk_update.await_count == 3
+            assert mock_index.add_meme.call_count == 5
+
+    def test_reset_forgets_progress(
+        self,
+        mock_logger: MagicMock,
+        tmp_path: Any
+    ):
+        """Test that reset removes the checkpoint and the counters."""
+        from utils.memeUtils.memeOcrBackfillUtils import MemeOcrBackfill
+
+        backfill = MemeOcrBackfill(
+            mock_logger,
+            str(tmp_path / "backfill.json"),
+            chunk_size=2
+        )
+        backfill._last_uuid = "0001"
+        backfill._processed = 2
+        backfill._save_checkpoint()
+
+        assert backfill.has_checkpoint()
+        assert backfill.reset()
+        assert not backfill.has_checkpoint()
+        assert backfill.stats().processed == 0
+        assert backfill.stats().last_uuid is None
@@ -0,0 +1,216 @@
+"""
+Unit tests and benchmarks for utils/memeUtils/memeSearchUtils.py
+"""
+
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Callable
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+WORDS = [
+    "mathe",
+    "prüfung",
+    "informatik",
+    "kaffee",
+    "mensa",
+    "nudeln",
+    "python",
+    "java",
+    "trick",
+    "vorlesung",
+    "klausur",
+    "hallo",
+    "welt",
+]
+
+
+def _fake_memes(num: int, seed: int = 42) -> list[tuple[str, str, str]]:
+    rng = random.Random(seed)
+    return [
+        (
+            f"{i:08d}",
+            " ".join(rng.choices(WORDS,
+                                 k=rng.randint(0,
+                                               20))),
+            rng.choice(["",
+                        " ".join(rng.choices(WORDS,
+                                             k=2))])
+        ) for i in range(num)
+    ]
+
+
+def _meme_rows(rows: list[tuple[str, str, str]]) -> list[SimpleNamespace]:
+    # the index reads the memes ordered by date
+    return [
+        SimpleNamespace(
+            uuid=meme_uuid,
+            content=content,
+            message=message,
+            date=index
+        ) for index,
+        (meme_uuid,
+         content,
+         message) in enumerate(rows)
+    ]
+
+
+class TestTokenize:
+    """Tests for tokenize function"""
+
+    def test_words_and_trigrams(self):
+        """Test that words and their padded trigrams are counted."""
+        from utils.memeUtils.memeSearchUtils import tokenize
+
+        tokens = tokenize("Hi hi")
+
+        assert tokens == {"w:hi": 2, "c: hi": 2, "c:hi ": 2}
+
+
+class TestMemeSearchIndex:
+    """Tests for MemeSearchIndex class"""
+
+    @pytest.mark.asyncio
+    async def test_ranks_by_cosine_similarity(
+        self,
+        make_meme_model: Callable[[list[Any]], MagicMock]
+    ):
+        """Test that better matching memes are ranked first."""
+        from utils.memeUtils.memeSearchUtils import MemeSearchIndex
+
+        rows = [
+            ("a", "Kaffee in der Mensa", ""),
+            ("b", "Nudeln in der Mensa", "Mensa Mensa"),
+            ("c", "Mathe Klausur", ""),
+        ]
+        with patch("utils.memeUtils.memeSearchUtils.Meme",
+                   make_meme_model(_meme_rows(rows))):
+            index = MemeSearchIndex()
+
+            assert await index.search("mensa", 10) == ["b", "a"]
+            assert await index.search("kafee", 10) == ["a"]
+            assert await index.search("???", 10) == []
+            assert await index.search("mensa", 1) == ["b"]
+
+            stats = index.stats()
+            assert stats.memes == 3
+            assert stats.queries == 4
+            assert stats.build_ms is not None
+            assert stats.avg_query_ms is not None
+
+    @pytest.mark.asyncio
+    async def test_add_meme_updates_loaded_index(
+        self,
+        make_meme_model: Callable[[list[Any]], MagicMock]
+    ):
+        """Test that new and changed memes are searchable immediately."""
+        from utils.memeUtils.memeSearchUtils import MemeSearchIndex
+
+        rows = [("a", "Hallo Welt", "")]
+        with patch("utils.memeUtils.memeSearchUtils.Meme",
+                   make_meme_model(_meme_rows(rows))):
+            index = MemeSearchIndex()
+            await index.load()
+
+            index.add_meme("b", "Python Trick", "")
+            assert await index.search("trick", 10) == ["b"]
+
+            index.add_meme("a", "Java Trick", "")
+            assert await index.search("hallo", 10) == []
+            assert await index.search("java trick", 10) == ["a", "b"]
+            assert len(index) == 2
+
+    @pytest.mark.asyncio
+    async def test_meme_added_while_compiling(
+        self,
+        make_meme_model: Callable[[list[Any]], MagicMock]
+    ):
+        """Test that a meme added during a compilation is found later."""
+        from utils.memeUtils.memeSearchUtils import MemeSearchIndex
+
+        to_thread = asyncio.to_thread
+
+        async def add_while_compiling(func: Any, *args: Any) -> Any:
+            index.add_meme("b", "Python Trick", "")
+            return await to_thread(func, *args)
+
+        rows = [("a", "Hallo Welt", "")]
+        with patch("utils.memeUtils.memeSearchUtils.Meme",
+                   make_meme_model(_meme_rows(rows))):
+            index = MemeSearchIndex()
+            await index.load()
+
+            index.add_meme("c", "Mensa", "")
+            with patch("asyncio.to_thread", add_while_compiling):
+                assert await index.search("trick", 10) == []
+
+            assert await index.search("trick", 10) == ["b"]
+            assert await index.search("mensa", 10) == ["c"]
+
+    @pytest.mark.asyncio
+    async def test_empty_index(
+        self,
+        make_meme_model: Callable[[list[Any]], MagicMock]
+    ):
+        """Test that an empty index finds nothing."""
+        from utils.memeUtils.memeSearchUtils import MemeSearchIndex
+
+        with patch("utils.memeUtils.memeSearchUtils.Meme",
+                   make_meme_model(_meme_rows([]))):
+            index = MemeSearchIndex()
+
+            assert await index.search("mensa", 10) == []
+            assert index.is_loaded
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+@pytest.mark.parametrize("num_memes", [1_000, 10_000])
+async def test_benchmark_index_vs_full_fuzzy_scan(
+    num_memes: int,
+    make_meme_model: Callable[[list[Any]],
+                              MagicMock]
+):
+    """
+    Compare the TF-IDF preselection with a fuzzy scan of all memes.
+
+    Run with `pytest -m slow -s` to see the timings.
+    """
+    from thefuzz import fuzz  # type: ignore
+
+    from utils.memeUtils.memeSearchUtils import MemeSearchIndex
+
+    rows: list[Any] = _fake_memes(num_memes)
+
+    start = time.perf_counter()
+    for _ in range(10):
+        full = [
+            meme_uuid for meme_uuid,
+            content,
+            message in rows
+            if fuzz.token_set_ratio("kaffee mensa",
+                                    content + "\n" + message) > 50
+        ]
+    scan = (time.perf_counter() - start) / 10
+
+    with patch("utils.memeUtils.memeSearchUtils.Meme",
+               make_meme_model(_meme_rows(rows))):
+        index = MemeSearchIndex()
+        await index.load()
+
+        start = time.perf_counter()
+        for _ in range(10):
+            candidates = await index.search("kaffee mensa", 50)
+        query = (time.perf_counter() - start) / 10
+
+    stats = index.stats()
+    print(
+        f"\n{num_memes} memes: fuzzy scan {scan * 1000:.1f} ms, "
+        f"index query {query * 1000:.2f} ms "
+        f"(build {stats.build_ms:.0f} ms), {len(full)} fuzzy matches"
+    )
+
+    assert set(candidates) <= set(full)
@@ -0,0 +1,166 @@
+"""
+Unit tests for utils/memeUtils/memeStorageUtils.py
+"""
+
+import os
+import time
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+
+class TestMemeStorage:
+    """Tests for MemeStorage class"""
+
+    @pytest.mark.asyncio
+    async def test_read_raw_counts_bytes(self, tmp_path: Any):
+        """Test that original images are read and counted."""
+        from utils.memeUtils.memeStorageUtils import MemeStorage
+
+        (tmp_path / "a.png").write_bytes(b"12345")
+        meme = SimpleNamespace(file_path="a.png")
+
+        storage = MemeStorage(str(tmp_path), MagicMock(), "unused")
+
+        assert await storage.read_raw(meme) == b"12345"  # type: ignore
+        assert await storage.read_raw(meme) == b"12345"  # type: ignore
+
+        stats = storage.stats()
+        assert stats.raw_reads == 2
+        assert stats.raw_bytes == 10
+        assert stats.banner_reads == 0
+
+    @pytest.mark.asyncio
+    async def test_read_banner_uses_cache(self):
+        """Test that banners are read through the banner cache."""
+        from utils.memeUtils.memeStorageUtils import MemeStorage
+
+        banner_cache = MagicMock()
+        banner_cache.get_banner.return_value = b"banner"
+        meme = SimpleNamespace(file_path="a.png")
+
+        storage = MemeStorage("unused", banner_cache, "unused")
+
+        assert await storage.read_banner(meme) == b"banner"  # type: ignore
+        banner_cache.get_banner.assert_called_once_with(meme)
+
+        stats = storage.stats()
+        assert stats.reads == 1
+        assert stats.bytes_read == 6
+
+    def test_write_file_is_content_addressed(self, tmp_path: Any):
+        """Test that files are sharded by hash and stored once."""
+        import hashlib
+
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeStorageUtils import MemeStorage
+
+        storage = MemeStorage(str(tmp_path), MagicMock(), "unused")
+
+        first = storage.write_file(b"meme", MemeFormat.PNG)
+        second = storage.write_file(b"meme", MemeFormat.PNG)
+
+        assert first == second == hashlib.sha256(b"meme").hexdigest()
+        path = tmp_path / first[:2] / first[2:4] / f"{first}.png"
+        assert path.read_bytes() == b"meme"
+        assert os.listdir(path.parent) == [path.name]
+
+    def test_write_file_renews_existing_file(self, tmp_path: Any):
+        """Test that a stored file is kept alive for the new meme."""
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeStorageUtils import MemeStorage
+
+        storage = MemeStorage(str(tmp_path), MagicMock(), "unused")
+
+        content_hash = storage.write_file(b"meme", MemeFormat.PNG)
+        path = tmp_path / content_hash[:2] / content_hash[2:4]
+        path = path / f"{content_hash}.png"
+        os.utime(path, (0, 0))
+
+        storage.write_file(b"meme", MemeFormat.PNG)
+
+        assert path.stat().st_mtime > time.time() - 60
+
+    def test_import_file_streams_blocks(self, tmp_path: Any):
+        """Test that a legacy file is copied block by block under its hash."""
+        import hashlib
+
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeStorageUtils import MemeStorage
+
+        data = os.urandom(10_000)
+        (tmp_path / "legacy.gif").write_bytes(data)
+        blocks: list[int] = []
+
+        storage = MemeStorage(str(tmp_path), MagicMock(), "unused")
+        content_hash = storage.import_file(
+            str(tmp_path / "legacy.gif"),
+            MemeFormat.GIF,
+            block_size=4096,
+            on_block=blocks.append
+        )
+
+        assert content_hash == hashlib.sha256(data).hexdigest()
+        assert blocks == [4096, 4096, 1808]
+        stored = tmp_path / content_hash[:2] / content_hash[2:4]
+        assert (stored / f"{content_hash}.gif").read_bytes() == data
+        # the source is kept and no temporary file is left behind
+        assert sorted(os.listdir(tmp_path)) == sorted(
+            ["legacy.gif", content_hash[:2]]
+        )
+
+    @pytest.mark.asyncio
+    async def test_remove_unreferenced_deletes_previews(self, tmp_path: Any):
+        """Test that orphaned files are deleted together with their preview."""
+        from models.database.memeData import MemeFormat
+        from utils.memeUtils.memeStorageUtils import MemeStorage
+
+        raw_folder = tmp_path / "raw"
+        preview_folder = tmp_path / "preview"
+        storage = MemeStorage(
+            str(raw_folder),
+            MagicMock(),
+            str(preview_folder)
+        )
+
+        kept = storage.write_file(b"kept", MemeFormat.PNG)
+        orphan = storage.write_file(b"orphan", MemeFormat.GIF)
+        for content_hash in (kept, orphan):
+            preview = (
+                preview_folder / content_hash[:2] / content_hash[2:4] /
+                f"{content_hash}.webp"
+            )
+            preview.parent.mkdir(parents=True)
+            preview.write_bytes(b"preview")
+
+        storage.reference_counts = AsyncMock(  # type: ignore
+            return_value={kept: 1}
+        )
+
+        assert await storage.remove_unreferenced(grace_seconds=-1) == 1
+
+        assert (raw_folder / kept[:2] / kept[2:4] / f"{kept}.png").exists()
+        assert (preview_folder / kept[:2] / kept[2:4] /
+                f"{kept}.webp").exists()
+        assert not (raw_folder / orphan[:2] / orphan[2:4] /
+                    f"{orphan}.gif").exists()
+        assert not (preview_folder / orphan[:2] / orphan[2:4] /
+                    f"{orphan}.webp").exists()
+
+
+class TestThroughputLimiter:
+    """Tests for ThroughputLimiter class"""
+
+    def test_limits_bytes_per_second(self):
+        """Test that consuming bytes waits for the configured rate."""
+        from utils.memeUtils.memeStorageMigrationUtils import ThroughputLimiter
+
+        limiter = ThroughputLimiter(bytes_per_second=100_000)
+
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.consume(2_000)
+
+        assert time.monotonic() - start >= 0.09
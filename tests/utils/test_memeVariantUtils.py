@@ -0,0 +1,115 @@
+"""
+Unit tests for utils/memeUtils/memeVariantUtils.py
+"""
+
+import os
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any
+
+from PIL import Image
+
+
+def _gif(frames: int, size: tuple[int, int] = (100, 100)) -> Image.Image:
+    images = [
+        Image.new("RGB",
+                  size,
+                  (index * 10 % 256,
+                   0,
+                   0)) for index in range(frames)
+    ]
+    output = BytesIO()
+    images[0].save(
+        output,
+        format="GIF",
+        save_all=True,
+        append_images=images[1:],
+        duration=40,
+        loop=0
+    )
+    return Image.open(BytesIO(output.getvalue()))
+
+
+class TestRenderPreview:
+    """Tests for render_preview function"""
+
+    def test_static_preview_is_scaled_webp(self):
+        """Test that a static image is scaled down to the maximum size."""
+        from utils.memeUtils.memeVariantUtils import render_preview
+
+        preview = render_preview(
+            Image.new("RGB",
+                      (2000,
+                       1000),
+                      (0,
+                       128,
+                       0)),
+            max_size=640,
+            quality=75,
+            max_frames=10
+        )
+
+        with Image.open(BytesIO(preview)) as img:
+            assert img.format == "WEBP"
+            assert img.size == (640, 320)
+
+    def test_animated_preview_drops_frames(self):
+        """Test that GIFs stay animated and keep their total duration."""
+        from utils.memeUtils.memeVariantUtils import render_preview
+
+        preview = render_preview(
+            _gif(20),
+            max_size=640,
+            quality=75,
+            max_frames=5
+        )
+
+        with Image.open(BytesIO(preview)) as img:
+            assert img.format == "WEBP"
+            assert img.n_frames == 5  # type: ignore
+            total = 0
+            for index in range(img.n_frames):  # type: ignore
+                img.seek(index)
+                img.load()
+                total += img.info["duration"]
+            assert total == 20 * 40
+
+
+class TestMemeVariantStore:
+    """Tests for MemeVariantStore class"""
+
+    def _store(self, tmp_path: Any):
+        from utils.memeUtils.memeVariantUtils import MemeVariantStore
+
+        (tmp_path / "raw").mkdir()
+        return MemeVariantStore(
+            str(tmp_path / "preview"),
+            str(tmp_path / "raw"),
+            max_size=64,
+            quality=75,
+            max_frames=10
+        )
+
+    def test_small_original_is_sent(self, tmp_path: Any):
+        """Test that an original within the budget needs no preview."""
+        store = self._store(tmp_path)
+        Image.new("RGB", (10, 10)).save(tmp_path / "raw" / "a.png")
+        meme = SimpleNamespace(file_path="a.png")
+
+        variant = store.select(meme, max_bytes=10**6)  # type: ignore
+
+        assert variant.is_original
+        assert variant.path == str(tmp_path / "raw" / "a.png")
+        assert not os.path.exists(tmp_path / "preview")
+
+    def test_large_original_is_replaced_by_preview(self, tmp_path: Any):
+        """Test that the preview is rendered lazily for large originals."""
+        store = self._store(tmp_path)
+        Image.effect_noise((500, 500), 50).save(tmp_path / "raw" / "a.png")
+        meme = SimpleNamespace(file_path="a.png")
+
+        variant = store.select(meme, max_bytes=1000)  # type: ignore
+
+        assert not variant.is_original
+        assert variant.path == str(tmp_path / "preview" / "a.webp")
+        assert variant.size_bytes < os.path.getsize(tmp_path / "raw" / "a.png")
@@ -0,0 +1,90 @@
+"""
+Unit tests for utils/ai/modelRouter.py
+"""
+
+import pytest
+
+
+def _router(probe_interval: int = 3):
+    from utils.ai.modelRouter import ModelRouter
+
+    return ModelRouter.from_config(
+        [
+            {
+                "name": "fast",
+                "model": "nano",
+                "max_code_tokens": 100,
+                "max_latency_ms": 1000,
+                "max_completion_tokens": 300,
+            },
+            {
+                "name": "standard",
+                "model": "mini",
+                "max_code_tokens": 500,
+                "max_latency_ms": 5000,
+                "max_completion_tokens": 1000,
+            },
+            {
+                "name": "large",
+                "model": "big",
+                "max_completion_tokens": 3000,
+            },
+        ],
+        0.5,
+        probe_interval
+    )
+
+
+class TestModelRouter:
+    """Tests for ModelRouter class"""
+
+    def test_routes_by_size(self):
+        """Test that the smallest fitting tier comes first."""
+        router = _router()
+
+        assert [tier.name for tier in router.route(50)] == [
+            "fast",
+            "standard",
+            "large",
+        ]
+        assert [tier.name for tier in router.route(300)] == [
+            "standard",
+            "large",
+        ]
+        # larger than every tier, only the fallback tier is left
+        assert [tier.name for tier in router.route(1000)] == ["large"]
+
+    def test_skips_slow_tiers_and_probes_them(self):
+        """Test that a tier over its latency budget is skipped for a while."""
+        router = _router(probe_interval=3)
+        fast = router.tiers[0]
+
+        router.record(fast, 3000, 10, failed=False, fallback=False)
+
+        assert router.route(50)[0].name == "standard"
+        assert router.route(50)[0].name == "standard"
+        # every third skipped request refreshes the latency of the tier
+        assert router.route(50)[0].name == "fast"
+
+        router.record(fast, 200, 10, failed=False, fallback=False)
+        router.record(fast, 200, 10, failed=False, fallback=False)
+        assert router.route(50)[0].name == "fast"
+
+    def test_records_tier_stats(self):
+        """Test that latency, tokens, failures and fallbacks are counted."""
+        router = _router()
+        fast, standard, _ = router.tiers
+
+        router.record(fast, 900, 0, failed=True, fallback=False)
+        router.record(standard, 1000, 300, failed=False, fallback=True)
+        router.record(standard, 2000, 200, failed=False, fallback=False)
+
+        stats = {tier.name: tier for tier in router.stats()}
+        assert stats["fast"].failures == 1
+        # failures do not count as latency samples
+        assert stats["fast"].avg_latency_ms is None
+        assert stats["standard"].requests == 2
+        assert stats["standard"].fallbacks == 1
+        assert stats["standard"].tokens == 500
+        assert stats["standard"].avg_latency_ms == pytest.approx(1500)
+        assert stats["large"].requests == 0
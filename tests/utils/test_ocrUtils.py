@@ -0,0 +1,80 @@
+"""
+Unit tests for utils/memeUtils/ocrUtils.py
+"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+
+class TestOCREngine:
+    """Tests for OCREngine class"""
+
+    def test_reader_is_created_once(self):
+        """Test that the models are loaded once and reused for all images."""
+        from utils.memeUtils.ocrUtils import OCREngine
+
+        with patch("utils.memeUtils.ocrUtils.easyocr.Reader") as mock_reader:
+            mock_reader.return_value.readtext.return_value = [
+                ([],
+                 "Hallo",
+                 0.9)
+            ]
+            engine = OCREngine(["de", "en"], "data/ocr", idle_timeout=60)
+
+            for _ in range(3):
+                result = engine.readtext(np.zeros((2, 2)))
+
+            engine.release()
+
+            assert result == [([], "Hallo", 0.9)]
+            mock_reader.assert_called_once_with(
+                ["de",
+                 "en"],
+                model_storage_directory="data/ocr"
+            )
+            assert engine.loads == 1
+            assert engine.images == 3
+
+    def test_models_are_released_after_idle_timeout(self):
+        """Test that an idle engine drops and later reloads its models."""
+        from utils.memeUtils.ocrUtils import OCREngine
+
+        with patch("utils.memeUtils.ocrUtils.easyocr.Reader") as mock_reader:
+            mock_reader.return_value.readtext.return_value = []
+            engine = OCREngine(["de"], "data/ocr", idle_timeout=0.05)
+
+            engine.preload()
+            assert engine.is_loaded
+
+            deadline = time.monotonic() + 2
+            while engine.is_loaded and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            assert not engine.is_loaded
+
+            engine.readtext(np.zeros((2, 2)))
+            engine.release()
+
+            assert engine.loads == 2
+
+    def test_get_text_from_image_joins_lines(self):
+        """Test that the recognised lines are joined with newlines."""
+        from PIL import Image
+
+        from utils.memeUtils.ocrUtils import get_text_from_image
+
+        with patch("utils.memeUtils.ocrUtils.ocr_engine") as mock_engine:
+            mock_engine.readtext.return_value = [
+                ([],
+                 "Hallo",
+                 0.9),
+                ([],
+                 "Welt",
+                 0.8),
+            ]
+
+            text = get_text_from_image(MagicMock(), Image.new("RGB", (4, 4)))
+
+        assert text == "Hallo\nWelt"
@@ -0,0 +1,98 @@
+"""
+Unit tests for utils/ai/preflight.py
+"""
+
+from unittest.mock import patch
+
+PYTHON_CODE = '''import os
+
+
+def first():
+    return 1
+
+
+# the second function
+@decorator
+def second():
+    if True:
+        return 2
+
+    return 3
+
+
+class Third:
+
+    def method(self):
+        return 4
+'''
+
+
+class TestSplitCode:
+    """Tests for split_code function"""
+
+    def test_small_code_is_one_chunk(self):
+        """Test that code within the limit is not split."""
+        from utils.ai.preflight import split_code
+
+        assert split_code(PYTHON_CODE, 1000) == [PYTHON_CODE]
+
+    def test_splits_at_top_level_blocks(self):
+        """Test that chunks start at top-level definitions."""
+        from utils.ai.preflight import split_code
+
+        chunks = split_code(PYTHON_CODE, 30)
+
+        assert "".join(chunks) == PYTHON_CODE
+        assert len(chunks) > 1
+        # comments and decorators stay with their function
+        assert any(
+            chunk.startswith("# the second function\n@decorator\n")
+            for chunk in chunks
+        )
+        # the blank line inside a function is no boundary
+        assert not any(chunk.startswith("    return 3") for chunk in chunks)
+        assert chunks[-1].startswith("class Third:")
+
+    def test_splits_oversized_single_lines(self):
+        """Test that one-line code from the slash command is cut as well."""
+        from utils.ai.preflight import estimate_tokens, split_code
+
+        code = "x = 1; " * 500
+        chunks = split_code(code, 100)
+
+        assert "".join(chunks) == code
+        assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+
+class TestEstimateTranslation:
+    """Tests for estimate_translation function"""
+
+    def test_counts_the_system_message_per_chunk(self):
+        """Test that every chunk pays for the system message."""
+        from utils.ai.preflight import estimate_tokens, estimate_translation
+        from utils.ai.system_data import code_translate_system_message
+        from utils.constants import Constants
+
+        system_tokens = estimate_tokens(code_translate_system_message)
+
+        with patch.object(Constants.AI, "CHUNK_MAX_TOKENS", 20):
+            estimate = estimate_translation(PYTHON_CODE)
+
+        assert len(estimate.chunks) > 1
+        assert estimate.input_tokens == (
+            len(estimate.chunks) * system_tokens +
+            sum(estimate_tokens(chunk) for chunk in estimate.chunks)
+        )
+        assert estimate.output_tokens > estimate.code_tokens
+        assert not estimate.too_large
+
+    def test_too_large_code(self):
+        """Test that code above MAX_CODE_TOKENS is flagged."""
+        from utils.ai.preflight import estimate_translation
+        from utils.constants import Constants
+
+        code = "x" * (
+            (Constants.AI.MAX_CODE_TOKENS + 1) * Constants.AI.CHARS_PER_TOKEN
+        )
+
+        assert estimate_translation(code).too_large
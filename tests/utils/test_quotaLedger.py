@@ -0,0 +1,132 @@
+"""
+Unit tests for utils/ai/quotaLedger.py
+"""
+
+import asyncio
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+
+class TestQuotaRemaining:
+    """Tests for QuotaRemaining class"""
+
+    def test_no_requests_without_tokens(self):
+        """Test that a used up token budget leaves no usable requests."""
+        from utils.ai.quotaLedger import QuotaRemaining
+
+        assert QuotaRemaining(requests=3, tokens=100).usable_requests == 3
+        assert QuotaRemaining(requests=3, tokens=-20).usable_requests == 0
+        assert QuotaRemaining(requests=-1, tokens=100).usable_requests == 0
+
+
+class TestQuotaLedger:
+    """Tests for QuotaLedger class"""
+
+    @pytest.mark.asyncio
+    async def test_reserve_returns_remaining_quota(self):
+        """Test that a reservation is a single conditional upsert."""
+        from utils.ai.quotaLedger import QuotaLedger
+
+        with patch("utils.ai.quotaLedger.AIUsage") as mock_usage:
+            mock_usage.today.return_value = date(2026, 10, 17)
+            execute = AsyncMock(return_value=[{"requests": 2, "tokens": 900}])
+            mock_usage._meta.db.execute_query_dict = execute
+
+            reservation = await QuotaLedger(5, 1000).reserve(42)
+
+            assert reservation is not None
+            assert reservation.day == date(2026, 10, 17)
+            assert reservation.remaining.requests == 3
+            assert reservation.remaining.tokens == 100
+            execute.assert_awaited_once()
+            assert execute.await_args.args[1] == [42, "2026-10-17", 5, 1000]
+
+    @pytest.mark.asyncio
+    async def test_reserve_fails_when_the_limit_is_reached(self):
+        """Test that no reservation is made if the upsert updated nothing."""
+        from utils.ai.quotaLedger import QuotaLedger
+
+        with patch("utils.ai.quotaLedger.AIUsage") as mock_usage:
+            mock_usage.today.return_value = date(2026, 10, 17)
+            mock_usage._meta.db.execute_query_dict = AsyncMock(
+                return_value=[]
+            )
+
+            assert await QuotaLedger(5, 1000).reserve(42) is None
+
+    @pytest.mark.asyncio
+    async def test_commit_and_refund_update_the_reservation(self):
+        """Test that committed tokens and refunds reach the reservation."""
+        from utils.ai.quotaLedger import (
+            QuotaLedger,
+            QuotaRemaining,
+            QuotaReservation,
+        )
+
+        with patch("utils.ai.quotaLedger.AIUsage") as mock_usage:
+            query = MagicMock()
+            query.update = AsyncMock(return_value=1)
+            mock_usage.filter.return_value = query
+
+            ledger = QuotaLedger(5, 1000)
+            reservation = QuotaReservation(
+                42,
+                date(2026, 10, 17),
+                QuotaRemaining(requests=2, tokens=1000)
+            )
+
+            await ledger.commit(reservation, 300)
+            assert reservation.remaining.tokens == 700
+
+            await ledger.refund(reservation)
+            assert reservation.remaining.requests == 3
+            assert query.update.await_count == 2
+
+
+@pytest.mark.integration
+class TestQuotaLedgerDatabase:
+    """Tests for QuotaLedger against a real SQLite database"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reservations_stop_at_the_limits(
+        self,
+        in_memory_db: None
+    ):
+        """Test that the conditional upsert caps requests and tokens."""
+        from models.database.userData import User
+        from utils.ai.quotaLedger import QuotaLedger, QuotaRemaining
+
+        for user_id in (42, 43):
+            await User.create(
+                id=user_id,
+                global_name="test",
+                display_name="Test"
+            )
+        ledger = QuotaLedger(max_requests=3, max_tokens=1000)
+
+        results = await asyncio.gather(
+            *(ledger.reserve(42) for _ in range(10))
+        )
+
+        reserved = [result for result in results if result is not None]
+        assert sorted(
+            reservation.remaining.requests for reservation in reserved
+        ) == [0, 1, 2]
+        assert (await ledger.remaining(42)).requests == 0
+
+        # a refunded request can be reserved again
+        await ledger.refund(reserved[0])
+        assert await ledger.reserve(42) is not None
+        assert await ledger.reserve(42) is None
+
+        # a used up token budget blocks further requests
+        reservation = await ledger.reserve(43)
+        assert reservation is not None
+        await ledger.commit(reservation, 1000)
+        assert await ledger.reserve(43) is None
+        assert await ledger.remaining(43) == QuotaRemaining(
+            requests=2,
+            tokens=0
+        )
@@ -0,0 +1,94 @@
+"""
+Unit tests for utils/quoteCollectionUtils.py
+"""
+
+from typing import Any, Callable
+
+
+class TestQuoteCollectionBuffer:
+    """Tests for QuoteCollectionBuffer class"""
+
+    def test_add_counts_collected_messages(
+        self,
+        make_collected_message: Callable[..., Any]
+    ):
+        """Test that add returns the number of collected messages."""
+        from utils.quoteCollectionUtils import QuoteCollectionBuffer
+
+        buffer = QuoteCollectionBuffer(
+            ttl=600,
+            max_messages_per_user=5,
+            max_bytes=1024 * 1024
+        )
+
+        assert buffer.add(1, make_collected_message("a")) == 1
+        assert buffer.add(1, make_collected_message("b")) == 2
+        assert buffer.add(2, make_collected_message("c")) == 1
+
+        assert [m.message.content for m in buffer.get(1)] == ["a", "b"]
+
+    def test_add_respects_per_user_cap(
+        self,
+        make_collected_message: Callable[..., Any]
+    ):
+        """Test that a user cannot collect more than the maximum."""
+        from utils.quoteCollectionUtils import QuoteCollectionBuffer
+
+        buffer = QuoteCollectionBuffer(
+            ttl=600,
+            max_messages_per_user=2,
+            max_bytes=1024 * 1024
+        )
+        buffer.add(1, make_collected_message())
+        buffer.add(1, make_collected_message())
+
+        assert buffer.add(1, make_collected_message()) is None
+        assert len(buffer.get(1)) == 2
+
+    def test_memory_bound_evicts_least_recently_used_user(
+        self,
+        make_collected_message: Callable[..., Any]
+    ):
+        """Test that the global size bound drops the oldest collections."""
+        from utils.quoteCollectionUtils import QuoteCollectionBuffer
+
+        message_size = make_collected_message("x" * 1000).size()
+        buffer = QuoteCollectionBuffer(
+            ttl=600,
+            max_messages_per_user=5,
+            max_bytes=int(message_size * 2.5)
+        )
+
+        buffer.add(1, make_collected_message("x" * 1000))
+        buffer.add(2, make_collected_message("x" * 1000))
+        buffer.add(3, make_collected_message("x" * 1000))
+
+        assert 1 not in buffer
+        assert 2 in buffer
+        assert 3 in buffer
+        assert buffer.stats().size_bytes <= buffer.stats().max_bytes
+
+    def test_pop_and_stats(
+        self,
+        make_collected_message: Callable[..., Any]
+    ):
+        """Test that popping empties the collection and updates the stats."""
+        from utils.quoteCollectionUtils import QuoteCollectionBuffer
+
+        buffer = QuoteCollectionBuffer(
+            ttl=600,
+            max_messages_per_user=5,
+            max_bytes=1024 * 1024
+        )
+        buffer.add(1, make_collected_message())
+        buffer.add(1, make_collected_message())
+
+        stats = buffer.stats()
+        assert stats.users == 1
+        assert stats.messages == 2
+        assert stats.size_bytes > 0
+
+        assert len(buffer.pop(1)) == 2
+        assert buffer.pop(1) == []
+        assert buffer.get(1) == []
+        assert buffer.stats().size_bytes == 0
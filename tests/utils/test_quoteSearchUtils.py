@@ -0,0 +1,363 @@
+"""
+Unit tests and benchmarks for utils/quoteSearchUtils.py
+"""
+
+import random
+import time
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+WORDS = [
+    "mathe",
+    "prüfung",
+    "informatik",
+    "kaffee",
+    "mensa",
+    "nudeln",
+    "python",
+    "java",
+    "übung",
+    "vorlesung",
+    "professor",
+    "klausur",
+    "Tschüss",
+    "hallo",
+    "welt",
+]
+NAMES = ["Anna", "Ben", "Clara", "Dönerfan", "Emil", "Fritz_99", "Greta"]
+
+
+def _fake_user(name: str) -> Any:
+    return SimpleNamespace(id=NAMES.index(name), display_name=name)
+
+
+def _fake_quote(quote_id: int, rng: random.Random) -> Any:
+    messages = [
+        SimpleNamespace(
+            content=" ".join(rng.choices(WORDS,
+                                         k=rng.randint(0,
+                                                       12))),
+            author=_fake_user(rng.choice(NAMES)),
+        ) for _ in range(rng.randint(1,
+                                     5))
+    ]
+    return SimpleNamespace(
+        id=quote_id,
+        comment=rng.choice([None,
+                            "",
+                            " ".join(rng.choices(WORDS,
+                                                 k=3))]),
+        messages=messages,
+        reporter=_fake_user(rng.choice(NAMES)),
+    )
+
+
+def _fake_quotes(num: int, seed: int = 42) -> list[Any]:
+    rng = random.Random(seed)
+    return [_fake_quote(quote_id, rng) for quote_id in range(num)]
+
+
+QUERIES = [
+    ("mathe", None),
+    ("Prüfung Klausur", None),
+    ("kafee mensa", None),
+    (None, "anna"),
+    (None, "Dönerfan"),
+    ("python vorlesung", "Ben"),
+    ("tschuss", "fritz"),
+    ("???", "Greta"),
+]
+
+
+class TestQuoteScoringEngine:
+    """Tests for QuoteScoringEngine class"""
+
+    @pytest.mark.parametrize("search_term,user_name", QUERIES)
+    def test_scores_match_rank_quote(
+        self,
+        search_term: str | None,
+        user_name: str | None
+    ):
+        """Test that the batch scores equal the per-row rank_quote scores."""
+        from utils.quoteSearchUtils import QuoteScoringEngine
+        from utils.quoteUtils import rank_quote
+
+        quotes = _fake_quotes(300)
+        engine = QuoteScoringEngine.from_quotes(quotes)
+
+        expected = [rank_quote(q, search_term, user_name) for q in quotes]
+
+        assert engine.score(search_term, user_name).tolist() == expected
+
+    def test_search_applies_minimum_score(self):
+        """Test that only quotes above the minimum score are returned."""
+        from utils.constants import Constants
+        from utils.quoteSearchUtils import QuoteScoringEngine
+        from utils.quoteUtils import rank_quote
+
+        quotes = _fake_quotes(300)
+        engine = QuoteScoringEngine.from_quotes(quotes)
+
+        expected = [
+            q.id for q in quotes if rank_quote(q,
+                                               "mensa nudeln",
+                                               "clara")
+            > Constants.QUOTE_SEARCH.MIN_SCORE
+        ]
+
+        assert engine.search("mensa nudeln", "clara") == expected
+
+    def test_empty_engine(self):
+        """Test that an empty corpus yields no scores."""
+        from utils.quoteSearchUtils import QuoteScoringEngine
+
+        engine = QuoteScoringEngine()
+
+        assert len(engine) == 0
+        assert engine.search("mathe", "anna") == []
+
+    def test_add_quote_skips_empty_texts(self):
+        """Test that empty comments and messages are not scored."""
+        from utils.quoteSearchUtils import QuoteScoringEngine
+
+        engine = QuoteScoringEngine()
+        engine.add_quote(7, [None, "", "Hallo Welt"], [(1, "Anna")])
+
+        assert engine.score("hallo", None).tolist() == [100]
+        assert engine.search(None, "anna") == [7]
+
+    def test_typo_scores_above_minimum(self):
+        """Test that a typo the FTS prefix query misses is still found."""
+        from utils.constants import Constants
+        from utils.quoteSearchUtils import QuoteScoringEngine
+
+        engine = QuoteScoringEngine()
+        engine.add_quote(3, [None, "Kaffee"], [(1, "Anna")])
+
+        assert engine.score("kafee", None).tolist()[0] >= (
+            Constants.QUOTE_SEARCH.MIN_SCORE
+        )
+        assert engine.search("kafee", None) == [3]
+
+    def test_subset_keeps_scores(self):
+        """Test that a subset scores its quotes like the full corpus."""
+        from utils.quoteSearchUtils import QuoteScoringEngine
+
+        quotes = _fake_quotes(200)
+        engine = QuoteScoringEngine.from_quotes(quotes)
+        ids = [150, 3, 77, 9999, 3]
+
+        subset = engine.subset(ids)
+        full_scores = engine.score("mensa", "emil")
+        subset_scores = subset.score("mensa", "emil")
+
+        assert subset.quote_ids == [150, 3, 77]
+        assert subset_scores.tolist() == [
+            full_scores[quote_id] for quote_id in subset.quote_ids
+        ]
+
+    def test_snapshot_is_not_changed_by_new_quotes(self):
+        """Test that quotes added after a snapshot are not in it."""
+        from utils.quoteSearchUtils import QuoteScoringEngine
+
+        engine = QuoteScoringEngine.from_quotes(_fake_quotes(20))
+        snapshot = engine.snapshot()
+        engine.add_quote(100, ["Mensa"], [(5, "Emil")])
+
+        assert len(snapshot) == 20
+        assert 100 not in snapshot
+        assert snapshot.score("mensa", "emil").tolist() == (
+            engine.score("mensa", "emil")[:20].tolist()
+        )
+
+    def test_add_quote_ignores_known_ids(self):
+        """Test that adding the same quote twice does not duplicate it."""
+        from utils.quoteSearchUtils import QuoteScoringEngine
+
+        engine = QuoteScoringEngine()
+        engine.add_quote(1, ["Hallo"], [(1, "Anna")])
+        engine.add_quote(1, ["Hallo"], [(1, "Anna")])
+
+        assert len(engine) == 1
+        assert engine.memory_usage() > 0
+
+    def test_remove_quote_moves_later_rows(self):
+        """Test that removing a quote keeps the scores of the others."""
+        from utils.quoteSearchUtils import QuoteScoringEngine
+
+        quotes = _fake_quotes(50)
+        engine = QuoteScoringEngine.from_quotes(quotes)
+        expected = QuoteScoringEngine.from_quotes(
+            [quote for quote in quotes if quote.id != 20]
+        )
+
+        assert engine.remove_quote(20)
+        assert not engine.remove_quote(20)
+
+        assert 20 not in engine
+        assert engine.quote_ids == expected.quote_ids
+        assert engine.score("mensa", "emil").tolist() == (
+            expected.score("mensa", "emil").tolist()
+        )
+        assert engine.subset([21]).score("mensa", "emil").tolist() == (
+            expected.subset([21]).score("mensa", "emil").tolist()
+        )
+
+    def test_rename_user(self):
+        """Test that a renamed user is found by the new name only."""
+        from utils.quoteSearchUtils import QuoteScoringEngine
+
+        engine = QuoteScoringEngine()
+        engine.add_quote(1, ["Hallo"], [(1, "Anna"), (2, "Ben")])
+        engine.add_quote(2, ["Welt"], [(2, "Ben")])
+
+        assert engine.rename_user(2, "Emil") == 2
+        assert engine.search(None, "ben") == []
+        assert engine.search(None, "emil") == [1, 2]
+        assert engine.search(None, "anna") == [1]
+
+
+def _mock_values_list(rows: list[tuple[Any, ...]]) -> MagicMock:
+    model = MagicMock()
+    model.all.return_value.order_by.return_value.values_list = AsyncMock(
+        return_value=rows
+    )
+    return model
+
+
+class TestQuoteCorpus:
+    """Tests for QuoteCorpus class"""
+
+    @pytest.mark.asyncio
+    async def test_load_builds_corpus_from_database(self):
+        """Test that quotes and their messages are grouped on load."""
+        from utils.quoteSearchUtils import QuoteCorpus
+
+        quote_model = _mock_values_list(
+            [(1, None, 1, "Anna"), (2, "Mensa", 2, "Ben")]
+        )
+        message_model = _mock_values_list(
+            [(1, "Mathe ist toll", 3, "Clara"), (2, "", 5, "Emil")]
+        )
+
+        with patch("utils.quoteSearchUtils.Quote", quote_model), \
+             patch("utils.quoteSearchUtils.QuoteMessage", message_model):
+            corpus = QuoteCorpus()
+            await corpus.load()
+            await corpus.load()
+
+            stats = corpus.stats()
+            assert stats.quotes == 2
+            assert stats.texts == 2
+            assert stats.names == 4
+            assert stats.rebuilds == 1
+            assert await corpus.search("mathe", None) == [1]
+            assert await corpus.search(None, "emil") == [2]
+            assert await corpus.search(None, "emil", [1]) == []
+
+    @pytest.mark.asyncio
+    async def test_add_quote_updates_loaded_corpus(self):
+        """Test that stored quotes are searchable without a rebuild."""
+        from utils.quoteSearchUtils import QuoteCorpus
+
+        quote_model = _mock_values_list([])
+        message_model = _mock_values_list([])
+
+        with patch("utils.quoteSearchUtils.Quote", quote_model), \
+             patch("utils.quoteSearchUtils.QuoteMessage", message_model):
+            corpus = QuoteCorpus()
+            assert await corpus.random_quote_id() is None
+
+            corpus.add_quote(5, [None, "Kaffee"], [(1, "Anna"), (2, "Ben")])
+
+            assert await corpus.search("kaffee", None) == [5]
+            assert await corpus.random_quote_id() == 5
+            assert corpus.stats().updates_since_load == 1
+
+            await corpus.rebuild()
+
+            # the mocked database does not know the quote
+            assert corpus.stats().quotes == 0
+            assert corpus.stats().updates_since_load == 0
+
+    @pytest.mark.asyncio
+    async def test_changes_during_load_are_kept(self):
+        """Test that quotes deleted or renamed while loading stay so."""
+        from utils.quoteSearchUtils import QuoteCorpus
+
+        corpus = QuoteCorpus()
+
+        async def read_messages(*fields: str) -> list[tuple[Any, ...]]:
+            corpus.remove_quote(1)
+            corpus.rename_user(2, "Emil")
+            return []
+
+        quote_model = _mock_values_list(
+            [(1, "Mensa", 1, "Anna"), (2, "Mensa", 2, "Ben")]
+        )
+        message_model = _mock_values_list([])
+        message_model.all.return_value.order_by.return_value.values_list = (
+            AsyncMock(side_effect=read_messages)
+        )
+
+        with patch("utils.quoteSearchUtils.Quote", quote_model), \
+             patch("utils.quoteSearchUtils.QuoteMessage", message_model):
+            await corpus.load()
+
+            assert await corpus.search("mensa", None) == [2]
+            assert await corpus.search(None, "emil") == [2]
+            assert await corpus.search(None, "ben") == []
+
+    def test_add_quote_before_load_is_ignored(self):
+        """Test that an unloaded corpus does not collect single quotes."""
+        from utils.quoteSearchUtils import QuoteCorpus
+
+        corpus = QuoteCorpus()
+        corpus.add_quote(5, ["Kaffee"], [(1, "Anna")])
+
+        assert not corpus.is_loaded
+        assert corpus.stats().quotes == 0
+        assert corpus.stats().age_seconds is None
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("num_quotes", [1_000, 10_000, 100_000])
+def test_benchmark_batch_vs_per_row_ranking(num_quotes: int):
+    """
+    Compare the batch engine with the per-row rank_quote loop.
+
+    Run with `pytest -m slow -s` to see the timings.
+    """
+    from utils.constants import Constants
+    from utils.quoteSearchUtils import QuoteScoringEngine
+    from utils.quoteUtils import rank_quote
+
+    quotes = _fake_quotes(num_quotes)
+
+    start = time.perf_counter()
+    expected = [
+        q.id for q in quotes if rank_quote(q,
+                                           "kaffee mensa",
+                                           "anna")
+        > Constants.QUOTE_SEARCH.MIN_SCORE
+    ]
+    per_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine = QuoteScoringEngine.from_quotes(quotes)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = engine.search("kaffee mensa", "anna")
+    batch = time.perf_counter() - start
+
+    print(
+        f"\n{num_quotes} quotes: per-row {per_row * 1000:.1f} ms, "
+        f"batch {batch * 1000:.1f} ms (corpus build {build * 1000:.1f} ms), "
+        f"speedup {per_row / batch:.1f}x"
+    )
+
+    assert result == expected
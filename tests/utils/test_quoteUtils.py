@@ -2,6 +2,10 @@
 Unit tests for utils/quoteUtils.py
 """
 
+from typing import Any, Callable
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+import pytest
 from discord import Color, Embed
 from models.quotes.quoteModels import PartialMessage
 
@@ -110,3 +114,198 @@ class TestBuildQuoteEmbed:
         assert len(field_content) <= 1024
         # Content should be truncated with "..."
         assert "..." in field_content
+
+
+class TestBuildFtsQuery:
+    """Tests for build_fts_query function"""
+
+    def test_build_fts_query_creates_prefix_or_query(self):
+        """Test that every word becomes a quoted prefix term."""
+        from utils.quoteUtils import build_fts_query
+
+        assert build_fts_query("Hallo Welt") == '"hallo"* OR "welt"*'
+
+    def test_build_fts_query_strips_fts_syntax(self):
+        """Test that FTS operators and quotes cannot leak into the query."""
+        from utils.quoteUtils import build_fts_query
+
+        query = build_fts_query('foo" OR bar* NEAR(baz)')
+
+        assert query == '"foo"* OR "or"* OR "bar"* OR "near"* OR "baz"*'
+
+    def test_build_fts_query_deduplicates_words(self):
+        """Test that repeated words are only searched once."""
+        from utils.quoteUtils import build_fts_query
+
+        assert build_fts_query("test Test test") == '"test"*'
+
+    def test_build_fts_query_without_words(self):
+        """Test that a term without words cannot be prefiltered."""
+        from utils.quoteUtils import build_fts_query
+
+        assert build_fts_query("?!  ...") is None
+
+
+class TestSearchQuotes:
+    """Tests for search_quotes function"""
+
+    @pytest.mark.asyncio
+    async def test_search_quotes_without_fts_candidates(self):
+        """Test that the whole corpus is scored when FTS has no hits."""
+        from utils import quoteUtils
+
+        with patch.object(
+            quoteUtils,
+            "get_fts_candidate_ids",
+            AsyncMock(return_value=[])
+        ), patch.object(quoteUtils, "quote_corpus") as mock_corpus, \
+             patch.object(quoteUtils, "Quote") as mock_quote:
+            mock_corpus.search = AsyncMock(return_value=[])
+            result = await quoteUtils.search_quotes("kafee", None, 1)
+
+        assert result == []
+        mock_corpus.search.assert_awaited_once_with("kafee", None)
+        mock_quote.filter.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_search_quotes_with_too_few_fts_matches(self):
+        """Test that typos missed by the FTS prefilter are still found."""
+        from utils import quoteUtils
+
+        quote = MagicMock(id=7)
+        with patch.object(
+            quoteUtils,
+            "get_fts_candidate_ids",
+            AsyncMock(return_value=[3])
+        ), patch.object(quoteUtils, "quote_corpus") as mock_corpus, \
+             patch.object(quoteUtils, "Quote") as mock_quote:
+            mock_corpus.search = AsyncMock(side_effect=[[], [7]])
+            mock_quote.filter = AsyncMock(return_value=[quote])
+            result = await quoteUtils.search_quotes("kafee", None, 1)
+
+        assert result == [quote]
+        assert mock_corpus.search.await_args_list == [
+            call("kafee",
+                 None,
+                 [3]),
+            call("kafee",
+                 None),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_search_quotes_with_enough_fts_matches(self):
+        """Test that the corpus is not scored again if FTS suffices."""
+        from utils import quoteUtils
+
+        quote = MagicMock(id=3)
+        with patch.object(
+            quoteUtils,
+            "get_fts_candidate_ids",
+            AsyncMock(return_value=[3])
+        ), patch.object(quoteUtils, "quote_corpus") as mock_corpus, \
+             patch.object(quoteUtils, "Quote") as mock_quote:
+            mock_corpus.search = AsyncMock(return_value=[3])
+            mock_quote.filter = AsyncMock(return_value=[quote])
+            result = await quoteUtils.search_quotes("kaffee", None, 1)
+
+        assert result == [quote]
+        mock_corpus.search.assert_awaited_once_with("kaffee", None, [3])
+
+    @pytest.mark.asyncio
+    async def test_search_quotes_removes_deleted_quotes(self):
+        """Test that quotes missing in the database leave the corpus."""
+        from utils import quoteUtils
+
+        with patch.object(quoteUtils, "quote_corpus") as mock_corpus, \
+             patch.object(quoteUtils, "Quote") as mock_quote:
+            mock_corpus.search = AsyncMock(return_value=[4])
+            mock_quote.filter = AsyncMock(return_value=[])
+            result = await quoteUtils.search_quotes(None, "anna", 1)
+
+        assert result == []
+        mock_corpus.remove_quote.assert_called_once_with(4)
+
+
+class TestStoreQuoteInDatabase:
+    """Tests of store_quote_in_db against an in-memory database"""
+
+    @pytest.mark.asyncio
+    async def test_stores_quote_messages_and_users(
+        self,
+        in_memory_db: None,
+        mock_context: MagicMock,
+        make_collected_message: Callable[...,
+                                         Any]
+    ):
+        """Test that the quote, its messages and all users are stored."""
+        from models.database.quoteData import Quote, QuoteMessage
+        from models.database.userData import User
+        from utils import quoteUtils
+        from utils.userUtils import UserDirectory
+
+        mock_context.author.display_name = "Reporter"
+        mock_context.message = None
+        messages = [make_collected_message("Hallo"), make_collected_message()]
+
+        with patch.object(quoteUtils, "user_directory", UserDirectory(10)), \
+             patch.object(quoteUtils, "quote_corpus") as mock_corpus:
+            await quoteUtils.store_quote_in_db(
+                mock_context,
+                messages,
+                "Kommentar"
+            )
+
+        quote = await Quote.get().prefetch_related("messages")
+        assert quote.reporter_id == 987654321
+        assert quote.comment == "Kommentar"
+        assert sorted(message.content for message in quote.messages) == [
+            "Hallo",
+            "Test",
+        ]
+        assert await QuoteMessage.filter(author_id=1).count() == 2
+        assert sorted(
+            await User.all().values_list("id",
+                                         "display_name")
+        ) == [(1,
+               "TestUser"),
+              (987654321,
+               "Reporter")]
+        mock_corpus.add_quote.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_transaction_stores_nothing(
+        self,
+        in_memory_db: None,
+        mock_context: MagicMock,
+        make_collected_message: Callable[...,
+                                         Any]
+    ):
+        """Test that a failing insert rolls back the quote and the users."""
+        from models.database.quoteData import Quote, QuoteMessage
+        from models.database.userData import User
+        from utils import quoteUtils
+        from utils.userUtils import UserDirectory
+
+        mock_context.author.display_name = "Reporter"
+        mock_context.message = None
+        directory = UserDirectory(10)
+
+        with patch.object(quoteUtils, "user_directory", directory), \
+             patch.object(quoteUtils, "quote_corpus") as mock_corpus, \
+             patch.object(
+                 QuoteMessage,
+                 "bulk_create",
+                 AsyncMock(side_effect=RuntimeError("disk full"))
+             ):
+            with pytest.raises(RuntimeError):
+                await quoteUtils.store_quote_in_db(
+                    mock_context,
+                    [make_collected_message()],
+                    None
+                )
+
+        assert await Quote.all().count() == 0
+        assert await QuoteMessage.all().count() == 0
+        assert await User.all().count() == 0
+        assert len(directory) == 0
+        mock_corpus.add_quote.assert_not_called()
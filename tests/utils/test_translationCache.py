@@ -0,0 +1,135 @@
+"""
+Unit tests for utils/ai/translationCache.py
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+
+class TestTranslationKey:
+    """Tests for translation_key function"""
+
+    def test_whitespace_and_case_do_not_matter(self):
+        """Test that reformatted snippets share one key."""
+        from utils.ai.translationCache import translation_key
+
+        assert translation_key(
+            "def f():\n    return 1",
+            "Bavarian",
+            "gpt-4o-mini"
+        ) == translation_key(" def f():  return 1 ",
+                             " bavarian",
+                             "gpt-4o-mini")
+
+    def test_language_and_model_are_part_of_the_key(self):
+        """Test that other languages and models are cached separately."""
+        from utils.ai.translationCache import translation_key
+
+        key = translation_key("x = 1", "Bavarian", "gpt-4o-mini")
+
+        assert key != translation_key("x = 1", "Swabian", "gpt-4o-mini")
+        assert key != translation_key("x = 1", "Bavarian", "gpt-4o")
+
+
+class TestTranslationCache:
+    """Tests for TranslationCache class"""
+
+    @pytest.mark.asyncio
+    async def test_hit_returns_cached_response(self):
+        """Test that a fresh entry is served and its tokens are counted."""
+        from tortoise import timezone
+
+        from utils.ai.translationCache import TranslationCache
+
+        entry = SimpleNamespace(
+            response={
+                "detected_language": "Python",
+                "translated_language": "Bavarian",
+                "translated_code": ["druck(1)"],
+                "humorous_comment": "Prost!",
+            },
+            tokens_used=300,
+            hits=0,
+            created_at=timezone.now(),
+            last_used_at=None,
+            save=AsyncMock()
+        )
+
+        with patch(
+            "utils.ai.translationCache.TranslationCacheEntry"
+        ) as mock_entry:
+            mock_entry.get_or_none = AsyncMock(return_value=entry)
+
+            cache = TranslationCache(ttl_seconds=60, max_entries=10)
+            response = await cache.get("print(1)", "Bavarian", "model")
+
+        assert response is not None
+        assert response.cached
+        assert response.tokens_used == 300
+        assert entry.hits == 1
+        assert cache.stats().tokens_saved == 300
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_a_miss(self):
+        """Test that entries older than the TTL are not served."""
+        from tortoise import timezone
+
+        from utils.ai.translationCache import TranslationCache
+
+        entry = SimpleNamespace(created_at=timezone.now() - timedelta(hours=2))
+
+        with patch(
+            "utils.ai.translationCache.TranslationCacheEntry"
+        ) as mock_entry:
+            mock_entry.get_or_none = AsyncMock(return_value=entry)
+
+            cache = TranslationCache(ttl_seconds=3600, max_entries=10)
+            response = await cache.get("print(1)", "Bavarian", "model")
+
+        assert response is None
+        assert cache.stats().misses == 1
+
+
+@pytest.mark.integration
+class TestTranslationCacheDatabase:
+    """Tests for TranslationCache against a real SQLite database"""
+
+    @pytest.mark.asyncio
+    async def test_prune_drops_expired_and_least_recently_used(
+        self,
+        in_memory_db: None
+    ):
+        """Test that pruning keeps the recently used entries."""
+        from tortoise import timezone
+
+        from models.ai.response import CodeTranslateResponse
+        from models.database.aiData import TranslationCacheEntry
+        from utils.ai.translationCache import TranslationCache
+
+        response = CodeTranslateResponse(
+            detected_language="Python",
+            translated_language="Bavarian",
+            translated_code=["druck(1)"],
+            humorous_comment="Prost!",
+            tokens_used=300
+        )
+        cache = TranslationCache(ttl_seconds=3600, max_entries=2)
+
+        await cache.put("a", "Bavarian", "model", response)
+        await cache.put("b", "Bavarian", "model", response)
+        # a is used again, so b is the least recently used entry
+        assert await cache.get("a", "Bavarian", "model") is not None
+        await cache.put("c", "Bavarian", "model", response)
+
+        assert await cache.get("b", "Bavarian", "model") is None
+        assert await cache.get("c", "Bavarian", "model") is not None
+        assert await TranslationCacheEntry.all().count() == 2
+
+        await TranslationCacheEntry.all().update(
+            created_at=timezone.now() - timedelta(hours=2)
+        )
+        assert await cache.prune() == 2
+        assert await TranslationCacheEntry.all().count() == 0
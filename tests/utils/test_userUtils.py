@@ -0,0 +1,176 @@
+"""
+Unit tests for utils/userUtils.py
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+
+def _member(user_id: int, name: str, display_name: str) -> MagicMock:
+    member = MagicMock()
+    member.id = user_id
+    member.name = name
+    member.display_name = display_name
+    return member
+
+
+def _stored_user(user_id: int, name: str, display_name: str) -> MagicMock:
+    user = MagicMock()
+    user.id = user_id
+    user.global_name = name
+    user.display_name = display_name
+    user.save = AsyncMock()
+    return user
+
+
+class TestUserDirectory:
+    """Tests for UserDirectory class"""
+
+    @pytest.mark.asyncio
+    @patch("utils.userUtils.User")
+    async def test_get_user_caches_known_users(self, mock_user: MagicMock):
+        """Test that a known user with unchanged names skips the database."""
+        from utils.userUtils import UserDirectory
+
+        stored = _stored_user(1, "anna", "Anna")
+        mock_user.get_or_create = AsyncMock(return_value=(stored, True))
+        directory = UserDirectory(maxsize=10)
+
+        first = await directory.get_user(_member(1, "anna", "Anna"))
+        second = await directory.get_user(_member(1, "anna", "Anna"))
+
+        assert first is stored
+        assert second is stored
+        mock_user.get_or_create.assert_awaited_once()
+        stored.save.assert_not_awaited()
+        assert directory.hits == 1
+        assert directory.writes == 1
+
+    @pytest.mark.asyncio
+    @patch("utils.userUtils.quote_corpus")
+    @patch("utils.userUtils.User")
+    async def test_get_user_writes_changed_names(
+        self,
+        mock_user: MagicMock,
+        mock_corpus: MagicMock
+    ):
+        """Test that a changed display name is written through."""
+        from utils.userUtils import UserDirectory
+
+        stored = _stored_user(1, "anna", "Anna")
+        mock_user.get_or_create = AsyncMock(return_value=(stored, False))
+        directory = UserDirectory(maxsize=10)
+
+        await directory.get_user(_member(1, "anna", "Anna"))
+        user = await directory.get_user(_member(1, "anna", "Anni"))
+
+        assert user.display_name == "Anni"
+        stored.save.assert_awaited_once_with(
+            update_fields=["global_name", "display_name"]
+        )
+        mock_user.get_or_create.assert_awaited_once()
+        mock_corpus.rename_user.assert_called_once_with(1, "Anni")
+
+    @pytest.mark.asyncio
+    @patch("utils.userUtils.User")
+    async def test_get_user_serialises_first_inserts(
+        self,
+        mock_user: MagicMock
+    ):
+        """Test that concurrent lookups of a new user insert it only once."""
+        from utils.userUtils import UserDirectory
+
+        stored = _stored_user(1, "anna", "Anna")
+
+        async def slow_get_or_create(**kwargs: object):
+            await asyncio.sleep(0.01)
+            return stored, True
+
+        mock_user.get_or_create = AsyncMock(side_effect=slow_get_or_create)
+        directory = UserDirectory(maxsize=10)
+
+        users = await asyncio.gather(
+            *[directory.get_user(_member(1, "anna", "Anna")) for _ in range(5)]
+        )
+
+        assert all(user is stored for user in users)
+        mock_user.get_or_create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch("utils.userUtils.User")
+    async def test_upsert_users_skips_unchanged_users(
+        self,
+        mock_user: MagicMock
+    ):
+        """Test that only new or renamed users are upserted in one batch."""
+        from utils.userUtils import UserDirectory
+
+        anna = _stored_user(1, "anna", "Anna")
+        mock_user.get_or_create = AsyncMock(return_value=(anna, True))
+        mock_user.bulk_create = AsyncMock()
+        directory = UserDirectory(maxsize=10)
+        await directory.get_user(_member(1, "anna", "Anna"))
+
+        connection = MagicMock()
+        await directory.upsert_users(
+            [
+                _member(1,
+                        "anna",
+                        "Anna"),
+                _member(2,
+                        "ben",
+                        "Ben"),
+                _member(2,
+                        "ben",
+                        "Ben"),
+            ],
+            connection
+        )
+
+        mock_user.bulk_create.assert_awaited_once()
+        users = mock_user.bulk_create.call_args.args[0]
+        kwargs = mock_user.bulk_create.call_args.kwargs
+        assert len(users) == 1
+        assert kwargs["on_conflict"] == ["id"]
+        assert kwargs["update_fields"] == ["global_name", "display_name"]
+        assert kwargs["using_db"] is connection
+
+    @pytest.mark.asyncio
+    @patch("utils.userUtils.User")
+    async def test_upsert_users_without_changes(self, mock_user: MagicMock):
+        """Test that no statement is run if all users are up to date."""
+        from utils.userUtils import UserDirectory
+
+        anna = _stored_user(1, "anna", "Anna")
+        mock_user.get_or_create = AsyncMock(return_value=(anna, True))
+        mock_user.bulk_create = AsyncMock()
+        directory = UserDirectory(maxsize=10)
+        await directory.get_user(_member(1, "anna", "Anna"))
+
+        await directory.upsert_users([_member(1, "anna", "Anna")], MagicMock())
+
+        mock_user.bulk_create.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    @patch("utils.userUtils.User")
+    async def test_cache_is_bounded(self, mock_user: MagicMock):
+        """Test that the least recently used users are evicted."""
+        from utils.userUtils import UserDirectory
+
+        mock_user.get_or_create = AsyncMock(
+            side_effect=lambda id, defaults: (
+                _stored_user(id,
+                             defaults["global_name"],
+                             defaults["display_name"]),
+                True
+            )
+        )
+        directory = UserDirectory(maxsize=2)
+
+        for user_id in range(3):
+            await directory.get_user(_member(user_id, "u", "U"))
+        directory.invalidate([2])
+
+        assert len(directory) == 1